@@ -5,9 +5,12 @@ from datetime import datetime
 
 
 from src.routes import canvas_routes, image_routes, \
-    transform_routes, filter_routes, vector_head, vector_api
+    transform_routes, filter_routes, vector_head, vector_api, batch_routes, job_routes, \
+    thumbnail_routes, metrics_routes
 
 from src.three_d import scene_routes as three_d_routes
+from src.models.project_store import project_store
+from src.utils import metrics
 
 app = Flask(__name__)
 
@@ -17,10 +20,16 @@ os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
 app.config['SECRET_KEY'] = 'vector-editor-secret-key'
 app.config['PROJECTS_FOLDER'] = 'projects'
+app.config['COMPRESS_PROJECTS'] = False  # снимки проектов в gzip
 app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50 MB
 
+project_store.compress = app.config['COMPRESS_PROJECTS']
+
+# задержки по маршрутам, таймеры кодеков — выгрузка в /metrics
+metrics.init_app(app)
+
 # Создаем папки
-for folder in ['uploads', 'projects', 'exports']:
+for folder in ['uploads', 'projects', 'exports', 'thumbnails']:
     os.makedirs(folder, exist_ok=True)
 
 @app.route("/")
@@ -51,6 +60,10 @@ app.register_blueprint(canvas_routes.bp)
 app.register_blueprint(image_routes.bp)
 app.register_blueprint(transform_routes.bp)
 app.register_blueprint(filter_routes.bp)
+app.register_blueprint(batch_routes.bp)
+app.register_blueprint(job_routes.bp)
+app.register_blueprint(thumbnail_routes.bp)
+app.register_blueprint(metrics_routes.bp)
 app.register_blueprint(three_d_routes.bp)
 app.register_blueprint(vector_head.head_bp)
 app.register_blueprint(vector_api.api_bp)
@@ -0,0 +1,56 @@
+"""
+Пакетная обработка изображений по рецепту.
+
+    python batch.py recipe.json photos/ out/ --workers 8
+    python batch.py recipe.json photos.zip out/
+
+recipe.json — список шагов operations.py, последний шаг может быть
+{"action": "save", "format": "jpg", "quality": 90}.
+"""
+import argparse
+import json
+import sys
+
+from src.services.batch_service import BatchProcessor, Recipe
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Пакетная обработка изображений по рецепту")
+    parser.add_argument("recipe", help="JSON-файл рецепта")
+    parser.add_argument("source", help="каталог или zip-архив с изображениями")
+    parser.add_argument("output", help="каталог для результатов")
+    parser.add_argument("--workers", type=int, default=None, help="число процессов (по умолчанию — все ядра)")
+    parser.add_argument("--in-flight", type=int, default=None, help="максимум файлов в обработке одновременно")
+    parser.add_argument("--tiled-above", type=float, default=None,
+                        help="изображения крупнее N мегапикселей обрабатывать по тайлам")
+    parser.add_argument("--tile-ram-mb", type=int, default=256, help="потолок памяти на тайлы, МБ")
+    parser.add_argument("--quiet", action="store_true", help="не печатать строку на каждый файл")
+    args = parser.parse_args(argv)
+
+    with open(args.recipe, encoding="utf-8") as f:
+        recipe = Recipe.from_json(json.load(f))
+
+    def progress(record, summary):
+        if args.quiet and record["ok"]:
+            return
+        status = record["output"] if record["ok"] else f"ОШИБКА: {record['error']}"
+        print(f"[{summary['done']}/{summary['total']}] {record['name']} -> {status} "
+              f"({record['ms']:.0f} мс)", flush=True)
+
+    processor = BatchProcessor(
+        recipe, args.workers, args.in_flight,
+        tiled_above_mp=args.tiled_above,
+        tile_max_bytes=args.tile_ram_mb * 1024 * 1024
+    )
+    summary = processor.run(args.source, args.output, on_progress=progress)
+
+    print(
+        f"Готово: {summary['done'] - summary['failed']}/{summary['total']}, "
+        f"ошибок: {summary['failed']}, {summary['elapsed_s']:.1f} с, "
+        f"{summary['files_per_s']:.1f} файл/с, {summary['megapixels_per_s']:.1f} МП/с"
+    )
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""
+Сравнение поэлементных операций: раздельные проходы (как было) и один LUT.
+
+    python -m benchmarks.point_ops_bench --mp 24 --repeat 5
+"""
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from src.utils.point_ops import PointChain
+
+
+# ===================== КАК БЫЛО =====================
+# каждая функция — отдельный полнокадровый проход
+
+def legacy_brightness_contrast_rgb(img, brightness, contrast, r, g, b):
+    passes = []
+    img_bc = cv2.convertScaleAbs(img, alpha=contrast, beta=brightness)
+    passes.append("convertScaleAbs")
+    b_ch, g_ch, r_ch = cv2.split(img_bc)
+    passes.append("split")
+    r_ch = cv2.add(r_ch, r)
+    g_ch = cv2.add(g_ch, g)
+    b_ch = cv2.add(b_ch, b)
+    passes += ["add(r)", "add(g)", "add(b)"]
+    out = cv2.merge([b_ch, g_ch, r_ch])
+    passes.append("merge")
+    return out, passes
+
+
+def legacy_color_balance(img, r, g, b):
+    passes = []
+    out = img.astype(np.float32)
+    passes.append("astype(float32)")
+    out[:, :, 2] *= r
+    out[:, :, 1] *= g
+    out[:, :, 0] *= b
+    passes += ["*=r", "*=g", "*=b"]
+    out = np.clip(out, 0, 255)
+    passes.append("clip")
+    out = out.astype(np.uint8)
+    passes.append("astype(uint8)")
+    return out, passes
+
+
+# ===================== LUT =====================
+
+def fused_brightness_contrast_rgb(img, brightness, contrast, r, g, b):
+    chain = PointChain().scale_abs(contrast, brightness).offset("r", r).offset("g", g).offset("b", b)
+    return chain.apply(img), ["LUT"]
+
+
+def fused_color_balance(img, r, g, b):
+    chain = PointChain().gain("r", r).gain("g", g).gain("b", b)
+    return chain.apply(img), ["LUT"]
+
+
+CASES = [
+    ("brightness_contrast_rgb", legacy_brightness_contrast_rgb, fused_brightness_contrast_rgb, (15, 1.2, 10, -5, 20)),
+    ("color_balance", legacy_color_balance, fused_color_balance, (1.1, 0.95, 1.2)),
+]
+
+
+def best_time(fn, img, args, repeat):
+    best = float("inf")
+    result = passes = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result, passes = fn(img, *args)
+        best = min(best, time.perf_counter() - t0)
+    return best, result, passes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--mp", type=float, default=24.0, help="размер изображения, мегапиксели")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    side = int((args.mp * 1e6) ** 0.5)
+    img = np.random.default_rng(0).integers(0, 256, (side, side, 3), dtype=np.uint8)
+    print(f"Изображение {side}×{side} ({side * side / 1e6:.1f} Мп)\n")
+
+    for name, legacy, fused, params in CASES:
+        t_old, out_old, passes_old = best_time(legacy, img, params, args.repeat)
+        t_new, out_new, passes_new = best_time(fused, img, params, args.repeat)
+        same = np.array_equal(out_old, out_new)
+        print(f"{name}:")
+        print(f"  раздельно: {len(passes_old)} проходов, {t_old * 1000:8.1f} мс  ({', '.join(passes_old)})")
+        print(f"  LUT:       {len(passes_new)} проход,   {t_new * 1000:8.1f} мс  "
+              f"(x{t_old / t_new:.1f}, результат {'совпадает' if same else 'ОТЛИЧАЕТСЯ'})")
+
+
+if __name__ == "__main__":
+    main()
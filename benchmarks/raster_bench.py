@@ -0,0 +1,221 @@
+"""
+Бенчмарк растровых операций: функции image_tools и сервисы /filter, /transform, /canvas.
+
+    python -m benchmarks.raster_bench --sizes 1,4,12,24,50 --repeat 3 --save benchmarks/baseline.json
+    python -m benchmarks.raster_bench --baseline benchmarks/baseline.json --threshold 0.25
+
+Для каждой операции и размера изображения печатает время декодирования,
+вычисления и кодирования (PNG) и скорость в мегапикселях в секунду.
+С --baseline сравнивает время вычисления с сохранённым прогоном и завершается
+с кодом 1, если какая-то операция стала медленнее больше чем на threshold.
+"""
+import argparse
+import json
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from image_tools import (
+    resize_image,
+    crop_image,
+    rotate_image,
+    flip_image,
+    brightness_contrast,
+    color_balance,
+    add_noise,
+    blur_image
+)
+from src.services.workspace_registry import Workspace
+from src.utils.image_cache import image_cache
+
+
+# ===================== ОПЕРАЦИИ =====================
+# функция(img) -> результат; для сервисов — функция(ws)
+
+TOOL_CASES = {
+    "resize_image": lambda img: resize_image(img, img.shape[1] // 2, None, "INTER_LINEAR"),
+    "crop_image": lambda img: crop_image(img, 10, 10, img.shape[1] // 2, img.shape[0] // 2).copy(),
+    "rotate_image": lambda img: rotate_image(img, 30, None, None),
+    "flip_image": lambda img: flip_image(img, "h"),
+    "brightness_contrast": lambda img: brightness_contrast(img, 1.2, 10),
+    "color_balance": lambda img: color_balance(img, 1.1, 0.95, 1.2),
+    "add_noise[gaussian]": lambda img: add_noise(img, "gaussian", 0.05),
+    "add_noise[sp]": lambda img: add_noise(img, "sp", 0.05),
+    "blur_image[average]": lambda img: blur_image(img, "average", 5),
+    "blur_image[gaussian]": lambda img: blur_image(img, "gaussian", 5),
+    "blur_image[median]": lambda img: blur_image(img, "median", 5),
+}
+
+SERVICE_CASES = {
+    "filters.brightness_contrast": lambda ws: ws.filters.brightness_contrast(10, 1.2),
+    "filters.color_balance": lambda ws: ws.filters.color_balance(10, -5, 20),
+    "filters.gamma": lambda ws: ws.filters.gamma(1.4),
+    "filters.levels": lambda ws: ws.filters.levels(10, 240, 1.2, 0, 255),
+    "filters.add_gaussian_noise": lambda ws: ws.filters.add_gaussian_noise(10),
+    "filters.blur[average]": lambda ws: ws.filters.blur("average", 5),
+    "filters.blur[gaussian]": lambda ws: ws.filters.blur("gaussian", 5),
+    "filters.blur[median]": lambda ws: ws.filters.blur("median", 5),
+    "transforms.rotate": lambda ws: ws.transforms.rotate(30),
+    "transforms.flip_horizontal": lambda ws: ws.transforms.flip_horizontal(),
+    "transforms.resize": lambda ws: ws.transforms.resize(1024, 768, "bicubic"),
+    "transforms.crop": lambda ws: ws.transforms.crop(10, 10, 512, 512),
+    "canvas.resize": lambda ws: ws.canvas.resize(1024, 768),
+}
+
+
+def synthetic_image(megapixels: float, seed: int = 0):
+    """
+    Градиент с шумом — сжимается примерно как фотография, а не как чистый шум.
+    """
+    w = int((megapixels * 1e6 * 4 / 3) ** 0.5)
+    h = int(megapixels * 1e6 / w)
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 255, w, dtype=np.float32)
+    y = np.linspace(0, 255, h, dtype=np.float32)[:, None]
+    base = np.dstack([(x + y) / 2, np.broadcast_to(x, (h, w)), np.broadcast_to(y, (h, w))])
+    noise = rng.normal(0, 12, (h, w, 3)).astype(np.float32)
+    return np.clip(base + noise, 0, 255).astype(np.uint8)
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - t0, result
+
+
+def encode_png(img):
+    ok, buf = cv2.imencode(".png", img)
+    return buf
+
+
+# ===================== ПРОГОН =====================
+
+def bench_tools(img, png, repeat):
+    decode_s = min(timed(cv2.imdecode, png, cv2.IMREAD_COLOR)[0] for _ in range(repeat))
+
+    results = {}
+    for name, fn in TOOL_CASES.items():
+        compute_s, out = float("inf"), None
+        for _ in range(repeat):
+            t, out = timed(fn, img)
+            compute_s = min(compute_s, t)
+        encode_s, _ = timed(encode_png, out)
+        results[name] = (decode_s, compute_s, encode_s)
+    return results
+
+
+def bench_services(png, repeat, root):
+    results = {}
+    ws = Workspace("bench", root)
+    with ws:
+        for name, fn in SERVICE_CASES.items():
+            decode_s = compute_s = float("inf")
+            for _ in range(repeat):
+                # загрузка сбрасывает историю и стек коррекций — каждый замер с нуля
+                t, _ = timed(ws.images.upload_image, png.tobytes())
+                decode_s = min(decode_s, t)
+                image_cache.flush()
+                t, _ = timed(fn, ws)
+                compute_s = min(compute_s, t)
+                image_cache.flush()
+
+            encode_s, _ = timed(encode_png, image_cache.read(ws.project.current_path))
+            results[name] = (decode_s, compute_s, encode_s)
+        ws.unload()
+    return results
+
+
+def run(sizes, repeat, services=True):
+    results = {}
+    root = tempfile.mkdtemp(prefix="raster_bench_")
+    try:
+        for mp in sizes:
+            img = synthetic_image(mp)
+            real_mp = img.shape[0] * img.shape[1] / 1e6
+            png = encode_png(img)
+            print(f"\n{img.shape[1]}×{img.shape[0]} ({real_mp:.1f} Мп)", flush=True)
+
+            rows = bench_tools(img, png, repeat)
+            if services:
+                rows.update(bench_services(png, repeat, root))
+
+            for name, (decode_s, compute_s, encode_s) in rows.items():
+                key = f"{name}@{mp:g}mp"
+                results[key] = {
+                    "megapixels": round(real_mp, 3),
+                    "decode_ms": round(decode_s * 1000, 2),
+                    "compute_ms": round(compute_s * 1000, 2),
+                    "encode_ms": round(encode_s * 1000, 2),
+                    "mp_per_s": round(real_mp / max(compute_s, 1e-9), 2),
+                }
+                r = results[key]
+                print(f"  {name:30s} декод {r['decode_ms']:9.1f} мс | вычисл {r['compute_ms']:9.1f} мс "
+                      f"| кодир {r['encode_ms']:9.1f} мс | {r['mp_per_s']:9.1f} Мп/с", flush=True)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Операции, у которых время вычисления выросло больше чем на threshold.
+    """
+    regressions = []
+    for key, r in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        ratio = r["compute_ms"] / max(base["compute_ms"], 1e-6)
+        if ratio > 1 + threshold:
+            regressions.append((key, base["compute_ms"], r["compute_ms"], ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="1,4,12,24,50", help="размеры изображений, мегапиксели")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-services", action="store_true", help="только функции image_tools")
+    parser.add_argument("--save", help="сохранить результаты как базовый прогон (JSON)")
+    parser.add_argument("--baseline", help="сравнить с базовым прогоном (JSON)")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="допустимое замедление относительно базы (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    sizes = [float(s) for s in args.sizes.split(",")]
+    results = run(sizes, args.repeat, services=not args.no_services)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({
+                "meta": {
+                    "python": platform.python_version(),
+                    "opencv": cv2.__version__,
+                    "numpy": np.__version__,
+                    "machine": platform.machine(),
+                    "repeat": args.repeat,
+                },
+                "results": results,
+            }, f, indent=2, ensure_ascii=False)
+        print(f"\nБазовый прогон сохранён: {args.save}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\nЗамедление больше {args.threshold:.0%}:")
+            for key, old, new, ratio in regressions:
+                print(f"  {key}: {old:.1f} мс -> {new:.1f} мс (x{ratio:.2f})")
+            return 1
+        print(f"\nРегрессий нет (порог {args.threshold:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
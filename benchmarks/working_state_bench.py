@@ -0,0 +1,72 @@
+"""
+Рабочий формат проекта: задержка одной правки при хранении current в PNG и в .raw.
+
+    python -m benchmarks.working_state_bench --mp 24 --repeat 5
+
+Правка = запись новой версии на диск (кодирование + файл) и чтение её
+обратно «с холодного» кэша, как после вытеснения рабочего пространства.
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.raster_bench import synthetic_image
+from src.utils.image_cache import ImageCache
+from src.utils.raw_format import available_codecs
+
+
+def bench_format(img, path, codec, repeat):
+    cache = ImageCache(raw_codec=codec)
+    write_s = read_s = float("inf")
+    same = True
+
+    for i in range(repeat):
+        # каждая правка — новое содержимое, чтобы не было попаданий в кэш кодирования
+        edited = np.roll(img, i + 1, axis=1)
+
+        t0 = time.perf_counter()
+        cache.write(path, edited)
+        cache.flush(path)
+        write_s = min(write_s, time.perf_counter() - t0)
+
+        cache.invalidate(path)
+        t0 = time.perf_counter()
+        back = np.array(cache.read(path))
+        read_s = min(read_s, time.perf_counter() - t0)
+        same = same and np.array_equal(back, edited)
+
+    return write_s, read_s, os.path.getsize(path), same
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--mp", type=float, default=24.0, help="размер изображения, мегапиксели")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    img = synthetic_image(args.mp)
+    print(f"Изображение {img.shape[1]}×{img.shape[0]} ({img.shape[0] * img.shape[1] / 1e6:.1f} Мп)\n")
+
+    variants = [("png", "current.png", None)]
+    variants += [(f"raw[{codec or 'без сжатия'}]", "current.raw", codec) for codec in available_codecs()]
+
+    root = tempfile.mkdtemp(prefix="working_state_")
+    try:
+        base = None
+        for name, filename, codec in variants:
+            write_s, read_s, size, same = bench_format(img, os.path.join(root, filename), codec, args.repeat)
+            total = write_s + read_s
+            base = base or total
+            print(f"{name:20s} запись {write_s * 1000:8.1f} мс | чтение {read_s * 1000:8.1f} мс "
+                  f"| правка {total * 1000:8.1f} мс (x{base / total:5.1f}) | {size / 1e6:7.1f} МБ"
+                  f"{'' if same else '  РЕЗУЛЬТАТ ОТЛИЧАЕТСЯ'}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,10 @@ import cv2
 import numpy as np
 import base64
 
+from src.utils import noise
+from src.utils.geometry import AffineChain
+from src.utils.point_ops import PointChain
+
 
 def read_uploaded_image(file):
     data = file.read()
@@ -57,22 +61,10 @@ def crop_image(img, x, y, w, h):
 
 
 def rotate_image(img, angle, cx, cy):
+    # angle — по часовой стрелке; углы, кратные 90°, поворачиваются без интерполяции
     h, w = img.shape[:2]
-    if not cx or not cy:
-        cx, cy = w/2, h/2
-    else:
-        cx, cy = float(cx), float(cy)
-
-    M = cv2.getRotationMatrix2D((cx, cy), -angle, 1.0)
-    cos, sin = abs(M[0, 0]), abs(M[0, 1])
-
-    nW = int((h * sin) + (w * cos))
-    nH = int((h * cos) + (w * sin))
-
-    M[0, 2] += (nW / 2) - cx
-    M[1, 2] += (nH / 2) - cy
-
-    return cv2.warpAffine(img, M, (nW, nH), flags=cv2.INTER_LINEAR)
+    center = (float(cx), float(cy)) if cx and cy else None
+    return AffineChain(w, h).rotate(-angle, center).apply(img)
 
 
 def flip_image(img, mode):
@@ -84,38 +76,15 @@ def flip_image(img, mode):
 
 
 def brightness_contrast(img, alpha, beta):
-    return cv2.convertScaleAbs(img, alpha=alpha, beta=beta)
+    return PointChain().scale_abs(alpha, beta).apply(img)
 
 
 def color_balance(img, r, g, b):
-    out = img.astype(np.float32)
-    out[:, :, 2] *= r
-    out[:, :, 1] *= g
-    out[:, :, 0] *= b
-    return np.clip(out, 0, 255).astype(np.uint8)
-
-
-def add_noise(img, noise_type, amount):
-    if noise_type == "gaussian":
-        mean = 0
-        sigma = amount * 255
-        gauss = np.random.normal(mean, sigma, img.shape).astype(np.float32)
-        out = img.astype(np.float32) + gauss
-        return np.clip(out, 0, 255).astype(np.uint8)
-
-    # Salt & pepper
-    out = img.copy()
-    s_vs_p = 0.5
-
-    num_salt = int(amount * img.size * s_vs_p)
-    coords = [np.random.randint(0, i - 1, num_salt) for i in img.shape[:2]]
-    out[coords[0], coords[1]] = 255
-
-    num_pepper = int(amount * img.size * (1 - s_vs_p))
-    coords = [np.random.randint(0, i - 1, num_pepper) for i in img.shape[:2]]
-    out[coords[0], coords[1]] = 0
-
-    return out
+    return PointChain().gain("r", r).gain("g", g).gain("b", b).apply(img)
+
+
+def add_noise(img, noise_type, amount, seed=None):
+    return noise.add_noise(img, noise_type, amount, seed)
 
 
 def blur_image(img, type_, k):
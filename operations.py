@@ -0,0 +1,371 @@
+import json
+import time
+
+import cv2
+
+from src.utils.geometry import AffineChain
+from src.utils.noise import new_seed
+from image_tools import (
+    resize_image,
+    crop_image,
+    rotate_image,
+    flip_image,
+    brightness_contrast,
+    color_balance,
+    add_noise,
+    blur_image
+)
+
+
+class Param:
+    """
+    Описание параметра операции: имя, тип и значение по умолчанию.
+    scaled=True — параметр в пикселях исходника (для превью делится на масштаб).
+    """
+
+    def __init__(self, name: str, type_, default=None, required: bool = True,
+                 scaled: bool = False):
+        self.name = name
+        self.type = type_
+        self.default = default
+        self.required = required and default is None
+        self.scaled = scaled
+
+    def parse(self, raw):
+        value = raw.get(self.name)
+        if value is None or value == "":
+            if self.required:
+                raise ValueError(f"Не задан параметр: {self.name}")
+            return self.default
+
+        try:
+            value = self.type(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Неверное значение параметра {self.name}: {value}")
+        return value
+
+
+class Operation:
+    """
+    Операция обработки: функция image_tools и типизированные параметры.
+    """
+
+    def __init__(self, name: str, func, params):
+        self.name = name
+        self.func = func
+        self.params = params
+        self.tiled = None  # реализация по тайлам: tiled(executor, buffer, **kwargs)
+        self.geometry = None  # шаг аффинной цепочки: geometry(chain, **kwargs)
+
+    def parse(self, raw) -> dict:
+        return {p.name: p.parse(raw) for p in self.params}
+
+    def scale(self, kwargs: dict, scale: int) -> dict:
+        """
+        Параметры для копии изображения, уменьшенной в scale раз.
+        """
+        kwargs = dict(kwargs)
+        for p in self.params:
+            if p.scaled and kwargs.get(p.name):
+                kwargs[p.name] = max(1, round(kwargs[p.name] / scale))
+        return kwargs
+
+    def apply(self, img, kwargs: dict):
+        return self.func(img, **kwargs)
+
+    def apply_tiled(self, executor, buffer, kwargs: dict):
+        if self.tiled is None:
+            raise ValueError(f"Действие {self.name} не поддерживает обработку по тайлам")
+        return self.tiled(executor, buffer, **kwargs)
+
+
+OPERATIONS = {}
+
+
+def register(name: str, *params):
+    def decorator(func):
+        OPERATIONS[name] = Operation(name, func, params)
+        return func
+    return decorator
+
+
+def tiled(name: str):
+    """
+    Регистрирует реализацию операции по тайлам (для изображений, не влезающих в память).
+    """
+    def decorator(func):
+        OPERATIONS[name].tiled = func
+        return func
+    return decorator
+
+
+def geometric(name: str):
+    """
+    Регистрирует операцию как шаг AffineChain: подряд идущие геометрические
+    операции сливаются в одно преобразование.
+    """
+    def decorator(func):
+        OPERATIONS[name].geometry = func
+        return func
+    return decorator
+
+
+def get_operation(name: str) -> Operation:
+    op = OPERATIONS.get(name)
+    if op is None:
+        raise ValueError(f"Неизвестное действие: {name}")
+    return op
+
+
+# ===================== ОПЕРАЦИИ =====================
+
+@register(
+    "resize",
+    Param("w", int, required=False, scaled=True),
+    Param("h", int, required=False, scaled=True),
+    Param("interp", str, "INTER_LINEAR"),
+)
+def resize(img, w, h, interp):
+    if not w and not h:
+        raise ValueError("Укажите ширину или высоту")
+    return resize_image(img, w, h, interp)
+
+
+INTERP = {
+    "INTER_NEAREST": cv2.INTER_NEAREST,
+    "INTER_LINEAR": cv2.INTER_LINEAR,
+    "INTER_CUBIC": cv2.INTER_CUBIC
+}
+
+
+@geometric("resize")
+def resize_geometry(chain, w, h, interp):
+    if not w and not h:
+        raise ValueError("Укажите ширину или высоту")
+    if not h:
+        h = int(chain.height * w / chain.width)
+    elif not w:
+        w = int(chain.width * h / chain.height)
+    chain.resize(w, h, interp)
+
+
+@tiled("resize")
+def resize_tiled(ex, buf, w, h, interp):
+    h0, w0 = buf.shape[:2]
+    if not w and not h:
+        raise ValueError("Укажите ширину или высоту")
+    if not h:
+        h = int(h0 * w / w0)
+    elif not w:
+        w = int(w0 * h / h0)
+    return ex.resize(buf, (int(w), int(h)), INTERP.get(interp, cv2.INTER_LINEAR))
+
+
+@register(
+    "crop",
+    Param("x", int, scaled=True),
+    Param("y", int, scaled=True),
+    Param("w", int, scaled=True),
+    Param("h", int, scaled=True),
+)
+def crop(img, x, y, w, h):
+    return crop_image(img, x, y, w, h)
+
+
+@geometric("crop")
+def crop_geometry(chain, x, y, w, h):
+    chain.crop(x, y, w, h)
+
+
+@tiled("crop")
+def crop_tiled(ex, buf, x, y, w, h):
+    return ex.crop(buf, x, y, w, h)
+
+
+@register(
+    "rotate",
+    Param("angle", float),
+    Param("cx", float, required=False, scaled=True),
+    Param("cy", float, required=False, scaled=True),
+)
+def rotate(img, angle, cx, cy):
+    return rotate_image(img, angle, cx, cy)
+
+
+@geometric("rotate")
+def rotate_geometry(chain, angle, cx, cy):
+    chain.rotate(-angle, (cx, cy) if cx and cy else None)
+
+
+@tiled("rotate")
+def rotate_tiled(ex, buf, angle, cx, cy):
+    # матрица и размер холста — как в rotate_image
+    chain = AffineChain(buf.shape[1], buf.shape[0])
+    rotate_geometry(chain, angle, cx, cy)
+    return ex.warp(buf, chain.cv_matrix(), (chain.width, chain.height))
+
+
+@register("flip", Param("mode", str, "h"))
+def flip(img, mode):
+    return flip_image(img, mode)
+
+
+@geometric("flip")
+def flip_geometry(chain, mode):
+    chain.flip(mode)
+
+
+@tiled("flip")
+def flip_tiled(ex, buf, mode):
+    return ex.flip(buf, mode)
+
+
+@register("bc", Param("alpha", float), Param("beta", float))
+def bc(img, alpha, beta):
+    return brightness_contrast(img, alpha, beta)
+
+
+@tiled("bc")
+def bc_tiled(ex, buf, alpha, beta):
+    return ex.map(buf, lambda t: brightness_contrast(t, alpha, beta))
+
+
+@register("color", Param("r", float), Param("g", float), Param("b", float))
+def color(img, r, g, b):
+    return color_balance(img, r, g, b)
+
+
+@tiled("color")
+def color_tiled(ex, buf, r, g, b):
+    return ex.map(buf, lambda t: color_balance(t, r, g, b))
+
+
+@register(
+    "noise",
+    Param("type", str, "gaussian"),
+    Param("amount", float),
+    Param("seed", int, required=False),
+)
+def noise(img, type, amount, seed):
+    return add_noise(img, type, amount, seed)
+
+
+@tiled("noise")
+def noise_tiled(ex, buf, type, amount, seed):
+    # у каждого тайла свой поток случайных чисел, производный от seed
+    seed = new_seed() if seed is None else seed
+    tile_index = iter(range(1 << 62))
+    return ex.map(buf, lambda t: add_noise(t, type, amount, [seed, next(tile_index)]))
+
+
+@register(
+    "blur",
+    Param("type", str, "gaussian"),
+    Param("ksize", int, scaled=True),
+)
+def blur(img, type, ksize):
+    return blur_image(img, type, ksize)
+
+
+@tiled("blur")
+def blur_tiled(ex, buf, type, ksize):
+    # ореол — радиус ядра (ksize делается нечётным так же, как в blur_image)
+    halo = (ksize | 1) // 2
+    return ex.map(buf, lambda t: blur_image(t, type, ksize), halo=halo)
+
+
+# ===================== КОНВЕЙЕР =====================
+
+def parse_steps(data):
+    """
+    Разбирает список шагов [{"action": "resize", "w": 800}, ...]
+    (JSON-строка или список) и проверяет параметры до начала обработки.
+    Возвращает [(операция, kwargs), ...].
+    """
+    if isinstance(data, str):
+        try:
+            data = json.loads(data)
+        except ValueError:
+            raise ValueError("Неверный формат списка действий")
+
+    if not isinstance(data, list) or not data:
+        raise ValueError("Список действий пуст")
+
+    steps = []
+    for step in data:
+        if not isinstance(step, dict):
+            raise ValueError("Неверный формат шага")
+        op = get_operation(step.get("action"))
+        steps.append((op, op.parse(step)))
+    return steps
+
+
+def steps_signature(steps):
+    """
+    Нормализованные шаги [[действие, параметры], ...] для ключа кэша результатов.
+    None, если результат невоспроизводим (шаг с seed, который не задан).
+    """
+    signature = []
+    for op, kwargs in steps:
+        if "seed" in kwargs and kwargs["seed"] is None:
+            return None
+        signature.append([op.name, kwargs])
+    return signature
+
+
+def run_pipeline(img, steps, on_step=None):
+    """
+    Прогоняет изображение через все шаги в памяти.
+    on_step(номер выполненного шага, всего шагов) — для прогресса фоновых заданий.
+    Возвращает (результат, [{"action": ..., "ms": ...}, ...]).
+
+    Подряд идущие геометрические шаги (поворот, отражение, масштаб, обрезка)
+    сливаются в одно преобразование с одной интерполяцией (см. AffineChain).
+    """
+    timings = []
+    i = 0
+    while i < len(steps):
+        start = time.perf_counter()
+
+        run = 0
+        while i + run < len(steps) and steps[i + run][0].geometry is not None:
+            run += 1
+
+        if run > 1:
+            chain = AffineChain(img.shape[1], img.shape[0])
+            for op, kwargs in steps[i:i + run]:
+                op.geometry(chain, **kwargs)
+            img = chain.apply(img)
+            names = [op.name for op, _ in steps[i:i + run]]
+        else:
+            op, kwargs = steps[i]
+            img = op.apply(img, kwargs)
+            names, run = [op.name], 1
+
+        timings.append({
+            "action": "+".join(names),
+            "ms": round((time.perf_counter() - start) * 1000, 2)
+        })
+        i += run
+        if on_step:
+            on_step(i, len(steps))
+    return img, timings
+
+
+def run_pipeline_tiled(executor, buffer, steps):
+    """
+    То же, что run_pipeline, но по тайлам: буфер RawBuffer на диске,
+    в памяти — не больше потолка executor. Промежуточные буферы удаляются.
+    Возвращает (буфер результата, тайминги).
+    """
+    timings = []
+    for op, kwargs in steps:
+        start = time.perf_counter()
+        result = op.apply_tiled(executor, buffer, kwargs)
+        buffer.delete()
+        buffer = result
+        timings.append({
+            "action": op.name,
+            "ms": round((time.perf_counter() - start) * 1000, 2)
+        })
+    return buffer, timings
@@ -1,29 +1,115 @@
-from flask import Blueprint, render_template, request, jsonify, send_from_directory
+from flask import Blueprint, render_template, request, jsonify, send_from_directory, send_file, Response
 from werkzeug.utils import secure_filename
 import base64
+import io
 import numpy as np
 import cv2
 import os
+import time
 
-from image_tools import (
-    read_uploaded_image,
-    decode_base64_image,
-    encode_image_base64,
-    resize_image,
-    crop_image,
-    rotate_image,
-    flip_image,
-    brightness_contrast,
-    color_balance,
-    add_noise,
-    blur_image
-)
+from src.routes.workspace import wants_async, accepted
+from src.services.job_queue import jobs, QueueFull
+from src.utils.export_engine import ExportSpec, encode
+from src.utils.image_handles import HandleStore, MIME_TYPES, data_hash
+from src.utils.result_cache import result_cache, CachedResult
+from src.utils.proxy_pyramid import ProxyPyramid, ProxyStore
+from operations import OPERATIONS, get_operation, parse_steps, steps_signature, run_pipeline
+from image_tools import read_uploaded_image, decode_base64_image
 
 bp = Blueprint("main", __name__)
 
 ALLOWED_EXT = {'.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff'}
 OUTPUT_DIR = "static/outputs"
 
+# декодированные изображения /process по хэшу содержимого
+handles = HandleStore()
+
+# пирамиды превью для изображений, загруженных через /process (ключ — handle)
+proxy_store = ProxyStore()
+
+def result_response(result, **extra):
+    """
+    Ответ /process: handle результата и ссылка на бинарное изображение.
+    base64 data URL добавляется, только если клиент не просил response=handle.
+    result — запись кэша результатов (CachedResult): известные handle
+    и закодированные байты из неё не вычисляются заново.
+    """
+    img = result.image
+    result.handle = handles.put(img, result.handle, result.encoded)
+    h, w = img.shape[:2]
+    payload = dict(handle=result.handle, url=f"/process/image/{result.handle}", width=w, height=h, **extra)
+
+    if request.form.get("response") != "handle":
+        start = time.perf_counter()
+        data = result.encoded.get("png")
+        if data is None:
+            data = handles.encoded(result.handle, "png")
+            result_cache.attach(result, "png", data)
+        b64 = base64.b64encode(data).decode("utf-8")
+        payload["result"] = f"data:image/png;base64,{b64}"
+        payload["encode_ms"] = round((time.perf_counter() - start) * 1000, 2)
+
+    return jsonify(payload)
+
+
+def request_source():
+    """
+    Исходное изображение запроса /process без декодирования.
+    Возвращает (ключ источника для кэша результатов, функция загрузки)
+    или (None, ответ с ошибкой).
+    """
+    if "image" in request.files and request.files["image"].filename:
+        f = request.files["image"]
+        ext = os.path.splitext(f.filename.lower())[1]
+        if ext not in ALLOWED_EXT:
+            return None, (jsonify(error="Неподдерживаемый формат"), 400)
+        data = f.read()
+        return f"file:{data_hash(data)}", lambda: read_uploaded_image(io.BytesIO(data))
+
+    if request.form.get("handle"):
+        handle = request.form["handle"]
+        img = handles.get(handle)
+        if img is None:
+            return None, (jsonify(
+                error="Изображение не найдено, загрузите его заново",
+                handle_missing=True
+            ), 404)
+        return handle, lambda: img
+
+    if request.form.get("image_b64"):
+        b64 = request.form["image_b64"]
+
+        def load():
+            img = decode_base64_image(b64)
+            if img is None:
+                raise ValueError("Ошибка декодирования base64")
+            return img
+
+        return f"b64:{data_hash(b64.encode())}", load
+
+    return None, (jsonify(error="Изображение не отправлено"), 400)
+
+
+def run_cached(source, load, steps, on_step=None):
+    """
+    Результат цепочки из кэша результатов или вычисленный (с записью в кэш).
+    При попадании изображение не декодируется и не обрабатывается.
+    Возвращает (CachedResult, тайминги, время декодирования в мс или None).
+    """
+    signature = steps_signature(steps)
+    key = result_cache.key(source, "process", signature) if signature is not None else None
+
+    result = result_cache.get(key) if key else None
+    if result is not None:
+        return result, [], None
+
+    start = time.perf_counter()
+    img = load()
+    decode_ms = round((time.perf_counter() - start) * 1000, 2)
+
+    new_img, timings = run_pipeline(img, steps, on_step)
+    return result_cache.put(key, new_img), timings, decode_ms
+
 
 @bp.route("/")
 def index():
@@ -35,102 +121,131 @@ def process():
     try:
         action = request.form.get("action")
 
-        img = None
-        if "image" in request.files and request.files["image"].filename:
-            f = request.files["image"]
-            ext = os.path.splitext(f.filename.lower())[1]
-            if ext not in ALLOWED_EXT:
-                return jsonify(error="Неподдерживаемый формат"), 400
-            img = read_uploaded_image(f)
+        source, load = request_source()
+        if source is None:
+            return load
 
-        elif request.form.get("image_b64"):
-            img = decode_base64_image(request.form["image_b64"])
-            if img is None:
-                return jsonify(error="Ошибка декодирования base64"), 400
+        # цепочка действий: actions=[{"action": "resize", "w": 800}, ...]
+        # картинка декодируется и кодируется один раз на всю цепочку
+        if action == "pipeline" or (not action and request.form.get("actions")):
+            steps = parse_steps(request.form.get("actions"))
+        elif action in OPERATIONS:
+            steps = parse_steps([request.form.to_dict()])
         else:
-            return jsonify(error="Изображение не отправлено"), 400
+            steps = None
 
-        h, w = img.shape[:2]
+        if steps is not None:
+            if wants_async():
+                return process_async(source, load, steps)
+            result, timings, decode_ms = run_cached(source, load, steps)
+            return result_response(result, timings=timings, decode_ms=decode_ms, cached=decode_ms is None)
 
+        img = load()
+        h, w = img.shape[:2]
 
         if action == "upload":
-            return jsonify(
-                result=encode_image_base64(img),
-                info=f"Загружено: {w}×{h}"
+            handle = handles.put(img)
+            if proxy_store.get(handle) is None:
+                proxy_store.add(ProxyPyramid(img), handle)
+            return result_response(
+                CachedResult(img, handle),
+                info=f"Загружено: {w}×{h}",
+                proxy_id=handle
             )
 
-        if action == "resize":
-            interp = request.form.get("interp", "INTER_LINEAR")
-            tw = request.form.get("w")
-            th = request.form.get("h")
-            new_img = resize_image(img, tw, th, interp)
-            return jsonify(result=encode_image_base64(new_img))
-
-        if action == "crop":
-            x = int(request.form.get("x"))
-            y = int(request.form.get("y"))
-            cw = int(request.form.get("w"))
-            ch = int(request.form.get("h"))
-            new_img = crop_image(img, x, y, cw, ch)
-            return jsonify(result=encode_image_base64(new_img))
-
-        if action == "rotate":
-            angle = float(request.form.get("angle"))
-            cx = request.form.get("cx")
-            cy = request.form.get("cy")
-            new_img = rotate_image(img, angle, cx, cy)
-            return jsonify(result=encode_image_base64(new_img))
-
-        if action == "flip":
-            mode = request.form.get("mode", "h")
-            new_img = flip_image(img, mode)
-            return jsonify(result=encode_image_base64(new_img))
-
-        if action == "bc":
-            alpha = float(request.form.get("alpha"))
-            beta = float(request.form.get("beta"))
-            new_img = brightness_contrast(img, alpha, beta)
-            return jsonify(result=encode_image_base64(new_img))
-
-        if action == "color":
-            r = float(request.form.get("r"))
-            g = float(request.form.get("g"))
-            b = float(request.form.get("b"))
-            new_img = color_balance(img, r, g, b)
-            return jsonify(result=encode_image_base64(new_img))
-
-        if action == "noise":
-            t = request.form.get("type")
-            a = float(request.form.get("amount"))
-            new_img = add_noise(img, t, a)
-            return jsonify(result=encode_image_base64(new_img))
-
-        if action == "blur":
-            t = request.form.get("type")
-            k = int(request.form.get("ksize"))
-            new_img = blur_image(img, t, k)
-            return jsonify(result=encode_image_base64(new_img))
-
         if action == "save":
-            fmt = request.form.get("format", "jpg")
-            name = secure_filename(request.form.get("name", "edited"))
-            quality = int(request.form.get("quality", 90))
+            # кодируется в памяти и отдаётся ответом, без файла в static/outputs
+            spec = ExportSpec.from_dict({**request.form.to_dict(), "format": request.form.get("format", "jpg")})
+            name = secure_filename(request.form.get("name", "edited")) or "edited"
+            return send_file(
+                io.BytesIO(encode(img, spec)),
+                mimetype=spec.mimetype,
+                as_attachment=True,
+                download_name=f"{name}.{spec.extension}"
+            )
 
-            out_path = f"{OUTPUT_DIR}/{name}.{fmt}"
+        return jsonify(error="Неизвестное действие"), 400
 
-            if fmt == "jpg":
-                cv2.imwrite(out_path, img, [cv2.IMWRITE_JPEG_QUALITY, quality])
-            else:
-                cv2.imwrite(out_path, img)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    except Exception as e:
+        return jsonify(error=str(e)), 500
 
-            return jsonify(
-                result=encode_image_base64(img),
-                saved_path=f"/{out_path}",
-                saved_name=f"{name}.{fmt}"
-            )
 
-        return jsonify(error="Неизвестное действие"), 400
+def process_async(source, load, steps):
+    """
+    Цепочка действий в фоновом задании: сразу 202, результат — handle
+    в /jobs/<id>/result, прогресс — по шагам.
+    """
+    def task(job):
+        result, timings, _ = run_cached(
+            source, load, steps,
+            on_step=lambda done, total: job.report(done / total, f"Шаг {done} из {total}")
+        )
+        result.handle = handles.put(result.image, result.handle, result.encoded)
+        h, w = result.image.shape[:2]
+        return dict(handle=result.handle, url=f"/process/image/{result.handle}", width=w, height=h, timings=timings)
 
+    try:
+        job = jobs.submit("process", task)
+    except QueueFull as e:
+        return jsonify(error=str(e)), 503
+    return accepted(job)
+
+
+@bp.route("/process/image/<handle>", methods=["GET"])
+def process_image(handle):
+    """
+    Бинарное изображение по handle. Содержимое по handle не меняется,
+    поэтому ответ кэшируется браузером без ограничений.
+    """
+    fmt = request.args.get("format", "png").lower()
+    if fmt not in MIME_TYPES:
+        return jsonify(error="Неподдерживаемый формат"), 400
+
+    etag = f"{handle}.{fmt}"
+    if request.if_none_match.contains(etag):
+        resp = Response(status=304)
+    else:
+        data = handles.encoded(handle, fmt)
+        if data is None:
+            return jsonify(error="Изображение не найдено", handle_missing=True), 404
+        resp = Response(data, mimetype=MIME_TYPES[fmt])
+
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    return resp
+
+
+@bp.route("/process/preview", methods=["POST"])
+def process_preview():
+    """
+    Быстрое превью действия на уменьшенной копии из пирамиды,
+    подходящей под область просмотра (vw × vh). Возвращает JPEG.
+    """
+    try:
+        pyramid = proxy_store.get(request.form.get("proxy_id", ""))
+        if pyramid is None:
+            return jsonify(error="Превью не найдено, загрузите изображение заново"), 404
+
+        vw = int(request.form.get("vw", 1024))
+        vh = int(request.form.get("vh", 768))
+        scale, proxy = pyramid.best_for(vw, vh)
+
+        op = get_operation(request.form.get("action"))
+        kwargs = op.parse(request.form)
+        if scale > 1:
+            kwargs = op.scale(kwargs, scale)
+        new_img = op.apply(proxy, kwargs)
+
+        ok, buf = cv2.imencode(".jpg", new_img, [cv2.IMWRITE_JPEG_QUALITY, 85])
+        return Response(buf.tobytes(), mimetype="image/jpeg", headers={
+            "Cache-Control": "no-store",
+            "X-Preview-Scale": str(scale)
+        })
+
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
     except Exception as e:
         return jsonify(error=str(e)), 500
 
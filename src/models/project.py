@@ -1,8 +1,13 @@
 # models/project.py
 import json
+import os
 import uuid
 from datetime import datetime
 
+from src.models.project_index import project_index
+from src.models.project_store import project_store, read_document
+from src.utils.metrics import timed
+
 
 class Project:
     def __init__(self, name="Новый проект", width=800, height=600, unit="px"):
@@ -15,6 +20,7 @@ class Project:
         self.unit = unit
         self.layers = []
         self.history = []
+        self.revision = 0
         self.current_state = None
 
     def add_layer(self, layer):
@@ -31,23 +37,34 @@ class Project:
             "height": self.height,
             "unit": self.unit,
             "layers": self.layers,
-            "history": self.history[-10:]  # Последние 10 действий
+            "history": self.history[-10:],  # Последние 10 действий
+            "revision": self.revision
         }
 
+    @timed("Project.save")
     def save(self, folder='projects'):
         filename = f"{folder}/{self.id}.json"
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+        if folder == project_store.folder:
+            # компактный снимок, атомарная запись; журнал правок сворачивается
+            project_store.save(self.id, self.to_dict())
+            project_index.refresh(self.id)
+        else:
+            with open(filename, 'w', encoding='utf-8') as f:
+                json.dump(self.to_dict(), f, ensure_ascii=False, separators=(',', ':'))
         return filename
 
     @classmethod
     def load(cls, filename):
-        with open(filename, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        folder, name = os.path.split(filename)
+        if folder == project_store.folder and name.endswith('.json'):
+            data = project_store.load(name[:-5])  # снимок + журнал правок
+        else:
+            data = read_document(filename)
         project = cls(data['name'], data['width'], data['height'], data['unit'])
         project.id = data['id']
         project.created = data['created']
         project.modified = data['modified']
         project.layers = data['layers']
         project.history = data.get('history', [])
+        project.revision = data.get('revision', 0)
         return project
\ No newline at end of file
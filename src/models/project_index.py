@@ -0,0 +1,216 @@
+import os
+import sqlite3
+import threading
+import time
+
+from src.models.project_store import project_store, valid_id
+
+SORT_COLUMNS = {
+    "modified": "modified",
+    "created": "created",
+    "name": "name_lower",
+    "size": "file_size",
+}
+
+FILTERS = {
+    "all": "",
+    "favorites": "favorite = 1",
+    "archived": "archived = 1",
+}
+
+RECENT_SECONDS = 7 * 24 * 60 * 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (
+    id           TEXT PRIMARY KEY,
+    name         TEXT NOT NULL,
+    name_lower   TEXT NOT NULL,
+    description  TEXT,
+    created      TEXT,
+    modified     TEXT,
+    width        REAL,
+    height       REAL,
+    unit         TEXT,
+    favorite     INTEGER NOT NULL DEFAULT 0,
+    archived     INTEGER NOT NULL DEFAULT 0,
+    layer_count  INTEGER NOT NULL DEFAULT 0,
+    file_size    INTEGER NOT NULL DEFAULT 0,
+    mtime        REAL NOT NULL DEFAULT 0,
+    content_hash TEXT
+);
+CREATE INDEX IF NOT EXISTS projects_modified ON projects (modified);
+CREATE INDEX IF NOT EXISTS projects_name ON projects (name_lower);
+CREATE INDEX IF NOT EXISTS projects_mtime ON projects (mtime);
+"""
+
+
+class ProjectIndex:
+    """
+    Индекс метаданных проектов в SQLite (projects/index.sqlite3).
+
+    Список, поиск и статистика читают только индекс и не открывают
+    файлы проектов. Индекс обновляется при каждой записи проекта
+    (refresh) и удалении (remove); при первом обращении он сверяется
+    с папкой по mtime и размеру файлов — изменённые в обход приложения
+    проекты переиндексируются.
+    """
+
+    def __init__(self, store, db_name: str = "index.sqlite3"):
+        self.store = store
+        self.folder = store.folder
+        self.db_path = os.path.join(store.folder, db_name)
+        self._conn = None
+        self._lock = threading.RLock()
+
+    # ===================== ОБНОВЛЕНИЕ =====================
+
+    def refresh(self, project_id: str):
+        """
+        Переиндексирует проект после записи его файла.
+        """
+        try:
+            # документ обычно уже в памяти хранилища — сразу после записи
+            data = self.store.load(project_id, layers=False)
+            mtime, size = self.store.stat(project_id)
+            version = self.store.version(project_id)
+        except FileNotFoundError:
+            self.remove(project_id)
+            return
+        except (ValueError, OSError) as e:
+            print(f"Ошибка индексации проекта {project_id}: {e}")
+            return
+
+        with self._lock:
+            self._db().execute(
+                "INSERT OR REPLACE INTO projects (id, name, name_lower, description, created, modified,"
+                " width, height, unit, favorite, archived, layer_count, file_size, mtime, content_hash)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                _row(project_id, data, size, mtime, version)
+            )
+            self._conn.commit()
+
+    def remove(self, project_id: str):
+        with self._lock:
+            self._db().execute("DELETE FROM projects WHERE id = ?", (project_id,))
+            self._conn.commit()
+
+    def sync(self):
+        """
+        Сверяет индекс с папкой проектов: новые и изменённые файлы
+        индексируются, записи удалённых — убираются. Файлы читаются
+        только если изменились их mtime или размер.
+        """
+        with self._lock:
+            db = self._db()
+            known = {row[0]: (row[1], row[2]) for row in db.execute("SELECT id, mtime, file_size FROM projects")}
+
+            seen = set()
+            if os.path.isdir(self.folder):
+                for entry in os.scandir(self.folder):
+                    if not entry.name.endswith(".json"):
+                        continue
+                    project_id = entry.name[:-5]
+                    if not valid_id(project_id):
+                        continue  # не файл проекта хранилища
+                    seen.add(project_id)
+                    try:
+                        stamp = self.store.stat(project_id)
+                    except FileNotFoundError:
+                        continue
+                    if known.get(project_id) != stamp:
+                        self.refresh(project_id)
+
+            for project_id in set(known) - seen:
+                db.execute("DELETE FROM projects WHERE id = ?", (project_id,))
+            db.commit()
+
+    # ===================== ЧТЕНИЕ =====================
+
+    def list(self, page: int = 1, per_page: int = 50, sort: str = "modified", order: str = "desc",
+             query: str = None, filter: str = "all"):
+        """
+        Страница списка проектов. Возвращает (проекты, всего подходящих).
+        query — подстрока имени (без учёта регистра).
+        """
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"Неверная сортировка: {sort}")
+        if filter not in FILTERS and filter != "recent":
+            raise ValueError(f"Неверный фильтр: {filter}")
+        direction = "ASC" if order == "asc" else "DESC"
+
+        where, params = [], []
+        if filter == "recent":
+            where.append("mtime > ?")
+            params.append(time.time() - RECENT_SECONDS)
+        elif FILTERS[filter]:
+            where.append(FILTERS[filter])
+        if query:
+            escaped = query.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            where.append("name_lower LIKE ? ESCAPE '\\'")
+            params.append(f"%{escaped}%")
+        clause = f"WHERE {' AND '.join(where)}" if where else ""
+
+        with self._lock:
+            db = self._db()
+            total = db.execute(f"SELECT COUNT(*) FROM projects {clause}", params).fetchone()[0]
+            rows = db.execute(
+                f"SELECT * FROM projects {clause} ORDER BY {SORT_COLUMNS[sort]} {direction}, id"
+                " LIMIT ? OFFSET ?",
+                params + [per_page, (page - 1) * per_page]
+            ).fetchall()
+        return [_to_dict(row) for row in rows], total
+
+    def stats(self) -> dict:
+        with self._lock:
+            total, size, recent = self._db().execute(
+                "SELECT COUNT(*), COALESCE(SUM(file_size), 0),"
+                " COALESCE(SUM(mtime > ?), 0) FROM projects",
+                (time.time() - RECENT_SECONDS,)
+            ).fetchone()
+        return {"total_projects": total, "recent_projects": recent, "total_size_bytes": size}
+
+    # ===================== ВНУТРЕННИЕ =====================
+
+    def _db(self):
+        if self._conn is None:
+            os.makedirs(self.folder, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.executescript(SCHEMA)
+            self.sync()
+        return self._conn
+
+
+def _row(project_id, data, size, mtime, version):
+    name = str(data.get("name") or "")
+    layers = data.get("layers") or []
+    return (
+        project_id, name, name.lower(), data.get("description"),
+        data.get("created"), data.get("modified"),
+        data.get("width"), data.get("height"), data.get("unit"),
+        int(bool(data.get("favorite"))), int(bool(data.get("archived"))),
+        len(layers) if isinstance(layers, list) else 0,
+        size, mtime,
+        version,  # версия содержимого — для URL миниатюры
+    )
+
+
+def _to_dict(row) -> dict:
+    return {
+        "id": row["id"],
+        "name": row["name"],
+        "description": row["description"],
+        "created": row["created"],
+        "modified": row["modified"],
+        "width": row["width"],
+        "height": row["height"],
+        "unit": row["unit"],
+        "favorite": bool(row["favorite"]),
+        "archived": bool(row["archived"]),
+        "layerCount": row["layer_count"],
+        "fileSize": row["file_size"],
+        "contentHash": row["content_hash"],
+    }
+
+
+project_index = ProjectIndex(project_store)
@@ -1,40 +1,59 @@
 import os
 
+import cv2
+
+from src.utils.image_cache import image_cache
+from src.utils.raw_format import EXTENSION, write_raw
+
 
 class ProjectModel:
     """
     Хранит все пути и параметры проекта редактирования изображения.
     """
 
-    def __init__(self, upload_dir: str):
+    def __init__(self, upload_dir: str, working_format: str = "raw"):
         self.upload_dir = upload_dir
 
-        # основные файлы
-        self.original_path = os.path.join(upload_dir, "original.png")
-        self.current_path = os.path.join(upload_dir, "current.png")
-
-        # история
-        self.history_dir = os.path.join(upload_dir, "history")
+        # основные файлы — в рабочем формате: "raw" (без кодирования, см. raw_format)
+        # или "png". PNG/JPEG/TIFF для пользователя делает только экспорт
+        if working_format not in ("raw", "png"):
+            raise ValueError(f"Неизвестный рабочий формат: {working_format}")
+        self.working_format = working_format
+        ext = EXTENSION if working_format == "raw" else ".png"
+        self.original_path = os.path.join(upload_dir, f"original{ext}")
+        self.current_path = os.path.join(upload_dir, f"current{ext}")
+
+        # история (хранится в памяти, на диск выгружается только при вытеснении)
+        self.history_path = os.path.join(upload_dir, "history.bin")
         self.max_history = 10
+        self.history_budget = 64 * 1024 * 1024  # байт
 
         # гарантируем наличие директорий
         os.makedirs(self.upload_dir, exist_ok=True)
-        os.makedirs(self.history_dir, exist_ok=True)
+        self._migrate_png()
 
     # ===================== ПРОВЕРКИ СОСТОЯНИЯ =====================
 
     def has_original(self) -> bool:
-        return os.path.exists(self.original_path)
+        return image_cache.contains(self.original_path) or os.path.exists(self.original_path)
 
     def has_current(self) -> bool:
-        return os.path.exists(self.current_path)
+        return image_cache.contains(self.current_path) or os.path.exists(self.current_path)
 
-    # ===================== УТИЛИТЫ =====================
+    # ===================== МИГРАЦИЯ =====================
 
-    def clear_history(self):
-        if not os.path.exists(self.history_dir):
+    def _migrate_png(self):
+        """
+        Проекты, сохранённые до появления рабочего формата, хранят original.png
+        и current.png — переводим их в .raw один раз при открытии.
+        """
+        if self.working_format != "raw":
             return
-        for f in os.listdir(self.history_dir):
-            path = os.path.join(self.history_dir, f)
-            if os.path.isfile(path):
-                os.remove(path)
+        for path in (self.original_path, self.current_path):
+            legacy = os.path.splitext(path)[0] + ".png"
+            if os.path.exists(path) or not os.path.exists(legacy):
+                continue
+            image = cv2.imread(legacy)
+            if image is not None:
+                write_raw(path, image, image_cache.raw_codec)
+                os.remove(legacy)
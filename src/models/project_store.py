@@ -0,0 +1,500 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from src.utils.metrics import timed
+
+
+HISTORY_LIMIT = 10  # как в Project.to_dict
+
+# журнал сжимается в снимок, когда он больше доли снимка (но не меньше порога)
+JOURNAL_MIN_BYTES = 64 * 1024
+JOURNAL_RATIO = 0.5
+
+# поля верхнего уровня, которые нельзя менять через "set"
+RESERVED = {"id", "layers", "history", "revision"}
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+# id проекта — часть имени файла: только буквы, цифры, "-" и "_"
+ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,128}$")
+
+
+def valid_id(project_id) -> bool:
+    return isinstance(project_id, str) and ID_PATTERN.match(project_id) is not None
+
+
+def check_id(project_id):
+    """
+    ValueError, если id нельзя использовать в имени файла (например, "../x").
+    """
+    if not valid_id(project_id):
+        raise ValueError("Неверный id проекта")
+    return project_id
+
+
+class _Doc:
+    __slots__ = ("data", "digest", "stamp", "snapshot_bytes", "journal_bytes")
+
+    def __init__(self, data, digest, stamp, snapshot_bytes, journal_bytes):
+        self.data = data
+        self.digest = digest  # хэш байтов снимка
+        self.stamp = stamp  # (mtime_ns снимка, размер снимка, размер журнала)
+        self.snapshot_bytes = snapshot_bytes
+        self.journal_bytes = journal_bytes
+
+
+class ProjectStore:
+    """
+    Хранилище файлов проектов.
+
+    projects/<id>.json     — снимок: компактный JSON (без отступов),
+                             при compress=True — gzip; читаются оба варианта.
+    projects/<id>.journal  — журнал правок: по строке JSON на патч, только дозапись.
+    projects/blobs/ab/<хэш> — содержимое слоёв по хэшу, пишется один раз.
+
+    Снимок и журнал хранят вместо слоёв ссылки {"id", "$blob"}: одинаковые
+    слои (копии проекта, повторные сохранения без изменений) лежат на диске
+    в одном экземпляре, дублирование проекта копирует только ссылки, а тела
+    слоёв читаются лишь когда нужны (load(..., layers=False) их не трогает).
+    Слои, на которые больше никто не ссылается, удаляет gc().
+
+    Снимок пишется атомарно (временный файл + rename). Патч дописывает в журнал
+    одну строку, поэтому объём записи зависит от размера правки, а не документа.
+    Когда журнал разрастается, документ сворачивается в новый снимок.
+
+    У документа есть revision: номер последнего применённого патча. Строки журнала
+    с номером не больше revision снимка при чтении пропускаются — сбой между
+    записью снимка и удалением журнала не применит правки дважды.
+
+    Недавно открытые документы держатся в памяти (сверка по mtime и размерам
+    файлов), так что серия автосохранений не перечитывает документ.
+    """
+
+    def __init__(self, folder: str = "projects", compress: bool = False, max_cached: int = 16,
+                 max_blobs: int = 1024):
+        self.folder = folder
+        self.compress = compress
+        self.max_cached = max_cached
+        self.max_blobs = max_blobs
+        self._docs = OrderedDict()  # id -> _Doc
+        self._blobs = OrderedDict()  # хэш -> тело слоя (неизменяемо, можно держать сколько угодно)
+        self._lock = threading.RLock()
+
+    # ===================== ПУТИ =====================
+
+    def snapshot_path(self, project_id: str) -> str:
+        return os.path.join(self.folder, f"{check_id(project_id)}.json")
+
+    def journal_path(self, project_id: str) -> str:
+        return os.path.join(self.folder, f"{check_id(project_id)}.journal")
+
+    def blob_path(self, digest: str) -> str:
+        return os.path.join(self.folder, "blobs", digest[:2], digest)
+
+    def exists(self, project_id: str) -> bool:
+        return valid_id(project_id) and os.path.exists(self.snapshot_path(project_id))
+
+    # ===================== ЧТЕНИЕ =====================
+
+    def load(self, project_id: str, layers: bool = True) -> dict:
+        """
+        Документ проекта (снимок + журнал). Возвращает копию верхнего уровня:
+        списки слоёв и истории можно заменять и дополнять без влияния на кэш.
+        layers=False — слои остаются ссылками {"id", "$blob"}, тела не читаются.
+        FileNotFoundError — если проекта нет.
+        """
+        with self._lock:
+            data = _copy(self._get(project_id).data)
+            if layers:
+                data["layers"] = [self._layer_body(layer) for layer in data["layers"]]
+            return data
+
+    def layer(self, project_id: str, layer_id):
+        """
+        Тело одного слоя или None, если такого слоя нет.
+        """
+        with self._lock:
+            for layer in self._get(project_id).data["layers"]:
+                if isinstance(layer, dict) and layer.get("id") == layer_id:
+                    return self._layer_body(layer)
+        return None
+
+    def version(self, project_id: str):
+        """
+        Версия содержимого: хэш снимка и номер правки. Меняется при любой
+        записи; None — если проекта нет.
+        """
+        with self._lock:
+            try:
+                doc = self._get(project_id)
+            except FileNotFoundError:
+                return None
+            return f"{doc.digest}.{doc.data.get('revision', 0)}"
+
+    def stat(self, project_id: str):
+        """
+        (время изменения, суммарный размер снимка и журнала) — только stat, без чтения.
+        """
+        st = os.stat(self.snapshot_path(project_id))
+        mtime, size = st.st_mtime, st.st_size
+        try:
+            jst = os.stat(self.journal_path(project_id))
+            mtime, size = max(mtime, jst.st_mtime), size + jst.st_size
+        except FileNotFoundError:
+            pass
+        return mtime, size
+
+    # ===================== ЗАПИСЬ =====================
+
+    @timed("ProjectStore.save")
+    def save(self, project_id: str, data: dict):
+        """
+        Полная запись документа: новый снимок, журнал удаляется.
+        ValueError — layers или history не списки.
+        """
+        layers, history = data.get("layers") or [], data.get("history") or []
+        if not isinstance(layers, list) or not isinstance(history, list):
+            raise ValueError("layers и history должны быть списками")
+
+        with self._lock:
+            data = _copy(data)
+            data["id"] = project_id
+            data["history"] = history[-HISTORY_LIMIT:]
+            data["layers"] = [self._put_layer(layer) for layer in layers]
+            if "revision" not in data:
+                try:
+                    data["revision"] = self._get(project_id).data.get("revision", 0)
+                except FileNotFoundError:
+                    data["revision"] = 0
+            self._write_snapshot(project_id, data)
+
+    @timed("ProjectStore.patch")
+    def patch(self, project_id: str, changes: dict) -> dict:
+        """
+        Применяет правку и дописывает её в журнал.
+
+          set     — поля верхнего уровня (name, svg, favorite, ...)
+          layers  — слои целиком: замена по id или добавление в конец
+          remove  — id удаляемых слоёв
+          order   — новый порядок id слоёв (не названные идут следом)
+          history — записи, добавляемые в историю
+
+        Возвращает {"revision", "modified"}. ValueError — неверная правка.
+        """
+        entry = _normalize(changes)
+        with self._lock:
+            doc = self._get(project_id)
+            if "layers" in entry:
+                entry["layers"] = [self._put_layer(layer) for layer in entry["layers"]]
+            entry["rev"] = doc.data.get("revision", 0) + 1
+            entry["set"]["modified"] = datetime.now().isoformat()
+
+            line = (json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+            path = self.journal_path(project_id)
+            with open(path, "ab") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+            _apply(doc.data, entry)
+            doc.journal_bytes += len(line)
+            st = os.stat(self.snapshot_path(project_id))
+            doc.stamp = (st.st_mtime_ns, st.st_size, doc.journal_bytes)
+
+            if doc.journal_bytes > max(JOURNAL_MIN_BYTES, doc.snapshot_bytes * JOURNAL_RATIO):
+                self.compact(project_id)
+
+            return {"revision": doc.data["revision"], "modified": doc.data["modified"]}
+
+    @timed("ProjectStore.compact")
+    def compact(self, project_id: str):
+        """
+        Сворачивает журнал в снимок.
+        """
+        with self._lock:
+            doc = self._get(project_id)
+            if doc.journal_bytes:
+                self._write_snapshot(project_id, doc.data)
+
+    def duplicate(self, project_id: str, new_id: str, fields: dict) -> dict:
+        """
+        Копия проекта: новый снимок со ссылками на те же слои, тела не копируются.
+        fields — поля копии (name, created, modified, ...). Возвращает документ
+        копии без тел слоёв.
+        """
+        with self._lock:
+            data = _copy(self._get(project_id).data)
+            data.update(fields)
+            data.update(id=new_id, history=[], revision=0)
+            self._write_snapshot(new_id, data)
+            return _copy(data)
+
+    def gc(self) -> int:
+        """
+        Удаляет слои, на которые не ссылается ни один снимок или журнал.
+        Возвращает число удалённых файлов.
+
+        Если хотя бы один проект не читается, его ссылки неизвестны — сборка
+        прерывается с ValueError, ничего не удаляя.
+        """
+        with self._lock:
+            used = set()
+            for name in os.listdir(self.folder) if os.path.isdir(self.folder) else []:
+                project_id, ext = os.path.splitext(name)
+                if ext != ".json" or not valid_id(project_id):
+                    continue
+                try:
+                    data = self._get(project_id).data
+                except FileNotFoundError:
+                    continue  # удалён между listdir и чтением
+                except (OSError, ValueError) as e:
+                    raise ValueError(f"Проект {project_id} не читается, сборка мусора отменена: {e}")
+                used.update(layer["$blob"] for layer in data["layers"] if _is_ref(layer))
+                # журнал мог сослаться на слои, которые потом заменены, — они тоже живы до сжатия
+                try:
+                    with open(self.journal_path(project_id), "rb") as f:
+                        for line in f:
+                            try:
+                                entry = json.loads(line)
+                            except ValueError:
+                                break
+                            used.update(l["$blob"] for l in entry.get("layers", []) if _is_ref(l))
+                except FileNotFoundError:
+                    pass
+
+            removed = 0
+            root = os.path.join(self.folder, "blobs")
+            for dirpath, _, files in os.walk(root):
+                for name in files:
+                    if name not in used:
+                        os.remove(os.path.join(dirpath, name))
+                        self._blobs.pop(name, None)
+                        removed += 1
+            return removed
+
+    def delete(self, project_id: str):
+        with self._lock:
+            self._docs.pop(project_id, None)
+            for path in (self.snapshot_path(project_id), self.journal_path(project_id)):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    # ===================== ВНУТРЕННИЕ =====================
+
+    def _get(self, project_id: str) -> _Doc:
+        stamp = self._stamp(project_id)
+        doc = self._docs.get(project_id)
+        if doc is not None and doc.stamp == stamp:
+            self._docs.move_to_end(project_id)
+            return doc
+
+        with open(self.snapshot_path(project_id), "rb") as f:
+            raw = f.read()
+        data = json.loads(gzip.decompress(raw) if raw[:2] == GZIP_MAGIC else raw)
+        data.setdefault("layers", [])
+        data.setdefault("history", [])
+        data.setdefault("revision", 0)
+
+        journal_bytes = 0
+        try:
+            with open(self.journal_path(project_id), "rb") as f:
+                journal = f.read()
+        except FileNotFoundError:
+            journal = b""
+        for line in journal.splitlines(keepends=True):
+            if not line.endswith(b"\n"):
+                break  # оборванная последняя строка — дозапись не завершилась
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                break
+            journal_bytes += len(line)
+            if entry.get("rev", 0) > data["revision"]:
+                _apply(data, entry)
+
+        if journal_bytes < len(journal):
+            # хвост отбрасывается, иначе следующая правка допишется к обрывку
+            with open(self.journal_path(project_id), "r+b") as f:
+                f.truncate(journal_bytes)
+
+        doc = _Doc(data, _digest(raw), (stamp[0], stamp[1], journal_bytes), len(raw), journal_bytes)
+        self._remember(project_id, doc)
+        return doc
+
+    def _stamp(self, project_id: str):
+        st = os.stat(self.snapshot_path(project_id))
+        try:
+            journal = os.path.getsize(self.journal_path(project_id))
+        except FileNotFoundError:
+            journal = 0
+        return st.st_mtime_ns, st.st_size, journal
+
+    def _write_snapshot(self, project_id: str, data: dict):
+        raw = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        if self.compress:
+            raw = gzip.compress(raw, compresslevel=6, mtime=0)
+
+        os.makedirs(self.folder, exist_ok=True)
+        path = self.snapshot_path(project_id)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(raw)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        try:
+            os.remove(self.journal_path(project_id))
+        except FileNotFoundError:
+            pass
+
+        st = os.stat(path)
+        self._remember(project_id, _Doc(data, _digest(raw), (st.st_mtime_ns, st.st_size, 0), len(raw), 0))
+
+    def _put_layer(self, layer):
+        """
+        Сохраняет тело слоя по хэшу (если такого ещё нет) и возвращает ссылку.
+        """
+        if _is_ref(layer):
+            return layer
+        raw = json.dumps(layer, ensure_ascii=False, separators=(",", ":"), sort_keys=True).encode("utf-8")
+        digest = _digest(raw)
+        path = self.blob_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(gzip.compress(raw, mtime=0) if self.compress else raw)
+            os.replace(tmp_path, path)
+        # в кэш — копия из сериализованных байтов: вызывающий может менять свой словарь
+        self._remember_blob(digest, json.loads(raw))
+        return {"id": layer.get("id") if isinstance(layer, dict) else None, "$blob": digest}
+
+    def _layer_body(self, layer):
+        if not _is_ref(layer):
+            return layer  # слой из старого снимка, записанный целиком
+        digest = layer["$blob"]
+        body = self._blobs.get(digest)
+        if body is None:
+            with open(self.blob_path(digest), "rb") as f:
+                raw = f.read()
+            body = json.loads(gzip.decompress(raw) if raw[:2] == GZIP_MAGIC else raw)
+        self._remember_blob(digest, body)
+        return body
+
+    def _remember_blob(self, digest, body):
+        self._blobs[digest] = body
+        self._blobs.move_to_end(digest)
+        while len(self._blobs) > self.max_blobs:
+            self._blobs.popitem(last=False)
+
+    def _remember(self, project_id: str, doc: _Doc):
+        self._docs[project_id] = doc
+        self._docs.move_to_end(project_id)
+        while len(self._docs) > self.max_cached:
+            self._docs.popitem(last=False)
+
+
+def read_document(path: str) -> dict:
+    """
+    Читает снимок проекта вне хранилища (JSON или gzip), без журнала.
+    """
+    with open(path, "rb") as f:
+        raw = f.read()
+    return json.loads(gzip.decompress(raw) if raw[:2] == GZIP_MAGIC else raw)
+
+
+def _digest(raw: bytes) -> str:
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+def _is_ref(layer) -> bool:
+    return isinstance(layer, dict) and "$blob" in layer
+
+
+def _copy(data: dict) -> dict:
+    copy = dict(data)
+    copy["layers"] = list(data.get("layers", []))
+    copy["history"] = list(data.get("history", []))
+    return copy
+
+
+def _normalize(changes) -> dict:
+    """
+    Проверяет правку и приводит её к записи журнала.
+    """
+    if not isinstance(changes, dict):
+        raise ValueError("Правка должна быть объектом")
+    unknown = set(changes) - {"set", "layers", "remove", "order", "history"}
+    if unknown:
+        raise ValueError(f"Неизвестные поля правки: {', '.join(sorted(unknown))}")
+
+    fields = changes.get("set") or {}
+    layers = changes.get("layers") or []
+    remove = changes.get("remove") or []
+    order = changes.get("order")
+    history = changes.get("history") or []
+
+    if not isinstance(fields, dict) or RESERVED & set(fields):
+        raise ValueError(f"set не может менять поля: {', '.join(sorted(RESERVED))}")
+    if not isinstance(layers, list) or not all(isinstance(l, dict) and "id" in l for l in layers):
+        raise ValueError("layers — список слоёв с полем id")
+    if any("$blob" in l for l in layers):
+        raise ValueError("Поле $blob в слое зарезервировано")
+    if not isinstance(remove, list) or (order is not None and not isinstance(order, list)):
+        raise ValueError("remove и order — списки id слоёв")
+    if not isinstance(history, list):
+        raise ValueError("history — список записей")
+
+    entry = {"set": dict(fields)}
+    if layers:
+        entry["layers"] = layers
+    if remove:
+        entry["remove"] = remove
+    if order is not None:
+        entry["order"] = order
+    if history:
+        entry["history"] = history
+    return entry
+
+
+def _apply(data: dict, entry: dict):
+    """
+    Применяет запись журнала к документу на месте.
+    """
+    data.update(entry.get("set", {}))
+
+    layers = data["layers"]
+    if entry.get("layers"):
+        positions = {layer.get("id"): i for i, layer in enumerate(layers) if isinstance(layer, dict)}
+        for layer in entry["layers"]:
+            i = positions.get(layer["id"])
+            if i is None:
+                positions[layer["id"]] = len(layers)
+                layers.append(layer)
+            else:
+                layers[i] = layer
+
+    if entry.get("remove"):
+        removed = set(entry["remove"])
+        layers[:] = [l for l in layers if not (isinstance(l, dict) and l.get("id") in removed)]
+
+    if entry.get("order") is not None:
+        rank = {layer_id: i for i, layer_id in enumerate(entry["order"])}
+        # sorted устойчива: слои не из списка сохраняют порядок и идут в конце
+        layers.sort(key=lambda l: rank.get(l.get("id") if isinstance(l, dict) else None, len(rank)))
+
+    if entry.get("history"):
+        data["history"] = (data["history"] + entry["history"])[-HISTORY_LIMIT:]
+
+    data["revision"] = entry.get("rev", data.get("revision", 0))
+
+
+project_store = ProjectStore()
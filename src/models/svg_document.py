@@ -0,0 +1,286 @@
+import threading
+import uuid
+from collections import OrderedDict
+
+from lxml import etree
+
+from src.models.project_store import project_store
+from src.utils.svg_transform import SVGTransform
+from src.utils.svg_utils import SVGUtils
+
+
+SVG_NS = "http://www.w3.org/2000/svg"
+
+ELEMENT_TYPES = {"rect", "circle", "ellipse", "line", "polyline", "polygon", "path", "text", "g", "image", "use"}
+
+# число параметров каждой трансформации
+TRANSFORM_ARITY = {
+    "translate": (1, 2),
+    "rotate": (1, 3),
+    "scale": (1, 2),
+    "skewX": (1,),
+    "skewY": (1,),
+    "matrix": (6,),
+}
+
+ALIGNMENTS = {"left", "right", "top", "bottom", "center_horizontal", "center_vertical"}
+
+# без сущностей и сети: документы приходят от клиента
+_parser = etree.XMLParser(resolve_entities=False, no_network=True, huge_tree=True, remove_blank_text=False)
+
+
+def _local(element) -> str:
+    return etree.QName(element).localname
+
+
+class SVGDocument:
+    """
+    Разобранный SVG-документ с индексами элементов по id и по тегу.
+
+    Правки (добавление, удаление, атрибуты, трансформации, выравнивание)
+    меняют дерево на месте; поиск элемента по id — словарь, без обхода дерева.
+    version растёт с каждой правкой, сериализация кэшируется до следующей.
+    """
+
+    def __init__(self, svg: str, project_id: str = None):
+        data = svg.encode("utf-8") if isinstance(svg, str) else svg
+        try:
+            self.root = etree.fromstring(data, _parser)
+        except etree.XMLSyntaxError as e:
+            raise ValueError(f"Неверный SVG: {e}")
+        if not isinstance(self.root.tag, str) or _local(self.root) != "svg":
+            raise ValueError("Корневой элемент должен быть <svg>")
+
+        self.project_id = project_id
+        self.base = project_store.version(project_id) if project_id else None  # версия проекта при открытии
+        self.saved = 0  # version документа, совпадающая с проектом
+        self.version = 0
+        self.lock = threading.RLock()
+        self._by_id = {}
+        self._by_tag = {}  # тег -> {элемент: None} (упорядоченное множество)
+        self._serialized = None  # (версия, строка)
+        self._counter = 0
+        self._index(self.root)
+
+    # ===================== ИНДЕКС =====================
+
+    def _index(self, subtree):
+        for element in subtree.iter():
+            if not isinstance(element.tag, str):
+                continue  # комментарии, инструкции обработки
+            self._by_tag.setdefault(_local(element), {})[element] = None
+            element_id = element.get("id")
+            if element_id:
+                self._by_id[element_id] = element
+
+    def _unindex(self, subtree):
+        for element in subtree.iter():
+            if not isinstance(element.tag, str):
+                continue
+            self._by_tag.get(_local(element), {}).pop(element, None)
+            element_id = element.get("id")
+            if element_id and self._by_id.get(element_id) is element:
+                del self._by_id[element_id]
+
+    def get(self, element_id: str):
+        return self._by_id.get(element_id)
+
+    def require(self, element_id: str):
+        element = self._by_id.get(element_id)
+        if element is None:
+            raise KeyError(f"Элемент не найден: {element_id}")
+        return element
+
+    def by_tag(self, tag: str):
+        return list(self._by_tag.get(tag, ()))
+
+    def ids(self):
+        return list(self._by_id)
+
+    # ===================== ПРАВКИ =====================
+
+    def add_element(self, element_type: str, params: dict, parent_id: str = None):
+        """
+        Добавляет элемент. params — атрибуты (stroke_width = stroke-width),
+        для text — ещё "text", для polyline/polygon points можно списком пар.
+        Возвращает id нового элемента.
+        """
+        if element_type not in ELEMENT_TYPES:
+            raise ValueError(f"Неизвестный тип элемента: {element_type}")
+        params = dict(params or {})
+
+        with self.lock:
+            parent = self.require(parent_id) if parent_id else self.root
+            text = params.pop("text", None)
+            element_id = str(params.pop("id", "") or self._new_id(element_type))
+            if element_id in self._by_id:
+                raise ValueError(f"Элемент с id {element_id} уже есть")
+
+            element = etree.SubElement(parent, f"{{{SVG_NS}}}{element_type}")
+            element.set("id", element_id)
+            for name, value in params.items():
+                if name == "points" and isinstance(value, (list, tuple)):
+                    value = " ".join(f"{x},{y}" for x, y in value)
+                element.set(name.replace("_", "-"), str(value))
+            if text is not None:
+                element.text = str(text)
+
+            self._index(element)
+            self._touch()
+            return element_id
+
+    def remove(self, element_id: str):
+        with self.lock:
+            element = self.require(element_id)
+            if element is self.root:
+                raise ValueError("Корневой элемент удалить нельзя")
+            self._unindex(element)
+            element.getparent().remove(element)
+            self._touch()
+
+    def set_attributes(self, element_id: str, attributes: dict):
+        """
+        Меняет атрибуты элемента; None удаляет атрибут. Смена id обновляет индекс.
+        """
+        with self.lock:
+            element = self.require(element_id)
+            new_id = attributes.get("id")
+            if new_id and new_id != element_id and new_id in self._by_id:
+                raise ValueError(f"Элемент с id {new_id} уже есть")
+
+            for name, value in attributes.items():
+                name = name.replace("_", "-")
+                if value is None:
+                    element.attrib.pop(name, None)
+                else:
+                    element.set(name, str(value))
+
+            if "id" in attributes:
+                del self._by_id[element_id]
+                if element.get("id"):
+                    self._by_id[element.get("id")] = element
+            self._touch()
+
+    def transform(self, element_id: str, transform_type: str, params):
+        """
+        Дописывает трансформацию к атрибуту transform элемента.
+        """
+        arity = TRANSFORM_ARITY.get(transform_type)
+        if arity is None:
+            raise ValueError(f"Неизвестная трансформация: {transform_type}")
+        try:
+            params = [float(p) for p in params]
+        except (TypeError, ValueError):
+            raise ValueError("Параметры трансформации должны быть числами")
+        if len(params) not in arity:
+            raise ValueError(f"{transform_type}: ожидается параметров — {' или '.join(map(str, arity))}")
+        if transform_type == "translate" and len(params) == 1:
+            params.append(0.0)
+
+        with self.lock:
+            element = self.require(element_id)
+            element.set("transform", SVGTransform.apply_transform(element, transform_type, params))
+            self._touch()
+            return element.get("transform")
+
+    def align(self, element_ids, alignment: str):
+        if alignment not in ALIGNMENTS:
+            raise ValueError(f"Неизвестное выравнивание: {alignment}")
+        with self.lock:
+            elements = [self.require(element_id) for element_id in element_ids]
+            SVGTransform.align_elements(elements, alignment)
+            self._touch()
+            return len(elements)
+
+    # ===================== СЕРИАЛИЗАЦИЯ =====================
+
+    def tostring(self) -> str:
+        with self.lock:
+            if self._serialized is None or self._serialized[0] != self.version:
+                self._serialized = (self.version, etree.tostring(self.root, encoding="unicode"))
+            return self._serialized[1]
+
+    @staticmethod
+    def element_xml(element) -> str:
+        return etree.tostring(element, encoding="unicode")
+
+    # ===================== ВНУТРЕННИЕ =====================
+
+    def _new_id(self, element_type: str) -> str:
+        while True:
+            self._counter += 1
+            element_id = f"{element_type}-{self._counter}"
+            if element_id not in self._by_id:
+                return element_id
+
+    def _touch(self):
+        self.version += 1
+
+
+class SVGDocumentStore:
+    """
+    Открытые документы по id. Документ проекта открывается по id проекта
+    (из его svg или слоёв), прочие — по новому id при загрузке SVG.
+    Хранится не больше max_documents документов (LRU).
+    """
+
+    def __init__(self, max_documents: int = 32):
+        self.max_documents = max_documents
+        self._documents = OrderedDict()
+        self._lock = threading.Lock()
+
+    def open(self, svg: str) -> str:
+        doc_id = str(uuid.uuid4())
+        self._remember(doc_id, SVGDocument(svg))
+        return doc_id
+
+    def get(self, doc_id: str):
+        """
+        Документ по id или None. Проект открывается при первом обращении
+        и переоткрывается, если изменился на диске, а несохранённых правок нет.
+        """
+        with self._lock:
+            document = self._documents.get(doc_id)
+            if document is not None:
+                self._documents.move_to_end(doc_id)
+                if (document.project_id is None or document.version != document.saved
+                        or project_store.version(doc_id) == document.base):
+                    return document
+
+        if not doc_id or not project_store.exists(doc_id):
+            return None
+        document = SVGDocument(SVGUtils.project_svg(project_store.load(doc_id)), project_id=doc_id)
+        with self._lock:
+            # параллельный запрос мог открыть проект раньше — берём его документ
+            existing = self._documents.get(doc_id)
+            if existing is not None and existing.base == document.base:
+                return existing
+        self._remember(doc_id, document)
+        return document
+
+    def save(self, doc_id: str) -> dict:
+        """
+        Записывает документ в его проект (одна строка журнала проекта).
+        """
+        document = self.get(doc_id)
+        if document is None or document.project_id is None:
+            raise KeyError("Документ не связан с проектом")
+        with document.lock:
+            result = project_store.patch(document.project_id, {"set": {"svg": document.tostring()}})
+            document.base = project_store.version(document.project_id)
+            document.saved = document.version
+        return result
+
+    def close(self, doc_id: str) -> bool:
+        with self._lock:
+            return self._documents.pop(doc_id, None) is not None
+
+    def _remember(self, doc_id, document):
+        with self._lock:
+            self._documents[doc_id] = document
+            self._documents.move_to_end(doc_id)
+            while len(self._documents) > self.max_documents:
+                self._documents.popitem(last=False)
+
+
+svg_documents = SVGDocumentStore()
@@ -0,0 +1,63 @@
+import json
+
+from flask import Blueprint, request, jsonify, Response
+
+from src.services.batch_service import Recipe, batch_jobs
+from src.services.job_queue import QueueFull
+
+bp = Blueprint("batch_routes", __name__)
+
+@bp.route("/batch/jobs", methods=["POST"])
+def create_job():
+    """
+    Запуск пакетной обработки: zip-архив изображений (archive)
+    и рецепт (recipe, JSON-список шагов).
+    """
+    archive = request.files.get("archive")
+    if not archive:
+        return jsonify({"error": "Архив не выбран"}), 400
+
+    try:
+        recipe = Recipe.from_json(json.loads(request.form.get("recipe", "")))
+        workers = request.form.get("workers", type=int)
+        job = batch_jobs.submit(recipe, archive.read(), workers)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except QueueFull as e:
+        return jsonify({"error": str(e)}), 503
+
+    resp = jsonify({"job_id": job.id, "status": job.status, "events_url": f"/jobs/{job.id}/events"})
+    resp.status_code = 202
+    resp.headers["Location"] = f"/batch/jobs/{job.id}"
+    return resp
+
+@bp.route("/batch/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    """
+    Прогресс задания: сводка и записи по файлам, начиная с ?since=N.
+    """
+    job = batch_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Задание не найдено"}), 404
+    return jsonify(job.to_dict(request.args.get("since", 0, type=int)))
+
+@bp.route("/batch/jobs/<job_id>/cancel", methods=["POST"])
+def cancel_job(job_id):
+    job = batch_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Задание не найдено"}), 404
+    if not job.job.cancel():
+        return jsonify({"error": "Задание уже завершено"}), 409
+    return jsonify({"message": "Отмена запрошена"})
+
+@bp.route("/batch/jobs/<job_id>/result", methods=["GET"])
+def job_result(job_id):
+    job = batch_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Задание не найдено"}), 404
+    if job.status not in ("done", "cancelled"):
+        return jsonify({"error": "Задание ещё не завершено", "status": job.status}), 409
+
+    return Response(job.archive(), mimetype="application/zip", headers={
+        "Content-Disposition": f"attachment; filename=batch_{job_id}.zip"
+    })
@@ -1,6 +1,6 @@
 from flask import Blueprint, request, jsonify
 
-from src.services.canvas_service import canvas_service
+from src.routes.workspace import run_in_workspace
 
 bp = Blueprint("canvas_routes", __name__)
 
@@ -9,6 +9,4 @@ def resize():
     data = request.json
     width = int(data["width"])
     height = int(data["height"])
-    canvas_service.resize(width, height)
-    return jsonify({"message": "Размер изменён"})
-
+    return run_in_workspace("canvas.resize", lambda ws: ws.canvas.resize(width, height), "Размер изменён")
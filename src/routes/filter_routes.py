@@ -1,41 +1,153 @@
-from flask import Blueprint, request, jsonify
+import cv2
+from flask import Blueprint, request, jsonify, Response
 
-from src.services.filter_service import filter_service
+from src.routes.workspace import current_workspace, run_in_workspace
+from src.utils.noise import ALIASES, NOISE_TYPES
 
 bp = Blueprint("filter_routes", __name__)
 
 @bp.route("/filter/brightness_contrast", methods=["POST"])
 def bc():
     d = request.json
-    filter_service.brightness_contrast(int(d["brightness"]), float(d["contrast"]))
-    return jsonify({"message": "Яркость/контраст применены"})
+    brightness, contrast = int(d["brightness"]), float(d["contrast"])
+    return run_in_workspace(
+        "filter.brightness_contrast",
+        lambda ws: ws.filters.brightness_contrast(brightness, contrast),
+        "Яркость/контраст применены"
+    )
 
 @bp.route("/filter/color_balance", methods=["POST"])
 def color_balance():
     d = request.json
-    filter_service.color_balance(int(d["r"]), int(d["g"]), int(d["b"]))
-    return jsonify({"message": "Баланс цвета применен"})
+    r, g, b = int(d["r"]), int(d["g"]), int(d["b"])
+    return run_in_workspace(
+        "filter.color_balance",
+        lambda ws: ws.filters.color_balance(r, g, b),
+        "Баланс цвета применен"
+    )
+
+@bp.route("/filter/gamma", methods=["POST"])
+def gamma():
+    value = float(request.json["value"])
+    return run_in_workspace("filter.gamma", lambda ws: ws.filters.gamma(value), "Гамма применена")
+
+@bp.route("/filter/invert", methods=["POST"])
+def invert():
+    return run_in_workspace("filter.invert", lambda ws: ws.filters.invert(), "Инверсия применена")
+
+@bp.route("/filter/levels", methods=["POST"])
+def levels():
+    d = request.json
+    params = (
+        int(d.get("in_black", 0)),
+        int(d.get("in_white", 255)),
+        float(d.get("gamma", 1.0)),
+        int(d.get("out_black", 0)),
+        int(d.get("out_white", 255))
+    )
+    if params[1] <= params[0]:
+        return jsonify({"error": "in_white должен быть больше in_black"}), 400
+    return run_in_workspace("filter.levels", lambda ws: ws.filters.levels(*params), "Уровни применены")
 
 @bp.route("/filter/add_gaussian_noise", methods=["POST"])
 def add_noise():
-    sigma = float(request.json["sigma"])
-    filter_service.add_gaussian_noise(sigma)
-    return jsonify({"message": "Шум добавлен"})
+    d = request.json
+    sigma = float(d["sigma"])
+    seed = int(d["seed"]) if d.get("seed") is not None else None
+    return run_in_workspace(
+        "filter.add_gaussian_noise",
+        lambda ws: ws.filters.add_gaussian_noise(sigma, seed),
+        "Шум добавлен"
+    )
+
+@bp.route("/filter/noise", methods=["POST"])
+def noise():
+    d = request.json
+    noise_type = d.get("type", "gaussian")
+    if ALIASES.get(noise_type, noise_type) not in NOISE_TYPES:
+        return jsonify({"error": f"Неизвестный тип шума: {noise_type}"}), 400
+    amount = float(d["amount"])
+    seed = int(d["seed"]) if d.get("seed") is not None else None
+    return run_in_workspace(
+        "filter.noise",
+        lambda ws: ws.filters.add_noise(noise_type, amount, seed),
+        "Шум добавлен"
+    )
 
 @bp.route("/filter/blur", methods=["POST"])
 def blur():
     d = request.json
-    filter_service.blur(d["type"], int(d["ksize"]))
-    return jsonify({"message": "Размытие применено"})
+    blur_type, ksize = d["type"], int(d["ksize"])
+    return run_in_workspace("filter.blur", lambda ws: ws.filters.blur(blur_type, ksize), "Размытие применено")
 
 @bp.route("/filter/brightness_contrast_rgb", methods=["POST"])
 def bc_rgb():
     d = request.json
-    filter_service.brightness_contrast_rgb(
-        int(d["brightness"]),
-        float(d["contrast"]),
-        int(d["r"]),
-        int(d["g"]),
-        int(d["b"])
+    params = (int(d["brightness"]), float(d["contrast"]), int(d["r"]), int(d["g"]), int(d["b"]))
+    return run_in_workspace(
+        "filter.brightness_contrast_rgb",
+        lambda ws: ws.filters.brightness_contrast_rgb(*params),
+        "Фильтры применены"
     )
-    return jsonify({"message": "Фильтры применены"})
+
+
+# ===================== ПРЕВЬЮ =====================
+
+@bp.route("/filter/preview", methods=["POST"])
+def preview():
+    d = request.json
+    try:
+        with current_workspace() as ws:
+            scale, img = ws.filters.preview(
+                d["name"],
+                d.get("params", {}),
+                int(d.get("width", 1024)),
+                int(d.get("height", 768))
+            )
+    except (ValueError, TypeError) as e:
+        return jsonify({"error": str(e)}), 400
+
+    ok, buf = cv2.imencode(".jpg", img, [int(cv2.IMWRITE_JPEG_QUALITY), 85])
+    return Response(buf.tobytes(), mimetype="image/jpeg", headers={
+        "Cache-Control": "no-store",
+        "X-Preview-Scale": str(scale)
+    })
+
+
+# ===================== СТЕК КОРРЕКЦИЙ =====================
+
+@bp.route("/filter/stack", methods=["GET"])
+def stack():
+    with current_workspace() as ws:
+        adjustments = ws.filters.list_adjustments()
+    return jsonify({"adjustments": adjustments})
+
+@bp.route("/filter/stack/toggle", methods=["POST"])
+def stack_toggle():
+    d = request.json
+    try:
+        with current_workspace() as ws:
+            ws.filters.toggle(d["name"], bool(d.get("enabled", True)))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"message": "Коррекция переключена"})
+
+@bp.route("/filter/stack/remove", methods=["POST"])
+def stack_remove():
+    d = request.json
+    try:
+        with current_workspace() as ws:
+            ws.filters.remove(d["name"])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"message": "Коррекция удалена"})
+
+@bp.route("/filter/stack/reorder", methods=["POST"])
+def stack_reorder():
+    d = request.json
+    try:
+        with current_workspace() as ws:
+            ws.filters.reorder(list(d["order"]))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"message": "Порядок коррекций изменён"})
@@ -1,6 +1,11 @@
-from flask import Blueprint, request, jsonify, send_file
+import io
 
-from src.services.image_service import image_service
+from flask import Blueprint, request, jsonify, send_file, Response
+from werkzeug.utils import secure_filename
+
+from src.routes.workspace import current_workspace
+from src.utils.export_engine import ExportSpec, zip_variants
+from src.utils.result_cache import result_cache
 
 bp = Blueprint("image_routes", __name__)
 
@@ -10,29 +15,112 @@ def upload():
     if not file:
         return jsonify({"error": "Файл не выбран"}), 400
 
-    image_service.upload_image(file.read())
+    with current_workspace(create=True) as ws:
+        ws.images.upload_image(file.read())
     return jsonify({"message": "Загружено"})
 
 @bp.route("/undo", methods=["POST"])
 def undo():
     try:
-        image_service.undo()
+        with current_workspace() as ws:
+            ws.images.undo()
     except ValueError:
         return jsonify({"error": "Нет предыдущего состояния"}), 400
     return jsonify({"message": "Откат выполнен"})
 
+@bp.route("/redo", methods=["POST"])
+def redo():
+    try:
+        with current_workspace() as ws:
+            ws.images.redo()
+    except ValueError:
+        return jsonify({"error": "Нет отменённого состояния"}), 400
+    return jsonify({"message": "Повтор выполнен"})
+
 @bp.route("/reset", methods=["POST"])
 def reset():
-    image_service.reset()
+    with current_workspace() as ws:
+        ws.images.reset()
     return jsonify({"message": "Сброшено"})
 
 @bp.route("/current", methods=["GET"])
 def current():
-    base64_img = image_service.get_current_base64()
-    return jsonify({"image": base64_img})
+    """
+    Текущее изображение. ?format=png (или Accept: image/png) — бинарный PNG,
+    иначе — JSON с base64. Ответ несёт ETag версии изображения:
+    с If-None-Match той же версии возвращается 304 без тела.
+    """
+    binary = request.args.get("format") == "png" or (
+        request.accept_mimetypes.best_match(["application/json", "image/png"]) == "image/png"
+    )
+
+    with current_workspace() as ws:
+        etag = ws.images.etag() + ("" if binary else "-json")
+        if request.if_none_match.contains(etag):
+            resp = Response(status=304)
+        elif binary:
+            data = ws.images.get_current_png()
+            if data is None:
+                return jsonify({"error": "Нет изображения"}), 404
+            resp = Response(data, mimetype="image/png")
+        else:
+            resp = jsonify({"image": ws.images.get_current_base64(), "version": ws.images.version()})
+
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "no-cache"  # браузер каждый раз сверяет ETag
+    return resp
 
 @bp.route("/export", methods=["GET"])
 def export():
-    fmt = request.args.get("format", "png")
-    path = image_service.export(fmt)
-    return send_file(path, as_attachment=True)
\ No newline at end of file
+    """
+    Экспорт текущего изображения, закодированного в памяти:
+    ?format=png|jpg|webp|tiff&quality=&lossless=&progressive=&optimize=&preset=&width=&height=
+    """
+    try:
+        spec = ExportSpec.from_dict(request.args)
+        with current_workspace() as ws:
+            data = ws.images.export(spec)
+            etag = f"{ws.images.etag()}-{spec.tag()}"
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    resp = send_file(
+        io.BytesIO(data),
+        mimetype=spec.mimetype,
+        as_attachment=True,
+        download_name=f"{secure_filename(request.args.get('name', 'image')) or 'image'}.{spec.extension}",
+        etag=etag
+    )
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
+
+@bp.route("/export/variants", methods=["POST"])
+def export_variants():
+    """
+    Несколько форматов и размеров из одного кадра одним ZIP-архивом:
+    {"name": "photo", "variants": [{"format": "webp", "quality": 80, "width": 1024}, ...]}
+    """
+    data = request.json or {}
+    variants = data.get("variants")
+    if not isinstance(variants, list) or not variants:
+        return jsonify({"error": "Список вариантов пуст"}), 400
+
+    name = secure_filename(data.get("name", "image")) or "image"
+    try:
+        specs = [ExportSpec.from_dict(v) for v in variants]
+        with current_workspace() as ws:
+            blobs = ws.images.export_many(specs)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return send_file(
+        io.BytesIO(zip_variants(name, specs, blobs)),
+        mimetype="application/zip",
+        as_attachment=True,
+        download_name=f"{name}.zip"
+    )
+
+@bp.route("/cache/stats", methods=["GET"])
+def cache_stats():
+    # кэш результатов общий для /process, фильтров и трансформаций
+    return jsonify(result_cache.stats())
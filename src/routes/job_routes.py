@@ -0,0 +1,71 @@
+import json
+
+from flask import Blueprint, request, jsonify, Response
+
+from src.services.job_queue import jobs
+
+bp = Blueprint("job_routes", __name__)
+
+# как часто слать комментарий в SSE-поток, если задание не меняется (сек)
+SSE_KEEPALIVE = 15
+
+@bp.route("/jobs", methods=["GET"])
+def list_jobs():
+    return jsonify({"jobs": [job.to_dict() for job in jobs.list()]})
+
+@bp.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Задание не найдено"}), 404
+    return jsonify(job.to_dict())
+
+@bp.route("/jobs/<job_id>/result", methods=["GET"])
+def job_result(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Задание не найдено"}), 404
+    if job.status != "done":
+        return jsonify({"error": "Задание не завершено", **job.to_dict()}), 409
+
+    if job.mimetype:
+        return Response(job.result, mimetype=job.mimetype)
+    return jsonify({"result": job.result})
+
+@bp.route("/jobs/<job_id>/cancel", methods=["POST"])
+def cancel_job(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Задание не найдено"}), 404
+    if not job.cancel():
+        return jsonify({"error": "Задание уже завершено", **job.to_dict()}), 409
+    return jsonify({"message": "Отмена запрошена", **job.to_dict()})
+
+@bp.route("/jobs/<job_id>/events", methods=["GET"])
+def job_events(job_id):
+    """
+    Прогресс задания потоком Server-Sent Events. Поток закрывается,
+    когда задание завершено (событие "end").
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Задание не найдено"}), 404
+
+    def stream():
+        revision = -1
+        while True:
+            current = job.wait(revision, SSE_KEEPALIVE)
+            if current == revision and not job.done:
+                yield ": keepalive\n\n"
+                continue
+            revision = current
+            data = json.dumps(job.to_dict(), ensure_ascii=False)
+            if job.done:
+                yield f"event: end\ndata: {data}\n\n"
+                return
+            yield f"data: {data}\n\n"
+
+    return Response(stream(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-store",
+        "X-Accel-Buffering": "no"
+    })
@@ -0,0 +1,36 @@
+from flask import Blueprint, Response
+
+from src.services.job_queue import jobs
+from src.services.svg_render_service import svg_renderer
+from src.utils.image_cache import image_cache
+from src.utils.metrics import registry
+from src.utils.result_cache import result_cache
+
+bp = Blueprint("metrics_routes", __name__)
+
+
+@registry.collector
+def cache_metrics():
+    # читаются из самих кэшей только при выгрузке
+    samples = []
+    for name, stats in (("result_cache", result_cache.stats()), ("image_cache", image_cache.stats()),
+                        ("svg_render_cache", svg_renderer.stats())):
+        samples.append((f"{name}_hits_total", "counter", "Попадания в кэш", [({}, stats["hits"])]))
+        samples.append((f"{name}_misses_total", "counter", "Промахи кэша", [({}, stats["misses"])]))
+        samples.append((f"{name}_bytes", "gauge", "Объём кэша в байтах", [({}, stats["bytes"])]))
+        samples.append((f"{name}_entries", "gauge", "Записей в кэше", [({}, stats["entries"])]))
+    return samples
+
+
+@registry.collector
+def job_metrics():
+    counts = {}
+    for job in jobs.list():
+        counts[job.status] = counts.get(job.status, 0) + 1
+    return [("jobs", "gauge", "Фоновые задания по статусам",
+             [({"status": status}, n) for status, n in sorted(counts.items())])]
+
+
+@bp.route("/metrics", methods=["GET"])
+def metrics():
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4; charset=utf-8")
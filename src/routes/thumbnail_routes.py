@@ -0,0 +1,88 @@
+import os
+
+from flask import Blueprint, request, jsonify, send_file, url_for
+from werkzeug.utils import secure_filename
+
+from src.services.thumbnail_service import thumbnails, SIZES, DEFAULT_SIZE, RASTER_EXT
+
+bp = Blueprint("thumbnail_routes", __name__)
+
+OUTPUT_DIR = "static/outputs"
+
+
+def thumbnail_url(endpoint: str, path: str, size: int = DEFAULT_SIZE, **values):
+    """
+    URL миниатюры с хэшем источника (?v=): меняется вместе с содержимым,
+    поэтому ответ по нему можно кэшировать без ограничений.
+    """
+    digest = thumbnails.source_hash(path)
+    if digest is None:
+        return None
+    return url_for(endpoint, size=size, v=digest, **values)
+
+
+def thumbnail_response(result):
+    if result is None:
+        return jsonify({"error": "Файл не найден"}), 404
+
+    path, mimetype, digest = result
+    resp = send_file(path, mimetype=mimetype, etag=digest, conditional=True)
+    if request.args.get("v") == digest:
+        resp.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    else:
+        # без версии в URL (или с устаревшей) — браузер сверяет ETag при каждом запросе
+        resp.headers["Cache-Control"] = "no-cache"
+    return resp
+
+
+def requested_size():
+    size = request.args.get("size", DEFAULT_SIZE, type=int)
+    if size not in SIZES:
+        return None
+    return size
+
+
+@bp.route("/project/<project_id>/thumbnail", methods=["GET"])
+def project_thumbnail(project_id):
+    size = requested_size()
+    if size is None:
+        return jsonify({"error": f"Размер миниатюры: {', '.join(map(str, SIZES))}"}), 400
+    if secure_filename(project_id) != project_id:
+        return jsonify({"error": "Проект не найден"}), 404
+    try:
+        return thumbnail_response(thumbnails.project_thumbnail(project_id, size))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+
+@bp.route("/outputs", methods=["GET"])
+def list_outputs():
+    """
+    Файлы static/outputs со ссылками на миниатюры.
+    """
+    files = []
+    if os.path.isdir(OUTPUT_DIR):
+        for name in sorted(os.listdir(OUTPUT_DIR)):
+            path = os.path.join(OUTPUT_DIR, name)
+            if os.path.splitext(name.lower())[1] not in RASTER_EXT:
+                continue
+            files.append({
+                "name": name,
+                "url": f"/{OUTPUT_DIR}/{name}",
+                "size": os.path.getsize(path),
+                "thumbnail": thumbnail_url("thumbnail_routes.output_thumbnail", path, filename=name),
+            })
+    return jsonify({"files": files, "total": len(files)})
+
+
+@bp.route("/outputs/<filename>/thumbnail", methods=["GET"])
+def output_thumbnail(filename):
+    size = requested_size()
+    if size is None:
+        return jsonify({"error": f"Размер миниатюры: {', '.join(map(str, SIZES))}"}), 400
+    if secure_filename(filename) != filename:
+        return jsonify({"error": "Файл не найден"}), 404
+    try:
+        return thumbnail_response(thumbnails.image_thumbnail(os.path.join(OUTPUT_DIR, filename), size))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
@@ -1,30 +1,36 @@
 from flask import Blueprint, request, jsonify
 
-from src.services.transform_service import transform_service
+from src.routes.workspace import run_in_workspace
 
 bp = Blueprint("transform_routes", __name__)
 
 @bp.route("/transform/rotate", methods=["POST"])
 def rotate():
     angle = float(request.json["angle"])
-    transform_service.rotate(angle)
-    return jsonify({"message": "Поворот выполнен"})
+    return run_in_workspace("transform.rotate", lambda ws: ws.transforms.rotate(angle), "Поворот выполнен")
 
 @bp.route("/transform/flip_horizontal", methods=["POST"])
 def flip_h():
-    transform_service.flip_horizontal()
-    return jsonify({"message": "Отражено горизонтально"})
+    return run_in_workspace(
+        "transform.flip_horizontal",
+        lambda ws: ws.transforms.flip_horizontal(),
+        "Отражено горизонтально"
+    )
 
 @bp.route("/transform/flip_vertical", methods=["POST"])
 def flip_v():
-    transform_service.flip_vertical()
-    return jsonify({"message": "Отражено вертикально"})
+    return run_in_workspace(
+        "transform.flip_vertical",
+        lambda ws: ws.transforms.flip_vertical(),
+        "Отражено вертикально"
+    )
 
 @bp.route("/transform/flip_both", methods=["POST"])
 def flip_both():
-    transform_service.flip_horizontal()
-    transform_service.flip_vertical()
-    return jsonify({"message": "Отражено по обеим осям"})
+    def flip(ws):
+        ws.transforms.flip_horizontal()
+        ws.transforms.flip_vertical()
+    return run_in_workspace("transform.flip_both", flip, "Отражено по обеим осям")
 
 @bp.route("/transform/resize", methods=["POST"])
 def resize():
@@ -32,8 +38,11 @@ def resize():
     width = int(data["width"])
     height = int(data["height"])
     interpolation = data.get("interpolation", "bicubic")
-    transform_service.resize(width, height, interpolation)
-    return jsonify({"message": "Изменение размера выполнено"})
+    return run_in_workspace(
+        "transform.resize",
+        lambda ws: ws.transforms.resize(width, height, interpolation),
+        "Изменение размера выполнено"
+    )
 
 @bp.route("/transform/crop", methods=["POST"])
 def crop():
@@ -42,6 +51,14 @@ def crop():
     y = int(data["y"])
     w = int(data["w"])
     h = int(data["h"])
-    transform_service.crop(x, y, w, h)
-    return jsonify({"message": "Обрезка выполнена"})
+    return run_in_workspace("transform.crop", lambda ws: ws.transforms.crop(x, y, w, h), "Обрезка выполнена")
 
+@bp.route("/transform/chain", methods=["POST"])
+def chain():
+    ops = request.json.get("ops")
+    if not isinstance(ops, list) or not ops:
+        return jsonify({"error": "Список трансформаций пуст"}), 400
+    for op in ops:
+        if not isinstance(op, dict) or op.get("op") not in ("rotate", "flip", "resize", "crop"):
+            return jsonify({"error": f"Неизвестная трансформация: {op}"}), 400
+    return run_in_workspace("transform.chain", lambda ws: ws.transforms.apply_chain(ops), "Трансформации применены")
@@ -1,14 +1,20 @@
 import base64
-import datetime
-import glob
+import io
 import json
 import uuid
+from datetime import datetime
 
 import svgwrite
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, request, jsonify, send_file, url_for
 import os
 from src.models.project import Project
+from src.models.project_index import project_index
+from src.models.project_store import project_store, check_id
+from src.models.svg_document import svg_documents
+from src.services.thumbnail_service import thumbnails
+from src.services.svg_render_service import svg_renderer
 from src.services.svg_service import SVGService
+from src.utils.export_engine import ExportSpec
 from src.utils.svg_utils import SVGUtils
 import tempfile
 
@@ -37,16 +43,38 @@ def save_project(project_id):
     filename = f"projects/{project_id}.json"
 
     if os.path.exists(filename):
-        project = Project.load(filename)
-        project.layers = data.get('layers', [])
-        project.history = data.get('history', [])
-        project.modified = datetime.now().isoformat()
-        project.save()
+        # полная запись: новый компактный снимок, журнал правок сворачивается
+        project_data = project_store.load(project_id, layers=False)
+        project_data['layers'] = data.get('layers', [])
+        project_data['history'] = data.get('history', [])
+        project_data['modified'] = datetime.now().isoformat()
+        thumbnails.invalidate_project(project_id)
+        project_store.save(project_id, project_data)
+        project_index.refresh(project_id)
         return jsonify({'status': 'success'})
 
     return jsonify({'error': 'Проект не найден'}), 404
 
 
+@api_bp.route('/project/<project_id>/patch', methods=['POST'])
+def patch_project(project_id):
+    """
+    Частичное сохранение: изменённые слои и поля дописываются в журнал проекта.
+    Тело: {"set": {...}, "layers": [...], "remove": [...], "order": [...], "history": [...]}
+    """
+    if not project_store.exists(project_id):
+        return jsonify({'error': 'Проект не найден'}), 404
+
+    try:
+        thumbnails.invalidate_project(project_id)
+        result = project_store.patch(project_id, request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    project_index.refresh(project_id)
+
+    return jsonify({'status': 'success', **result})
+
+
 # SVG операции
 @api_bp.route('/svg/create', methods=['POST'])
 def create_svg():
@@ -65,19 +93,91 @@ def create_svg():
     })
 
 
-@api_bp.route('/svg/add-element', methods=['POST'])
-def add_element():
-    data = request.json
-    svg_content = data.get('svg', '')
-    element_type = data.get('type')
-    params = data.get('params', {})
+def request_document(data):
+    """
+    Документ запроса: по doc_id (открытый документ или id проекта),
+    иначе — новый документ из переданного svg. Возвращает (doc_id, документ).
+    """
+    doc_id = data.get('doc_id')
+    if doc_id:
+        # id из тела запроса, в отличие от сегмента URL, может содержать "/"
+        document = svg_documents.get(check_id(doc_id))
+        if document is None:
+            raise KeyError('Документ не найден')
+        return doc_id, document
+
+    if not data.get('svg'):
+        raise ValueError('Нужен doc_id или svg')
+    doc_id = svg_documents.open(data['svg'])
+    return doc_id, svg_documents.get(doc_id)
 
-    # Здесь будет логика добавления элемента к существующему SVG
-    # Это упрощенный пример
-    dwg = svgwrite.Drawing()
-    # Нужно парсить существующий SVG и добавлять элементы
 
-    return jsonify({'svg': svg_content + '<!-- элемент добавлен -->'})
+def document_error(e):
+    if isinstance(e, KeyError):
+        return jsonify({'error': e.args[0]}), 404
+    return jsonify({'error': str(e)}), 400
+
+
+@api_bp.route('/svg/document', methods=['POST'])
+def open_document():
+    """Открытие документа: {"svg": ...} или {"project_id": ...}"""
+    data = request.json or {}
+    try:
+        if data.get('project_id'):
+            doc_id, document = request_document({'doc_id': data['project_id']})
+        else:
+            doc_id, document = request_document({'svg': data.get('svg')})
+    except (KeyError, ValueError) as e:
+        return document_error(e)
+
+    return jsonify({'doc_id': doc_id, 'version': document.version, 'elements': len(document.ids())})
+
+
+@api_bp.route('/svg/document/<doc_id>', methods=['GET'])
+def get_document(doc_id):
+    document = svg_documents.get(doc_id)
+    if document is None:
+        return jsonify({'error': 'Документ не найден'}), 404
+    return jsonify({'doc_id': doc_id, 'version': document.version, 'svg': document.tostring()})
+
+
+@api_bp.route('/svg/document/<doc_id>', methods=['DELETE'])
+def close_document(doc_id):
+    if not svg_documents.close(doc_id):
+        return jsonify({'error': 'Документ не найден'}), 404
+    return jsonify({'status': 'success'})
+
+
+@api_bp.route('/svg/document/<doc_id>/save', methods=['POST'])
+def save_document(doc_id):
+    """Запись документа в svg его проекта"""
+    try:
+        thumbnails.invalidate_project(doc_id)
+        result = svg_documents.save(doc_id)
+    except KeyError as e:
+        return document_error(e)
+    project_index.refresh(doc_id)
+    return jsonify({'status': 'success', **result})
+
+
+@api_bp.route('/svg/add-element', methods=['POST'])
+def add_element():
+    data = request.json or {}
+    try:
+        doc_id, document = request_document(data)
+        element_id = document.add_element(data.get('type'), data.get('params', {}), data.get('parent_id'))
+    except (KeyError, ValueError) as e:
+        return document_error(e)
+
+    response = {
+        'doc_id': doc_id,
+        'element_id': element_id,
+        'element': document.element_xml(document.get(element_id)),
+        'version': document.version
+    }
+    if not data.get('doc_id'):
+        response['svg'] = document.tostring()  # документ прислан целиком — целиком и возвращаем
+    return jsonify(response)
 
 
 @api_bp.route('/svg/import', methods=['POST'])
@@ -125,7 +225,18 @@ def export_svg():
 
         return send_file(temp_file.name, as_attachment=True, download_name=f'{filename}.svg')
 
-    # Для PNG нужно добавить конвертацию через Cairo
+    if format in ('png', 'jpg', 'jpeg', 'webp'):
+        try:
+            spec = ExportSpec(format)
+            image = svg_renderer.render(svg_content, data.get('width'), data.get('height'), spec.fmt,
+                                        data.get('quality'), data.get('background'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        except RuntimeError as e:
+            return jsonify({'error': str(e)}), 500
+        return send_file(io.BytesIO(image), mimetype=spec.mimetype, as_attachment=True,
+                         download_name=f'{filename}.{spec.extension}')
+
     return jsonify({'error': 'Формат не поддерживается'}), 400
 
 
@@ -338,35 +449,46 @@ def create_circular_text():
 # Трансформации
 @api_bp.route('/transform/apply', methods=['POST'])
 def apply_transform():
-    data = request.json
-    svg_content = data.get('svg', '')
+    data = request.json or {}
     element_id = data.get('element_id')
     transform_type = data.get('type')
     params = data.get('params', [])
 
-    # Здесь должен быть парсинг SVG, поиск элемента и применение трансформации
-    # Это упрощенный пример
+    try:
+        doc_id, document = request_document(data)
+        transform = document.transform(element_id, transform_type, params)
+    except (KeyError, ValueError) as e:
+        return document_error(e)
 
     return jsonify({
         'status': 'transformed',
-        'transform': f'{transform_type}({",".join(map(str, params))})'
+        'doc_id': doc_id,
+        'element_id': element_id,
+        'transform': transform,
+        'version': document.version
     })
 
 
 # Выравнивание
 @api_bp.route('/align/elements', methods=['POST'])
 def align_elements():
-    data = request.json
+    data = request.json or {}
     element_ids = data.get('element_ids', [])
     alignment = data.get('alignment', 'left')  # left, right, top, bottom, center_horizontal, center_vertical
 
-    # Здесь должна быть логика выравнивания элементов
-    # Используйте SVGTransform.align_elements()
+    try:
+        doc_id, document = request_document(data)
+        count = document.align(element_ids, alignment)
+    except (KeyError, ValueError) as e:
+        return document_error(e)
 
     return jsonify({
         'status': 'aligned',
+        'doc_id': doc_id,
         'alignment': alignment,
-        'elements_count': len(element_ids)
+        'elements_count': count,
+        'transforms': {element_id: document.get(element_id).get('transform') for element_id in element_ids},
+        'version': document.version
     })
 
 
@@ -403,82 +525,135 @@ def trace_image():
     return jsonify({'error': 'Ошибка обработки изображения'}), 500
 
 
-# Экспорт в растровые форматы (заглушка)
+# Экспорт в растровые форматы
+RASTER_FORMATS = ('png', 'jpeg', 'jpg', 'webp')
+
+
+def raster_job(data):
+    """
+    Параметры рендера одного документа: svg, doc_id (открытый документ)
+    или project_id; format (png, jpeg, webp), width, height, quality, background.
+    """
+    fmt = data.get('format', 'png')
+    if fmt not in RASTER_FORMATS:
+        raise ValueError(f'Неподдерживаемый формат: {fmt}')
+
+    svg_content = data.get('svg')
+    if not svg_content and (data.get('doc_id') or data.get('project_id')):
+        document = svg_documents.get(check_id(data.get('doc_id') or data.get('project_id')))
+        if document is None:
+            raise KeyError('Документ не найден')
+        svg_content = document.tostring()
+    if not svg_content:
+        raise ValueError('Нужен svg, doc_id или project_id')
+
+    return {
+        'svg': svg_content,
+        'width': data.get('width'),
+        'height': data.get('height'),
+        'fmt': fmt,
+        'quality': data.get('quality'),
+        'background': data.get('background'),
+    }
+
+
+def raster_result(job, image):
+    spec = ExportSpec(job['fmt'])
+    return {
+        'image': f'data:{spec.mimetype};base64,{base64.b64encode(image).decode("utf-8")}',
+        'format': job['fmt'],
+        'width': job['width'],
+        'height': job['height'],
+        'size': len(image)
+    }
+
+
 @api_bp.route('/export/raster', methods=['POST'])
 def export_raster():
-    data = request.json
-    svg_content = data.get('svg', '')
-    format = data.get('format', 'png')  # png, jpeg, webp
-    width = data.get('width', 800)
-    height = data.get('height', 600)
+    """
+    Растеризация SVG. Один документ — поля в корне запроса
+    (download: true — файлом), несколько артбордов — {"artboards": [...]},
+    они рендерятся параллельно.
+    """
+    data = request.json or {}
     try:
-        from PIL import Image, ImageDraw
-        import io
-
-        img = Image.new('RGB', (width, height), color='white')
-        draw = ImageDraw.Draw(img)
-        draw.rectangle([50, 50, width - 50, height - 50], fill='lightblue', outline='darkblue')
-
-        buffer = io.BytesIO()
-        if format == 'jpeg':
-            img.save(buffer, format='JPEG', quality=95)
-            mime_type = 'image/jpeg'
-        elif format == 'webp':
-            img.save(buffer, format='WEBP', quality=95)
-            mime_type = 'image/webp'
+        if 'artboards' in data:
+            jobs = [raster_job(artboard) for artboard in data['artboards']]
         else:
-            img.save(buffer, format='PNG')
-            mime_type = 'image/png'
-
-        buffer.seek(0)
-        img_base64 = base64.b64encode(buffer.read()).decode('utf-8')
+            jobs = [raster_job(data)]
+    except KeyError as e:
+        return jsonify({'error': e.args[0]}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
+    if not svg_renderer.available:
         return jsonify({
-            'image': f'data:{mime_type};base64,{img_base64}',
-            'format': format,
-            'width': width,
-            'height': height
-        })
-
-    except ImportError:
-        return jsonify({
-            'error': 'Библиотека PIL/Pillow не установлена для экспорта растра',
-            'svg': svg_content  # Возвращаем оригинальный SVG как запасной вариант
+            'error': 'CairoSVG недоступен для экспорта растра',
+            'svg': jobs[0]['svg']  # Возвращаем оригинальный SVG как запасной вариант
         }), 500
 
+    images = svg_renderer.render_many(jobs)
 
-@api_bp.route('/projects/list', methods=['GET'])
-def list_projects():
-    """Получение списка всех проектов"""
-    projects = []
-    project_files = glob.glob('projects/*.json')
+    if 'artboards' not in data:
+        image = images[0]
+        if isinstance(image, Exception):
+            return jsonify({'error': str(image)}), 400
+        if data.get('download'):
+            spec = ExportSpec(jobs[0]['fmt'])
+            return send_file(io.BytesIO(image), mimetype=spec.mimetype, as_attachment=True,
+                             download_name=f"{data.get('filename', 'export')}.{spec.extension}")
+        return jsonify(raster_result(jobs[0], image))
 
-    for filepath in project_files:
-        try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                project_data = json.load(f)
+    return jsonify({'images': [
+        {'error': str(image)} if isinstance(image, Exception) else raster_result(job, image)
+        for job, image in zip(jobs, images)
+    ]})
 
-                # Добавляем информацию о размере файла
-                file_size = os.path.getsize(filepath)
-                project_data['fileSize'] = file_size
 
-                projects.append(project_data)
-        except Exception as e:
-            print(f"Ошибка загрузки проекта {filepath}: {e}")
+@api_bp.route('/projects/list', methods=['GET'])
+def list_projects():
+    """
+    Страница списка проектов из индекса (файлы проектов не читаются).
+    Параметры: page, per_page, sort (modified, created, name, size),
+    order (asc, desc), q — поиск по имени, filter (all, recent, favorites, archived).
+    """
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', 50, type=int), 1), 200)
 
-    # Сортируем по дате изменения (сначала новые)
-    projects.sort(key=lambda x: x.get('modified', ''), reverse=True)
+    try:
+        projects, total = project_index.list(
+            page=page,
+            per_page=per_page,
+            sort=request.args.get('sort', 'modified'),
+            order=request.args.get('order', 'desc'),
+            query=request.args.get('q', '').strip() or None,
+            filter=request.args.get('filter', 'all'),
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    for project_data in projects:
+        # хэш содержимого из индекса — версия URL миниатюры
+        project_data['thumbnail'] = url_for(
+            'thumbnail_routes.project_thumbnail',
+            project_id=project_data['id'], size=256, v=project_data.pop('contentHash')
+        )
 
     return jsonify({
         'projects': projects,
-        'total': len(projects)
+        'total': total,
+        'page': page,
+        'per_page': per_page,
+        'pages': (total + per_page - 1) // per_page
     })
 
 
 @api_bp.route('/project/<project_id>', methods=['GET'])
 def get_project(project_id):
-    """Получение проекта по ID"""
+    """Получение проекта по ID (?layers=0 — только ссылки на слои, без их содержимого)"""
     filename = f"projects/{project_id}.json"
+    if os.path.exists(filename) and request.args.get('layers') == '0':
+        return jsonify(project_store.load(project_id, layers=False))
     if os.path.exists(filename):
         try:
             project = Project.load(filename)
@@ -488,6 +663,28 @@ def get_project(project_id):
     return jsonify({'error': 'Проект не найден'}), 404
 
 
+@api_bp.route('/project/<project_id>/layer/<layer_id>', methods=['GET'])
+def get_project_layer(project_id, layer_id):
+    """Содержимое одного слоя проекта"""
+    if not project_store.exists(project_id):
+        return jsonify({'error': 'Проект не найден'}), 404
+
+    layer = project_store.layer(project_id, layer_id)
+    if layer is None:
+        return jsonify({'error': 'Слой не найден'}), 404
+    return jsonify(layer)
+
+
+@api_bp.route('/projects/gc', methods=['POST'])
+def collect_project_garbage():
+    """Удаление слоёв, на которые не ссылается ни один проект"""
+    try:
+        removed = project_store.gc()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 409
+    return jsonify({'status': 'success', 'removed': removed})
+
+
 @api_bp.route('/project/<project_id>', methods=['DELETE'])
 def delete_project(project_id):
     """Удаление проекта"""
@@ -495,7 +692,9 @@ def delete_project(project_id):
 
     if os.path.exists(filename):
         try:
-            os.remove(filename)
+            thumbnails.invalidate_project(project_id)
+            project_store.delete(project_id)
+            project_index.remove(project_id)
             return jsonify({'status': 'success', 'message': 'Проект удален'})
         except Exception as e:
             return jsonify({'error': f'Ошибка удаления проекта: {str(e)}'}), 500
@@ -510,19 +709,16 @@ def toggle_favorite(project_id):
 
     if os.path.exists(filename):
         try:
-            with open(filename, 'r', encoding='utf-8') as f:
-                project_data = json.load(f)
-
-            # Переключаем избранное
-            project_data['favorite'] = not project_data.get('favorite', False)
-            project_data['modified'] = datetime.now().isoformat()
+            # Переключаем избранное — одна строка в журнале вместо перезаписи файла
+            favorite = not project_store.load(project_id, layers=False).get('favorite', False)
 
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(project_data, f, ensure_ascii=False, indent=2)
+            thumbnails.invalidate_project(project_id)
+            project_store.patch(project_id, {'set': {'favorite': favorite}})
+            project_index.refresh(project_id)
 
             return jsonify({
                 'status': 'success',
-                'favorite': project_data['favorite']
+                'favorite': favorite
             })
         except Exception as e:
             return jsonify({'error': f'Ошибка обновления проекта: {str(e)}'}), 500
@@ -539,60 +735,42 @@ def duplicate_project(project_id):
         return jsonify({'error': 'Проект не найден'}), 404
 
     try:
-        # Загружаем исходный проект
-        with open(source_file, 'r', encoding='utf-8') as f:
-            source_data = json.load(f)
-
-        # Создаем новый проект на основе исходного
-        new_project = Project(
-            name=f"{source_data.get('name', 'Проект')} (копия)",
-            width=source_data.get('width', 800),
-            height=source_data.get('height', 600),
-            unit=source_data.get('unit', 'px')
-        )
-
-        # Копируем слои и другие данные
-        new_project.layers = source_data.get('layers', [])
-
-        # Сохраняем
-        new_project.save()
+        # Копия ссылается на те же слои — тела не читаются и не копируются
+        source = project_store.load(project_id, layers=False)
+        now = datetime.now().isoformat()
+        new_project = project_store.duplicate(project_id, str(uuid.uuid4()), {
+            'name': f"{source.get('name', 'Проект')} (копия)",
+            'created': now,
+            'modified': now,
+            'favorite': False
+        })
+        project_index.refresh(new_project['id'])
 
-        return jsonify(new_project.to_dict())
+        new_project['layerCount'] = len(new_project.pop('layers'))
+        return jsonify(new_project)
     except Exception as e:
         return jsonify({'error': f'Ошибка дублирования проекта: {str(e)}'}), 500
 
 
 @api_bp.route('/project/<project_id>/export', methods=['GET'])
-def export_project(project_id, os=None):
+def export_project(project_id):
     """Экспорт проекта в файл .vdraw"""
-    filename = f"projects/{project_id}.json"
-
-    if os.path.exists(filename):
-        try:
-            # Загружаем проект
-            with open(filename, 'r', encoding='utf-8') as f:
-                project_data = json.load(f)
-
-            # Создаем временный файл
-            import tempfile
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.vdraw', mode='w')
-            json.dump(project_data, temp_file, ensure_ascii=False, indent=2)
-            temp_file.close()
-
-            return send_file(
-                temp_file.name,
-                as_attachment=True,
-                download_name=f"{project_data.get('name', 'project')}.vdraw"
-            )
-        except Exception as e:
-            return jsonify({'error': f'Ошибка экспорта проекта: {str(e)}'}), 500
-        finally:
-            # Удаляем временный файл после отправки
-            import atexit
-            import os
-            atexit.register(lambda: os.unlink(temp_file.name) if os.path.exists(temp_file.name) else None)
+    if not project_store.exists(project_id):
+        return jsonify({'error': 'Проект не найден'}), 404
 
-    return jsonify({'error': 'Проект не найден'}), 404
+    try:
+        project_data = project_store.load(project_id)
+        project_data.pop('revision', None)
+        data = json.dumps(project_data, ensure_ascii=False, indent=2).encode('utf-8')
+
+        return send_file(
+            io.BytesIO(data),
+            mimetype='application/json',
+            as_attachment=True,
+            download_name=f"{project_data.get('name', 'project')}.vdraw"
+        )
+    except Exception as e:
+        return jsonify({'error': f'Ошибка экспорта проекта: {str(e)}'}), 500
 
 
 @api_bp.route('/project/import', methods=['POST'])
@@ -602,10 +780,13 @@ def import_project():
         data = request.json
         if not data:
             return jsonify({'error': 'Данные проекта отсутствуют'}), 400
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Неверный формат файла проекта'}), 400
 
         # Проверяем обязательные поля
         if 'id' not in data:
             data['id'] = str(uuid.uuid4())
+        check_id(data['id'])
 
         if 'name' not in data:
             data['name'] = 'Импортированный проект'
@@ -617,39 +798,21 @@ def import_project():
             data['created'] = now
 
         # Сохраняем проект
-        filename = f"projects/{data['id']}.json"
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        data.pop('revision', None)
+        thumbnails.invalidate_project(data['id'])
+        project_store.save(data['id'], data)
+        project_index.refresh(data['id'])
 
         return jsonify(data)
+    except ValueError as e:
+        return jsonify({'error': f'Неверный формат файла проекта: {str(e)}'}), 400
     except Exception as e:
         return jsonify({'error': f'Ошибка импорта проекта: {str(e)}'}), 500
 
 
 @api_bp.route('/project/stats', methods=['GET'])
 def get_project_stats():
-    """Получение статистики по проектам"""
-    project_files = glob.glob('projects/*.json')
-
-    total_size = 0
-    recent_count = 0
-    week_ago = datetime.now().timestamp() - 7 * 24 * 60 * 60
-
-    for filepath in project_files:
-        try:
-            # Размер файла
-            total_size += os.path.getsize(filepath)
-
-            # Последние изменения
-            mtime = os.path.getmtime(filepath)
-            if mtime > week_ago:
-                recent_count += 1
-        except:
-            pass
-
-    return jsonify({
-        'total_projects': len(project_files),
-        'recent_projects': recent_count,
-        'total_size_bytes': total_size,
-        'total_size_mb': round(total_size / (1024 * 1024), 2)
-    })
\ No newline at end of file
+    """Получение статистики по проектам (агрегаты индекса, без обхода файлов)"""
+    stats = project_index.stats()
+    stats['total_size_mb'] = round(stats['total_size_bytes'] / (1024 * 1024), 2)
+    return jsonify(stats)
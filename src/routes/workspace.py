@@ -0,0 +1,84 @@
+import uuid
+
+from flask import request, session, jsonify, abort, make_response
+
+from src.services.job_queue import jobs, QueueFull
+from src.services.workspace_registry import workspaces
+
+
+def current_workspace(create: bool = False):
+    """
+    Рабочее пространство текущего запроса.
+    ID берётся из заголовка X-Workspace-Id или параметра ?workspace=
+    (документ), иначе — из сессии пользователя.
+
+    Новое пространство создаётся только с create=True (загрузка изображения);
+    без него запрос к несуществующему пространству получает 404.
+    """
+    workspace_id = request.headers.get("X-Workspace-Id") or request.args.get("workspace")
+
+    if not workspace_id:
+        workspace_id = session.get("workspace_id")
+        if not workspace_id:
+            if not create:
+                abort(make_response(jsonify({"error": "Изображение не загружено"}), 404))
+            workspace_id = uuid.uuid4().hex
+            session["workspace_id"] = workspace_id
+
+    try:
+        return workspaces.get(workspace_id, create=create)
+    except ValueError as e:
+        abort(make_response(jsonify({"error": str(e)}), 400))
+    except KeyError:
+        abort(make_response(jsonify({"error": "Изображение не загружено"}), 404))
+
+
+def wants_async() -> bool:
+    """
+    Клиент просит не ждать результата: ?async=1 или заголовок Prefer: respond-async.
+    """
+    return (
+        request.args.get("async") in ("1", "true")
+        or "respond-async" in request.headers.get("Prefer", "")
+    )
+
+
+def accepted(job):
+    """
+    Ответ 202 Accepted со ссылкой на статус задания.
+    """
+    resp = jsonify({
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/jobs/{job.id}",
+        "events_url": f"/jobs/{job.id}/events"
+    })
+    resp.status_code = 202
+    resp.headers["Location"] = f"/jobs/{job.id}"
+    return resp
+
+
+def run_in_workspace(kind: str, fn, message: str):
+    """
+    Выполняет fn(ws) в рабочем пространстве запроса и отвечает {"message": ...}.
+    Если клиент просит асинхронный режим (см. wants_async) — ставит операцию
+    в очередь заданий и сразу отвечает 202.
+    """
+    if not wants_async():
+        with current_workspace() as ws:
+            fn(ws)
+        return jsonify({"message": message})
+
+    workspace_id = current_workspace().id
+
+    def task(job):
+        with workspaces.get(workspace_id) as ws:
+            job.check_cancelled()
+            fn(ws)
+        return {"message": message}
+
+    try:
+        job = jobs.submit(kind, task)
+    except QueueFull as e:
+        return jsonify({"error": str(e)}), 503
+    return accepted(job)
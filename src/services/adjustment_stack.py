@@ -0,0 +1,288 @@
+from collections import OrderedDict
+
+import cv2
+
+from src.utils import noise as noise_engine
+from src.utils.point_ops import PointChain
+from src.utils.proxy_pyramid import ProxyPyramid
+
+
+# ===================== ПОЭЛЕМЕНТНЫЕ КОРРЕКЦИИ =====================
+# дописывают операции в PointChain; соседние стадии сливаются в один LUT
+
+def brightness_contrast(chain, brightness, contrast):
+    return chain.scale_abs(contrast, brightness)
+
+
+def color_balance(chain, r, g, b):
+    return chain.offset("r", r).offset("g", g).offset("b", b)
+
+
+def gamma(chain, value):
+    return chain.gamma(value)
+
+
+def invert(chain):
+    return chain.invert()
+
+
+def levels(chain, in_black, in_white, gamma, out_black, out_white):
+    return chain.levels(in_black, in_white, gamma, out_black, out_white)
+
+
+POINT_ADJUSTMENTS = {
+    "brightness_contrast": brightness_contrast,
+    "color_balance": color_balance,
+    "gamma": gamma,
+    "invert": invert,
+    "levels": levels,
+}
+
+
+# ===================== ПРОСТРАНСТВЕННЫЕ КОРРЕКЦИИ =====================
+
+def gaussian_noise(img, sigma, seed=None):
+    return noise_engine.add_noise(img, "gaussian", sigma / 255.0, seed)
+
+
+def noise(img, noise_type, amount, seed=None):
+    return noise_engine.add_noise(img, noise_type, amount, seed)
+
+
+def blur(img, blur_type, ksize):
+    # корректируем ksize
+    ksize = max(3, int(ksize))  # минимум 3
+    if ksize % 2 == 0:
+        ksize += 1  # делаем нечётным
+
+    if blur_type == "average":
+        return cv2.blur(img, (ksize, ksize))
+    if blur_type == "gaussian":
+        return cv2.GaussianBlur(img, (ksize, ksize), 0)
+    if blur_type == "median":
+        return cv2.medianBlur(img, ksize)
+    raise ValueError("Неизвестный тип размытия")
+
+
+ADJUSTMENTS = {
+    "gaussian_noise": gaussian_noise,
+    "noise": noise,
+    "blur": blur,
+}
+
+# параметры в пикселях, которые для превью на уменьшенной копии делятся на масштаб
+SCALED_PARAMS = {
+    "blur": ("ksize",),
+}
+
+
+class Adjustment:
+    """
+    Одна стадия стека: тип коррекции, её параметры и флаг включения.
+    """
+
+    def __init__(self, name: str, params: dict, enabled: bool = True):
+        if name not in ADJUSTMENTS and name not in POINT_ADJUSTMENTS:
+            raise ValueError(f"Неизвестная коррекция: {name}")
+        self.name = name
+        self.params = params
+        self.enabled = enabled
+
+    @property
+    def is_point(self) -> bool:
+        return self.name in POINT_ADJUSTMENTS
+
+    def key(self):
+        return self.name, tuple(sorted(self.params.items()))
+
+    def compile_into(self, chain):
+        return POINT_ADJUSTMENTS[self.name](chain, **self.params)
+
+    def scaled(self, scale: int):
+        """
+        Копия стадии для изображения, уменьшенного в scale раз.
+        """
+        params = dict(self.params)
+        for name in SCALED_PARAMS.get(self.name, ()):
+            params[name] = max(1, round(params[name] / scale))
+        return Adjustment(self.name, params, self.enabled)
+
+    def apply(self, img):
+        if self.is_point:
+            return self.compile_into(PointChain()).apply(img)
+        return ADJUSTMENTS[self.name](img, **self.params)
+
+    def to_dict(self):
+        return {"name": self.name, "params": self.params, "enabled": self.enabled}
+
+
+class AdjustmentStack:
+    """
+    Упорядоченный неразрушающий стек коррекций поверх базового изображения.
+
+    Результат каждой стадии кэшируется по ключу, составленному из базового
+    изображения и параметров всех стадий до неё включительно. Поэтому при
+    изменении параметров пересчитываются только эта стадия и следующие,
+    а переключение и перестановка стадий переиспользуют общие префиксы.
+    """
+
+    def __init__(self, max_cached: int = 8):
+        self.max_cached = max_cached
+        self.stages = []
+        self.base = None
+        self.base_key = None
+        self.output_version = None  # версия current, полученная последним render()
+        self._memo = OrderedDict()  # ключ префикса -> ndarray
+        self._preview_memo = OrderedDict()
+        self._pyramid = None
+
+    @property
+    def nbytes(self) -> int:
+        base = self.base.nbytes if self.base is not None else 0
+        pyramid = self._pyramid.nbytes if self._pyramid is not None else 0
+        return (
+            base + pyramid
+            + sum(img.nbytes for img in self._memo.values())
+            + sum(img.nbytes for img in self._preview_memo.values())
+        )
+
+    def pyramid(self) -> ProxyPyramid:
+        """
+        Пирамида уменьшенных копий базы (строится при первом обращении).
+        """
+        if self._pyramid is None:
+            if self.base is None:
+                raise ValueError("Нет изображения")
+            self._pyramid = ProxyPyramid(self.base)
+        return self._pyramid
+
+    # ===================== БАЗА =====================
+
+    def rebase(self, image, key):
+        """
+        Новое базовое изображение: стек «запекается» и очищается.
+        """
+        self.base = image
+        self.base_key = key
+        self.stages = []
+        self._memo.clear()
+        self._preview_memo.clear()
+        self._pyramid = None
+
+    def clear(self):
+        self.base = None
+        self.base_key = None
+        self.output_version = None
+        self.stages = []
+        self._memo.clear()
+        self._preview_memo.clear()
+        self._pyramid = None
+
+    # ===================== СТАДИИ =====================
+
+    def find(self, name: str):
+        for stage in self.stages:
+            if stage.name == name:
+                return stage
+        return None
+
+    def set(self, name: str, **params):
+        """
+        Задаёт параметры стадии (добавляет её в конец стека, если её ещё нет).
+        """
+        stage = self.find(name)
+        if stage is None:
+            self.stages.append(Adjustment(name, params))
+        else:
+            stage.params = params
+            stage.enabled = True
+
+    def toggle(self, name: str, enabled: bool):
+        stage = self.find(name)
+        if stage is None:
+            raise ValueError(f"Коррекция не найдена: {name}")
+        stage.enabled = enabled
+
+    def remove(self, name: str):
+        stage = self.find(name)
+        if stage is None:
+            raise ValueError(f"Коррекция не найдена: {name}")
+        self.stages.remove(stage)
+
+    def reorder(self, names):
+        if sorted(names) != sorted(s.name for s in self.stages):
+            raise ValueError("Порядок должен содержать все коррекции стека")
+        self.stages.sort(key=lambda s: names.index(s.name))
+
+    def to_list(self):
+        return [stage.to_dict() for stage in self.stages]
+
+    # ===================== РЕНДЕР =====================
+
+    def render(self):
+        """
+        Применяет включённые стадии к базе, начиная с самого длинного
+        закэшированного префикса. Подряд идущие поэлементные стадии
+        компилируются в одну таблицу и применяются за один проход.
+        """
+        if self.base is None:
+            raise ValueError("Нет изображения")
+        return self._render(self.stages, self.base, self.base_key, self._memo)
+
+    def preview(self, name: str, params: dict, width: int, height: int):
+        """
+        Превью стека с новыми параметрами стадии name на уменьшенной копии,
+        подходящей под область просмотра width×height. Сам стек не меняется.
+        Возвращает (масштаб, изображение).
+        """
+        scale, proxy = self.pyramid().best_for(width, height)
+
+        stages = list(self.stages)
+        override = Adjustment(name, params)
+        for i, stage in enumerate(stages):
+            if stage.name == name:
+                stages[i] = override
+                break
+        else:
+            stages.append(override)
+
+        if scale > 1:
+            stages = [stage.scaled(scale) for stage in stages]
+        return scale, self._render(stages, proxy, (self.base_key, scale), self._preview_memo)
+
+    def _render(self, stages, base, base_key, memo):
+        active = [s for s in stages if s.enabled]
+
+        keys = []
+        key = base_key
+        for stage in active:
+            key = (key, stage.key())
+            keys.append(key)
+
+        start, image = 0, base
+        for i in range(len(keys) - 1, -1, -1):
+            if keys[i] in memo:
+                memo.move_to_end(keys[i])
+                start, image = i + 1, memo[keys[i]]
+                break
+
+        i = start
+        while i < len(active):
+            if not active[i].is_point:
+                image = active[i].apply(image)
+                i += 1
+            else:
+                chain = PointChain()
+                while i < len(active) and active[i].is_point:
+                    active[i].compile_into(chain)
+                    i += 1
+                image = chain.apply(image)
+            self._remember(memo, keys[i - 1], image)
+
+        return image
+
+    def _remember(self, memo, key, image):
+        memo[key] = image
+        memo.move_to_end(key)
+        while len(memo) > self.max_cached:
+            memo.popitem(last=False)
@@ -0,0 +1,343 @@
+import io
+import os
+import shutil
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import cv2
+import numpy as np
+
+from operations import parse_steps, run_pipeline, run_pipeline_tiled
+from src.services.job_queue import jobs
+from src.utils.file_utils import ensure_directory
+from src.utils.tiled import TiledExecutor
+
+
+IMAGE_EXT = {".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp"}
+OUTPUT_FORMATS = {"png", "jpg", "webp", "tiff", "bmp"}
+
+
+class Recipe:
+    """
+    Рецепт пакетной обработки: цепочка операций из operations.py
+    и параметры сохранения. Последний шаг {"action": "save", ...} задаёт
+    формат и качество результата:
+
+        [{"action": "resize", "w": 1200},
+         {"action": "bc", "alpha": 1.1, "beta": 5},
+         {"action": "save", "format": "jpg", "quality": 90}]
+    """
+
+    def __init__(self, steps, fmt: str = None, quality: int = 90):
+        if fmt is not None and fmt not in OUTPUT_FORMATS:
+            raise ValueError(f"Неподдерживаемый формат: {fmt}")
+        self.steps = steps
+        self.format = fmt  # None — формат исходного файла
+        self.quality = int(quality)
+        parse_steps(steps)  # проверка до запуска обработки
+
+    @classmethod
+    def from_json(cls, data):
+        if isinstance(data, dict):
+            data = data.get("steps")
+        if not isinstance(data, list) or not data:
+            raise ValueError("Рецепт пуст")
+
+        steps = list(data)
+        fmt, quality = None, 90
+        if isinstance(steps[-1], dict) and steps[-1].get("action") == "save":
+            save = steps.pop()
+            fmt = save.get("format")
+            quality = save.get("quality", 90)
+        return cls(steps, fmt, quality)
+
+    def to_dict(self):
+        return {"steps": self.steps, "format": self.format, "quality": self.quality}
+
+
+# ===================== ИСТОЧНИКИ =====================
+
+def list_sources(path: str):
+    """
+    Файлы для обработки: изображения каталога (рекурсивно) или zip-архива.
+    Возвращает [(относительное имя, путь к файлу или None), ...];
+    для архива содержимое читается позже, по мере отправки в пул.
+    """
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as zf:
+            return [
+                (name, None) for name in zf.namelist()
+                if not name.endswith("/") and _is_image(name) and _safe_name(name)
+            ]
+
+    sources = []
+    for root, _, files in os.walk(path):
+        for f in sorted(files):
+            if _is_image(f):
+                full = os.path.join(root, f)
+                sources.append((os.path.relpath(full, path), full))
+    sources.sort()
+    return sources
+
+
+def _is_image(name: str) -> bool:
+    return os.path.splitext(name.lower())[1] in IMAGE_EXT
+
+
+def _safe_name(name: str) -> bool:
+    norm = os.path.normpath(name)
+    return not os.path.isabs(norm) and not norm.startswith("..")
+
+
+# ===================== ВОРКЕР =====================
+
+def _init_worker():
+    # параллельность даёт пул процессов, потоки OpenCV внутри не нужны
+    cv2.setNumThreads(1)
+
+
+def _process_file(recipe: dict, name: str, path, data, out_dir: str, tiling=None) -> dict:
+    """
+    Обработка одного файла в процессе пула. Возвращает запись о результате.
+    tiling = {"above_mp": ..., "max_bytes": ...} — изображения крупнее above_mp
+    мегапикселей обрабатываются по тайлам под потолком памяти max_bytes.
+    """
+    start = time.perf_counter()
+    try:
+        if path is not None:
+            data = np.fromfile(path, dtype=np.uint8)
+        img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        if img is None:
+            raise ValueError("Ошибка загрузки изображения")
+        megapixels = img.shape[0] * img.shape[1] / 1e6
+        steps = parse_steps(recipe["steps"])
+
+        if tiling and megapixels > tiling["above_mp"]:
+            with TiledExecutor(tiling["max_bytes"]) as ex:
+                buf = ex.from_array(img)
+                del img
+                buf, _ = run_pipeline_tiled(ex, buf, steps)
+                out_name = _save(buf.array, name, recipe, out_dir)
+                buf.delete()
+        else:
+            img, _ = run_pipeline(img, steps)
+            out_name = _save(img, name, recipe, out_dir)
+
+        return {
+            "name": name,
+            "ok": True,
+            "output": out_name,
+            "megapixels": round(megapixels, 3),
+            "ms": round((time.perf_counter() - start) * 1000, 2)
+        }
+    except Exception as e:
+        return {
+            "name": name,
+            "ok": False,
+            "error": str(e),
+            "ms": round((time.perf_counter() - start) * 1000, 2)
+        }
+
+
+def _save(img, name: str, recipe: dict, out_dir: str) -> str:
+    stem, ext = os.path.splitext(name)
+    fmt = recipe["format"] or ext.lower().lstrip(".")
+    params = []
+    if fmt in ("jpg", "jpeg"):
+        params = [cv2.IMWRITE_JPEG_QUALITY, recipe["quality"]]
+    elif fmt == "webp":
+        params = [cv2.IMWRITE_WEBP_QUALITY, recipe["quality"]]
+
+    out_name = f"{stem}.{fmt}"
+    out_path = os.path.join(out_dir, out_name)
+    ensure_directory(os.path.dirname(out_path))
+    ok, buf = cv2.imencode(f".{fmt}", img, params)
+    if not ok:
+        raise IOError(f"Не удалось закодировать изображение в {fmt}")
+    buf.tofile(out_path)
+    return out_name
+
+
+# ===================== ПАКЕТНАЯ ОБРАБОТКА =====================
+
+class BatchProcessor:
+    """
+    Прогоняет файлы через рецепт в пуле процессов.
+    В работе одновременно не больше max_in_flight файлов, поэтому память
+    ограничена независимо от размера каталога или архива.
+    """
+
+    def __init__(self, recipe: Recipe, workers: int = None, max_in_flight: int = None,
+                 tiled_above_mp: float = None, tile_max_bytes: int = 256 * 1024 * 1024):
+        self.recipe = recipe
+        self.workers = workers or os.cpu_count() or 1
+        self.max_in_flight = max_in_flight or self.workers * 2
+        self.tiling = None
+        if tiled_above_mp is not None:
+            self.tiling = {"above_mp": tiled_above_mp, "max_bytes": tile_max_bytes}
+
+    def run(self, source: str, out_dir: str, on_progress=None, cancelled=None) -> dict:
+        """
+        Обрабатывает каталог или zip-архив source, результаты пишет в out_dir.
+        on_progress(запись, сводка) вызывается после каждого файла;
+        cancelled() — проверка отмены между файлами.
+        """
+        ensure_directory(out_dir)
+        sources = list_sources(source)
+        archive = zipfile.ZipFile(source) if zipfile.is_zipfile(source) else None
+        recipe = self.recipe.to_dict()
+
+        summary = {"total": len(sources), "done": 0, "failed": 0, "megapixels": 0.0}
+        start = time.perf_counter()
+
+        try:
+            with ProcessPoolExecutor(self.workers, initializer=_init_worker) as pool:
+                pending = set()
+                queue = iter(sources)
+
+                while True:
+                    while len(pending) < self.max_in_flight and not (cancelled and cancelled()):
+                        item = next(queue, None)
+                        if item is None:
+                            break
+                        name, path = item
+                        data = archive.read(name) if archive is not None else None
+                        pending.add(pool.submit(
+                            _process_file, recipe, name, path, data, out_dir, self.tiling
+                        ))
+
+                    if not pending:
+                        break
+
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        record = future.result()
+                        summary["done"] += 1
+                        if record["ok"]:
+                            summary["megapixels"] += record["megapixels"]
+                        else:
+                            summary["failed"] += 1
+                        self._throughput(summary, start)
+                        if on_progress:
+                            on_progress(record, summary)
+        finally:
+            if archive is not None:
+                archive.close()
+
+        self._throughput(summary, start)
+        return summary
+
+    @staticmethod
+    def _throughput(summary, start):
+        elapsed = max(time.perf_counter() - start, 1e-9)
+        summary["elapsed_s"] = round(elapsed, 3)
+        summary["files_per_s"] = round(summary["done"] / elapsed, 2)
+        summary["megapixels_per_s"] = round(summary["megapixels"] / elapsed, 2)
+
+
+# ===================== ЗАДАНИЯ =====================
+
+class BatchJob:
+    """
+    Пакетное задание, запущенное через HTTP. Выполняется в общей очереди
+    заданий (job_queue) — ID совпадает с ID задания очереди, поэтому
+    статус и SSE-прогресс доступны и через /jobs/<id>.
+    """
+
+    def __init__(self, recipe: Recipe, source: str, out_dir: str, workers: int = None):
+        self.job = None  # задание очереди
+        self.recipe = recipe
+        self.source = source
+        self.out_dir = out_dir
+        self.workers = workers
+        self.summary = {"total": 0, "done": 0, "failed": 0}
+        self.files = []  # записи по каждому файлу
+        self._lock = threading.Lock()
+
+    @property
+    def id(self) -> str:
+        return self.job.id
+
+    @property
+    def status(self) -> str:
+        return self.job.status
+
+    def run(self, job):
+        self.job = job
+        processor = BatchProcessor(self.recipe, self.workers)
+        summary = processor.run(
+            self.source, self.out_dir,
+            on_progress=self._progress,
+            cancelled=lambda: job.cancelled
+        )
+        with self._lock:
+            self.summary = dict(summary)
+        job.check_cancelled()
+        return dict(summary)
+
+    def _progress(self, record, summary):
+        with self._lock:
+            self.files.append(record)
+            self.summary = dict(summary)
+        total = summary["total"] or 1
+        self.job.report(summary["done"] / total, f"{summary['done']} из {summary['total']}: {record['name']}")
+
+    def archive(self) -> bytes:
+        """
+        Результаты задания одним zip-архивом.
+        """
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, "w", zipfile.ZIP_STORED) as zf:
+            for record in list(self.files):
+                if record["ok"]:
+                    zf.write(os.path.join(self.out_dir, record["output"]), record["output"])
+        return buf.getvalue()
+
+    def to_dict(self, since: int = 0):
+        with self._lock:
+            return {
+                "job_id": self.id,
+                "status": self.status,
+                "error": self.job.error,
+                **self.summary,
+                "files": self.files[since:],
+            }
+
+
+class BatchJobs:
+    """
+    Реестр пакетных заданий. Задания выполняются в общей очереди,
+    каждое со своим пулом процессов.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, recipe: Recipe, archive_bytes: bytes, workers: int = None) -> BatchJob:
+        job_dir = os.path.join(self.root, uuid.uuid4().hex)
+        ensure_directory(job_dir)
+
+        source = os.path.join(job_dir, "input.zip")
+        with open(source, "wb") as f:
+            f.write(archive_bytes)
+        if not zipfile.is_zipfile(source):
+            shutil.rmtree(job_dir, ignore_errors=True)
+            raise ValueError("Ожидается zip-архив с изображениями")
+
+        batch = BatchJob(recipe, source, os.path.join(job_dir, "output"), workers)
+        batch.job = jobs.submit("batch", lambda job: batch.run(job))
+        with self._lock:
+            self._jobs[batch.id] = batch
+        return batch
+
+    def get(self, job_id: str):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+
+batch_jobs = BatchJobs(os.path.join("uploads", "batch"))
@@ -1,9 +1,6 @@
 import cv2
 
-from src.models.project_model import ProjectModel
-from src.services.history_manager import HistoryManager
-from src.utils.file_utils import ensure_directory
-from src.utils.image_utils import save_image
+from src.utils.image_cache import image_cache
 
 
 class CanvasService:
@@ -22,10 +19,7 @@ class CanvasService:
         if not self.project.has_current():
             raise ValueError("Нет изображения")
 
-        # сохраняем состояние ДО изменения
-        self.history.push()
-
-        image = cv2.imread(self.project.current_path)
+        image = image_cache.read(self.project.current_path)
 
         resized = cv2.resize(
             image,
@@ -33,14 +27,4 @@ class CanvasService:
             interpolation=cv2.INTER_CUBIC
         )
 
-        save_image(self.project.current_path, resized)
-
-UPLOAD_DIR = "uploads"
-
-ensure_directory(UPLOAD_DIR)
-
-# ===================== PROJECT & HISTORY =====================
-project = ProjectModel(UPLOAD_DIR)
-history = HistoryManager(project)
-
-canvas_service = CanvasService(project, history)
\ No newline at end of file
+        self.history.commit(resized)
@@ -1,112 +1,127 @@
-import cv2
-import numpy as np
-
-from src.services.history_manager import HistoryManager
-from src.utils.image_utils import save_image, decode_image
-from src.utils.file_utils import copy_file, ensure_directory
-from src.models.project_model import ProjectModel
+from src.utils.image_cache import image_cache
+from src.utils.noise import new_seed
+from src.utils.result_cache import result_cache
 
 
 class FilterService:
     """
     Применение фильтров к изображению.
-    Все изменения записываются в историю.
+    Фильтры — стадии неразрушающего стека коррекций (AdjustmentStack),
+    результат стека записывается в историю. Результаты рендера кэшируются
+    по содержимому базы и параметрам включённых стадий (result_cache).
     """
 
-    def __init__(self, project, history):
+    def __init__(self, project, history, adjustments):
         self.project = project
         self.history = history
+        self.adjustments = adjustments
 
     # ===================== ВНУТРЕННИЕ =====================
 
-    def _backup(self):
+    def _sync_base(self):
         """
-        Сохраняем текущее состояние в историю.
+        Если текущее изображение изменили в обход стека (загрузка, трансформация,
+        откат) — стек запекается и его базой становится текущее изображение.
         """
-        if self.project.has_current():
-            self.history.push()
+        version = image_cache.version(self.project.current_path)
+        if self.adjustments.base is not None and version == self.adjustments.output_version:
+            return
 
-    def _load_original(self):
-        """
-        Загружаем оригинальное изображение.
-        """
-        if not self.project.has_original():
-            raise ValueError("Нет оригинального изображения")
-        return cv2.imread(self.project.original_path)
+        if not self.project.has_current():
+            raise ValueError("Нет изображения")
+        path = self.project.current_path
+        self.adjustments.rebase(image_cache.read(path), image_cache.content_hash(path))
+
+    def _render(self):
+        stages = [stage.key() for stage in self.adjustments.stages if stage.enabled]
+        key = result_cache.key(self.adjustments.base_key, "filters", stages)
+
+        result = result_cache.get(key)
+        if result is None:
+            result = result_cache.put(key, self.adjustments.render())
+        self.adjustments.output_version = self.history.commit(result.image, result.handle)
+
+    def _set(self, name: str, **params):
+        self._sync_base()
+        self.adjustments.set(name, **params)
+        self._render()
 
     # ===================== BRIGHTNESS / CONTRAST =====================
 
     def brightness_contrast(self, brightness: int, contrast: float):
-        self._backup()
-        img = self._load_original()
-        result = cv2.convertScaleAbs(img, alpha=contrast, beta=brightness)
-        save_image(self.project.current_path, result)
+        self._set("brightness_contrast", brightness=brightness, contrast=contrast)
 
     # ===================== COLOR BALANCE =====================
 
     def color_balance(self, r: int, g: int, b: int):
-        self._backup()
-        img = self._load_original()
-        b_ch, g_ch, r_ch = cv2.split(img)
-        r_ch = cv2.add(r_ch, r)
-        g_ch = cv2.add(g_ch, g)
-        b_ch = cv2.add(b_ch, b)
-        result = cv2.merge([b_ch, g_ch, r_ch])
-        save_image(self.project.current_path, result)
+        self._set("color_balance", r=r, g=g, b=b)
 
-    # ===================== GAUSSIAN NOISE =====================
+    # ===================== GAMMA / INVERT / LEVELS =====================
 
-    def add_gaussian_noise(self, sigma: float):
-        self._backup()
-        img = self._load_original()
-        noise = np.random.normal(0, sigma, img.shape).astype(np.float32)
-        noisy = cv2.add(img.astype(np.float32), noise)
-        noisy = np.clip(noisy, 0, 255).astype(np.uint8)
-        save_image(self.project.current_path, noisy)
+    def gamma(self, value: float):
+        self._set("gamma", value=value)
 
-    # ===================== BLUR =====================
+    def invert(self):
+        self._set("invert")
 
-    def blur(self, blur_type: str, ksize: int):
-        self._backup()
-        img = self._load_original()
+    def levels(self, in_black: int, in_white: int, gamma: float, out_black: int, out_white: int):
+        if in_white <= in_black:
+            raise ValueError("in_white должен быть больше in_black")
+        self._set("levels", in_black=in_black, in_white=in_white, gamma=gamma,
+                  out_black=out_black, out_white=out_white)
 
-        # корректируем ksize
-        ksize = max(3, int(ksize))  # минимум 3
-        if ksize % 2 == 0:
-            ksize += 1  # делаем нечётным
+    # ===================== GAUSSIAN NOISE =====================
+
+    # seed сохраняется в параметрах стадии: повторный рендер стека,
+    # превью и откат дают тот же шум
 
-        if blur_type == "average":
-            result = cv2.blur(img, (ksize, ksize))
-        elif blur_type == "gaussian":
-            result = cv2.GaussianBlur(img, (ksize, ksize), 0)
-        elif blur_type == "median":
-            result = cv2.medianBlur(img, ksize)
-        else:
-            raise ValueError("Неизвестный тип размытия")
+    def add_gaussian_noise(self, sigma: float, seed: int = None):
+        self._set("gaussian_noise", sigma=sigma, seed=new_seed() if seed is None else seed)
 
-        save_image(self.project.current_path, result)
+    def add_noise(self, noise_type: str, amount: float, seed: int = None):
+        self._set("noise", noise_type=noise_type, amount=amount,
+                  seed=new_seed() if seed is None else seed)
+
+    # ===================== BLUR =====================
+
+    def blur(self, blur_type: str, ksize: int):
+        self._set("blur", blur_type=blur_type, ksize=ksize)
 
     # ===================== BRIGHTNESS + RGB =====================
 
     def brightness_contrast_rgb(self, brightness: int, contrast: float, r: int, g: int, b: int):
-        self._backup()
-        img = self._load_original()
-        img_bc = cv2.convertScaleAbs(img, alpha=contrast, beta=brightness)
+        self._sync_base()
+        self.adjustments.set("brightness_contrast", brightness=brightness, contrast=contrast)
+        self.adjustments.set("color_balance", r=r, g=g, b=b)
+        self._render()
+
+    # ===================== ПРЕВЬЮ =====================
 
-        b_ch, g_ch, r_ch = cv2.split(img_bc)
-        r_ch = cv2.add(r_ch, r)
-        g_ch = cv2.add(g_ch, g)
-        b_ch = cv2.add(b_ch, b)
+    def preview(self, name: str, params: dict, width: int, height: int):
+        """
+        Превью коррекции на уменьшенной копии под область просмотра.
+        Ни стек, ни текущее изображение не меняются.
+        Возвращает (масштаб, изображение).
+        """
+        self._sync_base()
+        return self.adjustments.preview(name, params, width, height)
 
-        result = cv2.merge([b_ch, g_ch, r_ch])
-        save_image(self.project.current_path, result)
+    # ===================== СТЕК КОРРЕКЦИЙ =====================
 
-UPLOAD_DIR = "uploads"
+    def list_adjustments(self):
+        return self.adjustments.to_list()
 
-ensure_directory(UPLOAD_DIR)
+    def toggle(self, name: str, enabled: bool):
+        self._sync_base()
+        self.adjustments.toggle(name, enabled)
+        self._render()
 
-# ===================== PROJECT & HISTORY =====================
-project = ProjectModel(UPLOAD_DIR)
-history = HistoryManager(project)
+    def remove(self, name: str):
+        self._sync_base()
+        self.adjustments.remove(name)
+        self._render()
 
-filter_service = FilterService(project, history)
\ No newline at end of file
+    def reorder(self, names):
+        self._sync_base()
+        self.adjustments.reorder(names)
+        self._render()
@@ -1,58 +1,226 @@
 import os
-from src.utils.file_utils import ensure_directory, copy_file
+import pickle
+import zlib
+from collections import deque
+
+import numpy as np
+
+from src.utils.image_cache import image_cache
+from src.utils.metrics import timed
+
+
+TILE_SIZE = 64
+
+# если изменилась большая часть тайлов — дешевле хранить ключевой кадр
+KEYFRAME_RATIO = 0.5
+
+
+class Delta:
+    """
+    Одна запись истории: сжатые в памяти тайлы (или ключевой кадр целиком),
+    которые нужно вернуть на место, чтобы перейти к другому состоянию.
+    """
+
+    __slots__ = ("shape", "dtype", "tiles", "keyframe", "nbytes", "content_hash")
+
+    def __init__(self, shape, dtype, tiles=None, keyframe=None):
+        self.shape = shape
+        self.dtype = dtype
+        self.tiles = tiles or []   # [(y, x, h, w, zlib-байты)]
+        self.keyframe = keyframe   # zlib-байты всего кадра
+        self.content_hash = None   # хэш восстанавливаемого состояния, если известен
+        self.nbytes = sum(len(t[4]) for t in self.tiles) + len(keyframe or b"")
+
+    # ===================== СОЗДАНИЕ =====================
+
+    @classmethod
+    def capture_keyframe(cls, image):
+        data = zlib.compress(np.ascontiguousarray(image).tobytes(), 1)
+        return cls(image.shape, image.dtype, keyframe=data)
+
+    @classmethod
+    def capture_tiles(cls, image, coords, tile=TILE_SIZE):
+        tiles = []
+        for y, x in coords:
+            block = np.ascontiguousarray(image[y:y + tile, x:x + tile])
+            tiles.append((y, x, block.shape[0], block.shape[1],
+                          zlib.compress(block.tobytes(), 1)))
+        return cls(image.shape, image.dtype, tiles=tiles)
+
+    @classmethod
+    def between(cls, before, after, tile=TILE_SIZE):
+        """
+        Дельта, возвращающая after -> before.
+        Полнокадровые операции (другой размер, почти все тайлы изменены)
+        сохраняются ключевым кадром.
+        """
+        if before.shape != after.shape or before.dtype != after.dtype:
+            return cls.capture_keyframe(before)
+
+        coords = changed_tiles(before, after, tile)
+        rows = -(-before.shape[0] // tile)
+        cols = -(-before.shape[1] // tile)
+        if len(coords) > rows * cols * KEYFRAME_RATIO:
+            return cls.capture_keyframe(before)
+
+        return cls.capture_tiles(before, coords, tile)
+
+    # ===================== ПРИМЕНЕНИЕ =====================
+
+    def apply(self, image):
+        """
+        Применяет дельту к image.
+        Возвращает (новое изображение, обратная дельта).
+        """
+        if self.keyframe is not None:
+            restored = np.frombuffer(zlib.decompress(self.keyframe), dtype=self.dtype)
+            return restored.reshape(self.shape).copy(), Delta.capture_keyframe(image)
+
+        inverse = Delta.capture_tiles(image, [(y, x) for y, x, _, _, _ in self.tiles])
+        out = image.copy()
+        for y, x, h, w, data in self.tiles:
+            block = np.frombuffer(zlib.decompress(data), dtype=self.dtype)
+            out[y:y + h, x:x + w] = block.reshape((h, w) + self.shape[2:])
+        return out, inverse
+
+
+def changed_tiles(before, after, tile=TILE_SIZE):
+    """
+    Координаты (y, x) левых верхних углов тайлов, в которых изображения различаются.
+    """
+    if before is after:
+        return []
+
+    diff = before != after
+    if diff.ndim == 3:
+        diff = diff.any(axis=2)
+
+    h, w = diff.shape
+    rows, cols = -(-h // tile), -(-w // tile)
+    padded = np.zeros((rows * tile, cols * tile), dtype=bool)
+    padded[:h, :w] = diff
+    mask = padded.reshape(rows, tile, cols, tile).any(axis=(1, 3))
+
+    return [(int(r) * tile, int(c) * tile) for r, c in zip(*np.nonzero(mask))]
 
 
 class HistoryManager:
     """
-    Управляет историей изменений изображения.
-    Сохраняет СОСТОЯНИЕ ДО каждого изменения.
+    Управляет историей изменений изображения (undo/redo).
+    Хранит в памяти только изменившиеся тайлы в сжатом виде,
+    для полнокадровых операций — ключевые кадры.
+    Объём истории ограничен project.max_history и project.history_budget.
     """
 
     def __init__(self, project):
         self.project = project
-        ensure_directory(self.project.history_dir)
+        self._undo = deque()
+        self._redo = []
+        self._bytes = 0
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes + sum(d.nbytes for d in self._redo)
+
+    def can_undo(self) -> bool:
+        return bool(self._undo)
+
+    def can_redo(self) -> bool:
+        return bool(self._redo)
 
     # ===================== СОХРАНЕНИЕ СОСТОЯНИЯ =====================
 
-    def push(self):
+    @timed("HistoryManager.commit")
+    def commit(self, image, content_hash: str = None) -> int:
         """
-        Сохраняет текущее изображение в историю.
-        Вызывается ПЕРЕД любым изменением.
+        Делает image текущим изображением и записывает дельту в историю.
+        content_hash — хэш содержимого image, если он уже известен.
+        Возвращает новую версию текущего изображения.
         """
-        if not self.project.has_current():
-            return
-
-        files = sorted(
-            os.listdir(self.project.history_dir),
-            key=lambda x: int(x.split("_")[1].split(".")[0])
-        )
+        path = self.project.current_path
+        before = image_cache.read(path)
+        if before is not None:
+            # хэш состояния сохраняется в дельте: после отката кэш результатов
+            # находит его без повторного хэширования
+            delta = Delta.between(before, image)
+            delta.content_hash = image_cache.known_hash(path)
+            self._push(delta)
+            self._redo.clear()
+        return image_cache.write(path, image, content_hash)
 
-        # ограничение истории
-        if len(files) >= self.project.max_history:
-            oldest = files[0]
-            os.remove(os.path.join(self.project.history_dir, oldest))
-            files.pop(0)
+    def _push(self, delta):
+        self._undo.append(delta)
+        self._bytes += delta.nbytes
 
-        index = len(files)
-        dst = os.path.join(self.project.history_dir, f"step_{index}.png")
-        copy_file(self.project.current_path, dst)
+        # ограничение истории: по количеству шагов и по объёму памяти
+        while len(self._undo) > 1 and (
+            len(self._undo) > self.project.max_history
+            or self._bytes > self.project.history_budget
+        ):
+            self._bytes -= self._undo.popleft().nbytes
 
-    # ===================== ОТКАТ =====================
+    # ===================== ОТКАТ / ПОВТОР =====================
 
+    @timed("HistoryManager.undo")
     def undo(self):
         """
-        Откатывает к последнему сохранённому состоянию.
+        Откатывает к предыдущему состоянию.
         """
-        files = sorted(
-            os.listdir(self.project.history_dir),
-            key=lambda x: int(x.split("_")[1].split(".")[0])
-        )
-
-        if not files:
+        if not self._undo:
             raise ValueError("История пуста")
 
-        last = files[-1]
-        src = os.path.join(self.project.history_dir, last)
+        delta = self._undo.pop()
+        self._bytes -= delta.nbytes
+
+        path = self.project.current_path
+        inverse_hash = image_cache.known_hash(path)
+        image, inverse = delta.apply(image_cache.read(path))
+        inverse.content_hash = inverse_hash
+        self._redo.append(inverse)
+        image_cache.write(path, image, getattr(delta, "content_hash", None))
 
-        copy_file(src, self.project.current_path)
-        os.remove(src)
+    @timed("HistoryManager.redo")
+    def redo(self):
+        """
+        Повторяет последнее отменённое изменение.
+        """
+        if not self._redo:
+            raise ValueError("Нечего повторять")
+
+        delta = self._redo.pop()
+
+        path = self.project.current_path
+        inverse_hash = image_cache.known_hash(path)
+        image, inverse = delta.apply(image_cache.read(path))
+        inverse.content_hash = inverse_hash
+        self._undo.append(inverse)
+        self._bytes += inverse.nbytes
+        image_cache.write(path, image, getattr(delta, "content_hash", None))
+
+    def clear(self):
+        self._undo.clear()
+        self._redo.clear()
+        self._bytes = 0
+
+    # ===================== ВЫГРУЗКА НА ДИСК =====================
+
+    def dump(self, path: str):
+        """
+        Сохраняет историю в файл и освобождает память.
+        """
+        with open(path, "wb") as f:
+            pickle.dump((list(self._undo), self._redo), f, pickle.HIGHEST_PROTOCOL)
+        self.clear()
+
+    def restore(self, path: str):
+        """
+        Загружает историю, выгруженную dump().
+        """
+        if not os.path.exists(path):
+            return
+        with open(path, "rb") as f:
+            undo, redo = pickle.load(f)
+        os.remove(path)
+        self._undo = deque(undo)
+        self._redo = redo
+        self._bytes = sum(d.nbytes for d in self._undo)
@@ -1,64 +1,105 @@
-import cv2
-import os
 import base64
+from collections import OrderedDict
 
-from src.models.project_model import ProjectModel
-from src.utils.image_utils import save_image, decode_image
-from src.utils.file_utils import copy_file, ensure_directory
-from src.services.history_manager import HistoryManager
+from src.utils.image_utils import decode_image
+from src.utils.export_engine import ExportSpec, encode_many
+from src.utils.image_cache import image_cache
+from src.utils.image_handles import content_hash
 
 class ImageService:
-    def __init__(self, project):
+    MAX_EXPORTS = 8  # закодированных вариантов экспорта в памяти
+
+    def __init__(self, project, history, adjustments):
         self.project = project
-        self.history = HistoryManager(project)
+        self.history = history
+        self.adjustments = adjustments
+        self._exports = OrderedDict()  # (ETag версии, параметры) -> байты
 
     def upload_image(self, file_bytes: bytes):
         image = decode_image(file_bytes)
-        save_image(self.project.original_path, image)
-        save_image(self.project.current_path, image)
+        digest = content_hash(image)
+        image_cache.write(self.project.original_path, image, digest)
+        version = image_cache.write(self.project.current_path, image, digest)
         self.history.clear()
 
+        # база коррекций и пирамида превью готовятся сразу при загрузке
+        self.adjustments.rebase(image, digest)
+        self.adjustments.output_version = version
+        self.adjustments.pyramid()
+
     def undo(self):
         self.history.undo()
 
+    def redo(self):
+        self.history.redo()
+
     def reset(self):
-        copy_file(self.project.original_path, self.project.current_path)
+        original = image_cache.read(self.project.original_path)
+        if original is None:
+            raise ValueError("Нет оригинального изображения")
+        image_cache.write(self.project.current_path, original, image_cache.known_hash(self.project.original_path))
         self.history.clear()
 
     def get_current_base64(self):
-        if not os.path.exists(self.project.current_path):
+        data = self.get_current_png()
+        if data is None:
             return None
-        with open(self.project.current_path, "rb") as f:
-            return base64.b64encode(f.read()).decode()
+        return base64.b64encode(data).decode()
 
-    # ===================== ЭКСПОРТ В РАЗНЫЕ ФОРМАТЫ =====================
-    def export(self, fmt: str):
-        img = cv2.imread(self.project.current_path)
-        fmt = fmt.lower()
-        if fmt not in ["png", "jpg", "jpeg", "tiff", "tif"]:
-            fmt = "png"  # формат по умолчанию
+    def get_current_png(self):
+        """
+        PNG-байты текущего изображения (кодируются один раз на версию).
+        """
+        return image_cache.encoded(self.project.current_path)
 
-        # корректное расширение
-        ext_map = {"jpeg": "jpg", "tif": "tiff"}
-        ext = ext_map.get(fmt, fmt)
+    def version(self) -> int:
+        """
+        Версия текущего изображения: растёт при каждом изменении.
+        """
+        return image_cache.version(self.project.current_path)
 
-        path = self.project.current_path.rsplit(".", 1)[0] + f".{ext}"
+    def etag(self) -> str:
+        return image_cache.etag(self.project.current_path)
 
-        # параметры сохранения для JPG
-        if ext in ["jpg", "jpeg"]:
-            cv2.imwrite(path, img, [int(cv2.IMWRITE_JPEG_QUALITY), 95])
-        else:
-            cv2.imwrite(path, img)
+    # ===================== ЭКСПОРТ В РАЗНЫЕ ФОРМАТЫ =====================
+    def export(self, spec: ExportSpec) -> bytes:
+        """
+        Кодирует текущее изображение в памяти по параметрам spec.
+        Результат кэшируется по (версия, параметры): пока изображение
+        не менялось, повторный экспорт не кодирует заново.
+        """
+        return self.export_many([spec])[0]
 
-        return path
+    def export_many(self, specs):
+        """
+        Несколько вариантов (форматов, размеров) из одного кадра, параллельно.
+        Возвращает список байтов в порядке specs.
+        """
+        etag = self.etag()
+        blobs = [self._exports.get((etag, spec.key())) for spec in specs]
+        missing = [i for i, data in enumerate(blobs) if data is None]
+        if not missing:
+            return blobs
 
-UPLOAD_DIR = "uploads"
+        img = image_cache.read(self.project.current_path)
+        if img is None:
+            raise ValueError("Нет изображения")
 
-ensure_directory(UPLOAD_DIR)
+        # PNG по умолчанию кодируется один раз на версию и общий с /current
+        todo = []
+        for i in missing:
+            spec = specs[i]
+            if spec.fmt == "png" and spec.key() == ExportSpec("png").key():
+                blobs[i] = image_cache.encoded(self.project.current_path)
+            else:
+                todo.append(i)
 
-# ===================== PROJECT & HISTORY =====================
-project = ProjectModel(UPLOAD_DIR)
-history = HistoryManager(project)
+        for i, data in zip(todo, encode_many(img, [specs[i] for i in todo])):
+            blobs[i] = data
 
-# ===================== SERVICES =====================
-image_service = ImageService(project)
+        for i in missing:
+            self._exports[(etag, specs[i].key())] = blobs[i]
+            self._exports.move_to_end((etag, specs[i].key()))
+        while len(self._exports) > self.MAX_EXPORTS:
+            self._exports.popitem(last=False)
+        return blobs
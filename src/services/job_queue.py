@@ -0,0 +1,184 @@
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Job:
+    """
+    Фоновое задание: статус, прогресс, результат.
+
+    Функция задания получает сам Job первым аргументом и может сообщать
+    прогресс (job.report) и проверять отмену (job.check_cancelled).
+    Отмена срабатывает до запуска или в ближайшей точке проверки —
+    уже идущий вызов OpenCV не прерывается.
+    """
+
+    def __init__(self, kind: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = "queued"  # queued, running, done, error, cancelled
+        self.progress = 0.0
+        self.message = None
+        self.result = None
+        self.mimetype = None  # для бинарного результата
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+
+        self._cancel = threading.Event()
+        self._cond = threading.Condition()
+        self._revision = 0  # растёт при каждом изменении — для SSE
+
+    # ===================== ИЗ ФУНКЦИИ ЗАДАНИЯ =====================
+
+    def report(self, progress: float = None, message: str = None):
+        self.check_cancelled()
+        with self._cond:
+            if progress is not None:
+                self.progress = max(0.0, min(1.0, float(progress)))
+            if message is not None:
+                self.message = message
+            self._touch()
+
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    # ===================== СНАРУЖИ =====================
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("done", "error", "cancelled")
+
+    def cancel(self) -> bool:
+        """
+        Запрашивает отмену. Возвращает False, если задание уже завершено.
+        """
+        if self.done:
+            return False
+        self._cancel.set()
+        with self._cond:
+            if self.status == "queued":
+                self._finish("cancelled")
+            self._touch()
+        return True
+
+    def wait(self, revision: int, timeout: float = None) -> int:
+        """
+        Ждёт изменения задания после revision. Возвращает текущую ревизию.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._revision != revision or self.done, timeout)
+            return self._revision
+
+    def to_dict(self):
+        with self._cond:
+            data = {
+                "job_id": self.id,
+                "kind": self.kind,
+                "status": self.status,
+                "progress": round(self.progress, 4),
+                "message": self.message,
+                "error": self.error,
+                "created": self.created,
+                "started": self.started,
+                "finished": self.finished,
+            }
+            if self.status == "done":
+                data["result_url"] = f"/jobs/{self.id}/result"
+            return data
+
+    # ===================== ВНУТРЕННИЕ =====================
+
+    def _run(self, fn, args, kwargs):
+        with self._cond:
+            if self.status != "queued":
+                return
+            self.status = "running"
+            self.started = time.time()
+            self._touch()
+
+        try:
+            self.check_cancelled()
+            result = fn(self, *args, **kwargs)
+            with self._cond:
+                self.result = result
+                self.progress = 1.0
+                self._finish("done")
+        except JobCancelled:
+            with self._cond:
+                self._finish("cancelled")
+        except Exception as e:
+            traceback.print_exc()
+            with self._cond:
+                self.error = str(e)
+                self._finish("error")
+
+    def _finish(self, status):
+        self.status = status
+        self.finished = time.time()
+        self._touch()
+
+    def _touch(self):
+        self._revision += 1
+        self._cond.notify_all()
+
+
+class JobQueue:
+    """
+    Очередь фоновых заданий с ограниченным пулом потоков.
+    OpenCV и NumPy отпускают GIL на тяжёлых операциях, поэтому потоков достаточно.
+
+    Не больше max_pending незавершённых заданий (иначе QueueFull),
+    завершённые хранятся, пока их не больше max_finished.
+    """
+
+    def __init__(self, max_workers: int = 4, max_pending: int = 64, max_finished: int = 256):
+        self.max_pending = max_pending
+        self.max_finished = max_finished
+        self._pool = ThreadPoolExecutor(max_workers, thread_name_prefix="job")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, fn, *args, **kwargs) -> Job:
+        job = Job(kind)
+        with self._lock:
+            pending = sum(1 for j in self._jobs.values() if not j.done)
+            if pending >= self.max_pending:
+                raise QueueFull("Очередь заданий переполнена, повторите позже")
+            self._jobs[job.id] = job
+            self._trim()
+        self._pool.submit(job._run, fn, args, kwargs)
+        return job
+
+    def get(self, job_id: str):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def _trim(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+
+jobs = JobQueue()
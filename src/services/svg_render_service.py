@@ -0,0 +1,221 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+from lxml import etree
+
+from src.utils.export_engine import ExportSpec, encode, fit_size
+from src.utils.metrics import timed
+
+try:
+    import cairosvg
+except (ImportError, OSError):  # нет пакета или системной libcairo
+    cairosvg = None
+
+
+# больше этого число пикселей рендерится полосами — память cairo ограничена одной полосой
+MAX_TILE_PIXELS = 4096 * 4096
+MAX_SIDE = 32768
+
+DEFAULT_SIZE = (800, 600)
+
+_parser = etree.XMLParser(resolve_entities=False, no_network=True, huge_tree=True)
+_length = re.compile(r"^\s*([0-9.eE+-]+)\s*(px)?\s*$")
+
+# документы (артборды) и полосы — в разных пулах: задача документа ждёт свои полосы
+_documents = ThreadPoolExecutor(max_workers=4, thread_name_prefix="svg-render")
+_tiles = ThreadPoolExecutor(max_workers=4, thread_name_prefix="svg-tile")
+
+
+class SVGRenderer:
+    """
+    Растеризация SVG через CairoSVG в PNG, JPEG и WebP.
+
+    Результаты кэшируются по (хэш SVG, размер, формат, качество, фон) с
+    ограничением объёма (LRU). Большие изображения рендерятся горизонтальными
+    полосами: каждая полоса — тот же документ с viewBox на свой участок,
+    поэтому поверхность cairo не больше MAX_TILE_PIXELS. Несколько документов
+    (артбордов) рендерятся параллельно в пуле потоков.
+    """
+
+    def __init__(self, max_bytes: int = 128 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        return cairosvg is not None
+
+    # ===================== РЕНДЕР =====================
+
+    def render(self, svg, width: int = None, height: int = None, fmt: str = "png",
+               quality: int = None, background: str = None) -> bytes:
+        """
+        Растеризует документ. Без размеров — собственный размер документа,
+        с одной стороной — с сохранением пропорций.
+        RuntimeError — CairoSVG недоступен, ValueError — неверный документ или параметры.
+        """
+        if cairosvg is None:
+            raise RuntimeError("CairoSVG недоступен: установите cairosvg и системную библиотеку cairo")
+
+        data = svg.encode("utf-8") if isinstance(svg, str) else svg
+        spec = ExportSpec(fmt, quality=quality)
+        if spec.fmt == "jpg" and not background:
+            background = "white"  # у JPEG нет альфа-канала
+
+        root = _parse(data)
+        width, height = fit_size(intrinsic_size(root)[::-1], width, height)
+        if not 0 < width <= MAX_SIDE or not 0 < height <= MAX_SIDE:
+            raise ValueError(f"Размер должен быть от 1 до {MAX_SIDE}")
+
+        key = (hashlib.blake2b(data, digest_size=16).hexdigest(), width, height, spec.key(), background)
+        with self._lock:
+            cached = self._items.get(key)
+            if cached is not None:
+                self.hits += 1
+                self._items.move_to_end(key)
+                return cached
+            self.misses += 1
+
+        result = self._render(data, root, width, height, spec, background)
+
+        with self._lock:
+            if key not in self._items:
+                self._items[key] = result
+                self._bytes += len(result)
+                while self._bytes > self.max_bytes and len(self._items) > 1:
+                    _, old = self._items.popitem(last=False)
+                    self._bytes -= len(old)
+        return result
+
+    def render_many(self, jobs):
+        """
+        Несколько документов параллельно. jobs — словари аргументов render;
+        возвращает список байтов или исключений в порядке jobs.
+        """
+        futures = [_documents.submit(self.render, **job) for job in jobs]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except (RuntimeError, ValueError) as e:
+                results.append(e)
+        return results
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._items), "bytes": self._bytes}
+
+    # ===================== ВНУТРЕННИЕ =====================
+
+    @timed("svg.render")
+    def _render(self, data, root, width, height, spec, background):
+        if width * height <= MAX_TILE_PIXELS:
+            png = cairosvg.svg2png(bytestring=data, output_width=width, output_height=height,
+                                   background_color=background)
+            if spec.fmt == "png" and spec.preset is None:
+                return png  # PNG cairo отдаётся без перекодирования
+            image = _decode(png)
+        else:
+            image = self._render_tiled(root, width, height, background)
+
+        if spec.fmt == "jpg":
+            image = image[:, :, :3]
+        return encode(image, spec)
+
+    def _render_tiled(self, root, width, height, background):
+        image = np.empty((height, width, 4), dtype=np.uint8)
+        rows = max(1, MAX_TILE_PIXELS // width)
+
+        def strip(y0):
+            y1 = min(height, y0 + rows)
+            png = cairosvg.svg2png(bytestring=strip_document(root, width, height, y0, y1),
+                                   output_width=width, output_height=y1 - y0,
+                                   background_color=background)
+            image[y0:y1] = _decode(png)
+
+        list(_tiles.map(strip, range(0, height, rows)))
+        return image
+
+
+def _parse(data: bytes):
+    try:
+        root = etree.fromstring(data, _parser)
+    except etree.XMLSyntaxError as e:
+        raise ValueError(f"Неверный SVG: {e}")
+    if not isinstance(root.tag, str) or etree.QName(root).localname != "svg":
+        raise ValueError("Корневой элемент должен быть <svg>")
+    return root
+
+
+def _decode(png: bytes):
+    image = cv2.imdecode(np.frombuffer(png, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+    if image is None:
+        raise ValueError("Не удалось декодировать результат рендера")
+    if image.ndim == 2:
+        image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGRA)
+    elif image.shape[2] == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2BGRA)
+    return image
+
+
+def _view_box(root):
+    value = root.get("viewBox")
+    if value:
+        parts = [float(p) for p in re.split(r"[\s,]+", value.strip()) if p]
+        if len(parts) == 4 and parts[2] > 0 and parts[3] > 0:
+            return parts
+    return None
+
+
+def intrinsic_size(root):
+    """
+    Собственный размер документа в пикселях: width/height (px или без
+    единиц), иначе viewBox, иначе DEFAULT_SIZE.
+    """
+    view_box = _view_box(root)
+    size = []
+    for name, index, default in (("width", 2, DEFAULT_SIZE[0]), ("height", 3, DEFAULT_SIZE[1])):
+        match = _length.match(root.get(name, ""))
+        if match:
+            size.append(max(1, round(float(match.group(1)))))
+        else:
+            size.append(max(1, round(view_box[index])) if view_box else default)
+    return tuple(size)
+
+
+def strip_document(root, width, height, y0, y1) -> bytes:
+    """
+    Документ, дающий при размере width×(y1-y0) строки y0..y1 рендера width×height.
+    Масштаб и центрирование — как у preserveAspectRatio по умолчанию (xMidYMid meet)
+    или "none", если так задано в документе.
+    """
+    view_box = _view_box(root)
+    if view_box is None:
+        w, h = intrinsic_size(root)
+        view_box = [0.0, 0.0, float(w), float(h)]
+    vx, vy, vw, vh = view_box
+
+    if root.get("preserveAspectRatio", "").strip().startswith("none"):
+        sx, sy, tx, ty = width / vw, height / vh, 0.0, 0.0
+    else:
+        sx = sy = min(width / vw, height / vh)
+        tx, ty = (width - vw * sx) / 2, (height - vh * sy) / 2
+
+    strip = etree.fromstring(etree.tostring(root), _parser)
+    strip.set("width", str(width))
+    strip.set("height", str(y1 - y0))
+    strip.set("viewBox", f"{vx - tx / sx} {vy + (y0 - ty) / sy} {width / sx} {(y1 - y0) / sy}")
+    strip.set("preserveAspectRatio", "none")
+    return etree.tostring(strip)
+
+
+svg_renderer = SVGRenderer()
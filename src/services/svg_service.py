@@ -6,6 +6,8 @@ import base64
 import tempfile
 import os
 
+from src.services.svg_render_service import svg_renderer
+
 
 class SVGService:
     @staticmethod
@@ -133,9 +135,8 @@ class SVGService:
 
     @staticmethod
     def export_png(svg_content, width, height):
-        """Экспорт в PNG (заглушка - требует Cairo)"""
-        # В реальности нужен Cairo или другой конвертер
-        return None
+        """Экспорт в PNG через CairoSVG (байты PNG, результат кэшируется)"""
+        return svg_renderer.render(svg_content, width, height, "png")
 
     @staticmethod
     def trace_image(image_path, threshold=128):
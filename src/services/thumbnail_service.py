@@ -0,0 +1,166 @@
+import hashlib
+import os
+import threading
+
+import cv2
+import numpy as np
+
+from src.models.project_store import project_store
+from src.services.svg_render_service import svg_renderer
+from src.utils.export_engine import ExportSpec, encode
+from src.utils.svg_utils import SVGUtils
+
+
+SIZES = (128, 256, 512)
+DEFAULT_SIZE = 256
+
+RASTER_EXT = {".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp"}
+
+
+class ThumbnailService:
+    """
+    Миниатюры векторных проектов и растровых файлов (static/outputs).
+
+    Миниатюра хранится на диске по хэшу содержимого источника и размеру:
+    thumbnails/<хэш>_<размер>.<ext>. Пока источник не менялся, URL
+    с этим хэшем отдаёт одни и те же байты, поэтому ответ кэшируется
+    браузером надолго. Перед сохранением или изменением проекта его
+    миниатюры удаляются (invalidate_project).
+
+    Векторные проекты рендерятся в PNG через cairosvg; если он недоступен —
+    миниатюрой служит уменьшенный SVG-документ.
+    """
+
+    def __init__(self, root: str = "thumbnails"):
+        self.root = root
+        self._hashes = {}  # путь -> ((mtime_ns, размер файла), хэш)
+        self._lock = threading.Lock()
+
+    # ===================== ХЭШ ИСТОЧНИКА =====================
+
+    def source_hash(self, path: str):
+        """
+        Хэш содержимого файла; пересчитывается, только если файл изменился.
+        Возвращает None, если файла нет.
+        """
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        stamp = (st.st_mtime_ns, st.st_size)
+
+        with self._lock:
+            cached = self._hashes.get(path)
+            if cached is not None and cached[0] == stamp:
+                return cached[1]
+
+        with open(path, "rb") as f:
+            digest = hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+        with self._lock:
+            self._hashes[path] = (stamp, digest)
+        return digest
+
+    # ===================== ПРОЕКТЫ =====================
+
+    def project_thumbnail(self, project_id: str, size: int = DEFAULT_SIZE, store=project_store):
+        """
+        Миниатюра проекта. Возвращает (путь к файлу, MIME-тип, версия) или None.
+        Вместо хэша файла используется версия документа в хранилище
+        (хэш снимка и номер правки из журнала).
+        """
+        digest = store.version(project_id)
+        if digest is None:
+            return None
+
+        ext, mimetype = ("png", "image/png") if svg_renderer.available else ("svg", "image/svg+xml")
+        thumb = self._thumb_path(digest, size, ext)
+        if not os.path.exists(thumb):
+            project = store.load(project_id)
+            svg = SVGUtils.project_svg(project)
+            if svg_renderer.available:
+                w, h = fit(project.get("width", 800), project.get("height", 600), size)
+                data = svg_renderer.render(svg, w, h, "png")
+            else:
+                data = scaled_svg(svg, project.get("width", 800), project.get("height", 600), size)
+            self._store(thumb, data)
+        return thumb, mimetype, digest
+
+    def invalidate_project(self, project_id: str, store=project_store):
+        """
+        Удаляет миниатюры текущей версии проекта. Вызывается перед сохранением,
+        изменением или удалением файла проекта.
+        """
+        digest = store.version(project_id)
+        if digest is not None:
+            self._remove(digest)
+
+    # ===================== РАСТРОВЫЕ ФАЙЛЫ =====================
+
+    def image_thumbnail(self, path: str, size: int = DEFAULT_SIZE):
+        """
+        JPEG-миниатюра растрового файла. Возвращает (путь, MIME-тип, хэш) или None.
+        """
+        if os.path.splitext(path.lower())[1] not in RASTER_EXT:
+            return None
+        digest = self.source_hash(path)
+        if digest is None:
+            return None
+
+        thumb = self._thumb_path(digest, size, "jpg")
+        if not os.path.exists(thumb):
+            img = cv2.imdecode(np.fromfile(path, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if img is None:
+                raise ValueError("Не удалось прочитать изображение")
+            h, w = img.shape[:2]
+            tw, th = fit(w, h, size)
+            if (tw, th) != (w, h):
+                img = cv2.resize(img, (tw, th), interpolation=cv2.INTER_AREA)
+            self._store(thumb, encode(img, ExportSpec("jpg", quality=85, optimize=True)))
+        return thumb, "image/jpeg", digest
+
+    # ===================== ВНУТРЕННИЕ =====================
+
+    def _thumb_path(self, digest, size, ext):
+        return os.path.join(self.root, f"{digest}_{size}.{ext}")
+
+    def _store(self, path, data):
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _remove(self, digest):
+        for size in SIZES:
+            for ext in ("png", "svg", "jpg"):
+                try:
+                    os.remove(self._thumb_path(digest, size, ext))
+                except FileNotFoundError:
+                    pass
+
+
+def fit(width, height, size: int):
+    """
+    Размер миниатюры: больше сторона — size, пропорции сохраняются.
+    """
+    width, height = max(float(width), 1), max(float(height), 1)
+    scale = size / max(width, height)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def scaled_svg(svg: str, width, height, size: int) -> bytes:
+    """
+    Запасной вариант без cairosvg: документ, вписанный в size×size.
+    """
+    tw, th = fit(width, height, size)
+    if "<svg" not in svg:
+        raise ValueError("Неверный SVG проекта")
+    # исходный документ (без XML-пролога) вкладывается во внешний svg с нужным размером
+    body = svg[svg.index("<svg"):]
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{tw}" height="{th}" '
+        f'viewBox="0 0 {width} {height}">{body}</svg>'
+    ).encode("utf-8")
+
+
+thumbnails = ThumbnailService()
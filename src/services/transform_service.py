@@ -1,75 +1,55 @@
 import cv2
 
-from src.models.project_model import ProjectModel
-from src.services.history_manager import HistoryManager
-from src.utils.file_utils import ensure_directory
-from src.utils.image_utils import save_image
+from src.utils.geometry import AffineChain
+from src.utils.image_cache import image_cache
+from src.utils.result_cache import result_cache
 
 
 class TransformService:
     """
     Геометрические трансформации изображения.
+    Результаты кэшируются по содержимому (result_cache): повтор той же
+    трансформации того же изображения не пересчитывается.
     """
 
     def __init__(self, project, history):
         self.project = project
         self.history = history
 
-    # ===================== ROTATE =====================
+    # ===================== ВНУТРЕННИЕ =====================
 
-    def rotate(self, angle: float):
+    def _apply(self, action: str, params: dict, fn):
+        """
+        Применяет fn(img) к текущему изображению и записывает результат в историю.
+        """
         if not self.project.has_current():
             raise ValueError("Нет изображения")
 
-        self.history.push()
-
-        img = cv2.imread(self.project.current_path)
-        h, w = img.shape[:2]
-
-        center = (w // 2, h // 2)
-        M = cv2.getRotationMatrix2D(center, angle, 1.0)
+        path = self.project.current_path
+        key = result_cache.key(image_cache.content_hash(path), f"transform.{action}", params)
+        result = result_cache.get(key)
+        if result is None:
+            result = result_cache.put(key, fn(image_cache.read(path)))
+        self.history.commit(result.image, result.handle)
 
-        cos = abs(M[0, 0])
-        sin = abs(M[0, 1])
-
-        new_w = int(h * sin + w * cos)
-        new_h = int(h * cos + w * sin)
-
-        M[0, 2] += new_w / 2 - center[0]
-        M[1, 2] += new_h / 2 - center[1]
+    # ===================== ROTATE =====================
 
-        rotated = cv2.warpAffine(img, M, (new_w, new_h))
-        save_image(self.project.current_path, rotated)
+    def rotate(self, angle: float):
+        # углы, кратные 90°, — без интерполяции (транспонирование/отражение)
+        self._apply("rotate", {"angle": angle},
+                    lambda img: AffineChain(img.shape[1], img.shape[0]).rotate(angle).apply(img))
 
     # ===================== FLIP =====================
 
     def flip_horizontal(self):
-        if not self.project.has_current():
-            raise ValueError("Нет изображения")
-
-        self.history.push()
-        img = cv2.imread(self.project.current_path)
-        flipped = cv2.flip(img, 1)
-        save_image(self.project.current_path, flipped)
+        self._apply("flip", {"mode": "h"}, lambda img: cv2.flip(img, 1))
 
     def flip_vertical(self):
-        if not self.project.has_current():
-            raise ValueError("Нет изображения")
-
-        self.history.push()
-        img = cv2.imread(self.project.current_path)
-        flipped = cv2.flip(img, 0)
-        save_image(self.project.current_path, flipped)
+        self._apply("flip", {"mode": "v"}, lambda img: cv2.flip(img, 0))
 
     # ===================== RESIZE =====================
 
     def resize(self, width: int, height: int, interpolation: str):
-        if not self.project.has_current():
-            raise ValueError("Нет изображения")
-
-        self.history.push()
-        img = cv2.imread(self.project.current_path)
-
         interp_map = {
             "nearest": cv2.INTER_NEAREST,
             "bilinear": cv2.INTER_LINEAR,
@@ -78,30 +58,51 @@ class TransformService:
 
         interp = interp_map.get(interpolation, cv2.INTER_CUBIC)
 
-        resized = cv2.resize(img, (width, height), interpolation=interp)
-        save_image(self.project.current_path, resized)
+        self._apply(
+            "resize", {"width": width, "height": height, "interpolation": interp},
+            lambda img: cv2.resize(img, (width, height), interpolation=interp)
+        )
 
     # ===================== CROP =====================
 
     def crop(self, x: int, y: int, w: int, h: int):
-        if not self.project.has_current():
-            raise ValueError("Нет изображения")
-
-        self.history.push()
-        img = cv2.imread(self.project.current_path)
-
-        cropped = img[y:y + h, x:x + w]
-        if cropped.size == 0:
-            raise ValueError("Неверные координаты обрезки")
-
-        save_image(self.project.current_path, cropped)
-
-UPLOAD_DIR = "uploads"
-
-ensure_directory(UPLOAD_DIR)
-
-# ===================== PROJECT & HISTORY =====================
-project = ProjectModel(UPLOAD_DIR)
-history = HistoryManager(project)
-
-transform_service = TransformService(project, history)
\ No newline at end of file
+        def crop(img):
+            cropped = img[y:y + h, x:x + w]
+            if cropped.size == 0:
+                raise ValueError("Неверные координаты обрезки")
+            # копия: срез удерживал бы в кэше результатов всё исходное изображение
+            return cropped.copy()
+
+        self._apply("crop", {"x": x, "y": y, "w": w, "h": h}, crop)
+
+    # ===================== ЦЕПОЧКА =====================
+
+    def apply_chain(self, ops):
+        """
+        Несколько трансформаций за один шаг истории:
+            [{"op": "rotate", "angle": 30},
+             {"op": "resize", "width": 800, "height": 600, "interpolation": "bicubic"},
+             {"op": "crop", "x": 0, "y": 0, "w": 640, "h": 480},
+             {"op": "flip", "mode": "h"}]
+        Все операции сливаются в одну матрицу — одна интерполяция и одна запись.
+        """
+        if not ops:
+            raise ValueError("Список трансформаций пуст")
+
+        def build(img):
+            chain = AffineChain(img.shape[1], img.shape[0])
+            for op in ops:
+                name = op.get("op")
+                if name == "rotate":
+                    chain.rotate(float(op["angle"]))
+                elif name == "flip":
+                    chain.flip(op.get("mode", "h"))
+                elif name == "resize":
+                    chain.resize(int(op["width"]), int(op["height"]), op.get("interpolation", "bicubic"))
+                elif name == "crop":
+                    chain.crop(int(op["x"]), int(op["y"]), int(op["w"]), int(op["h"]))
+                else:
+                    raise ValueError(f"Неизвестная трансформация: {name}")
+            return chain
+
+        self._apply("chain", ops, lambda img: build(img).apply(img))
@@ -0,0 +1,225 @@
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+from collections import OrderedDict
+
+from src.models.project_model import ProjectModel
+from src.services.adjustment_stack import AdjustmentStack
+from src.services.canvas_service import CanvasService
+from src.services.filter_service import FilterService
+from src.services.history_manager import HistoryManager
+from src.services.image_service import ImageService
+from src.services.transform_service import TransformService
+from src.utils.file_utils import ensure_directory
+from src.utils.image_cache import image_cache
+
+logger = logging.getLogger(__name__)
+
+WORKSPACE_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+# папки в корне загрузок, которые не являются рабочими пространствами
+RESERVED_IDS = {"batch"}
+
+
+class Workspace:
+    """
+    Рабочее пространство одного сеанса (или документа):
+    свой ProjectModel, своя история и свои экземпляры сервисов.
+
+    Используется как контекстный менеджер — на время запроса берётся
+    блокировка рабочего пространства:
+
+        with workspaces.get(workspace_id) as ws:
+            ws.filters.blur("gaussian", 5)
+    """
+
+    def __init__(self, workspace_id: str, root: str):
+        self.id = workspace_id
+        self.lock = threading.RLock()
+        self.last_access = time.time()
+
+        self.project = ProjectModel(os.path.join(root, workspace_id))
+        self.history = HistoryManager(self.project)
+        self.adjustments = AdjustmentStack()
+
+        self.images = ImageService(self.project, self.history, self.adjustments)
+        self.filters = FilterService(self.project, self.history, self.adjustments)
+        self.transforms = TransformService(self.project, self.history)
+        self.canvas = CanvasService(self.project, self.history)
+
+    def __enter__(self):
+        self.lock.acquire()
+        self.last_access = time.time()
+        self.history.restore(self.project.history_path)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.lock.release()
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Сколько памяти занимает рабочее пространство
+        (изображения в кэше, история и кэш стека коррекций).
+        """
+        return (
+            image_cache.nbytes(self.project.original_path)
+            + image_cache.nbytes(self.project.current_path)
+            + self.history.nbytes
+            + self.adjustments.nbytes
+        )
+
+    def unload(self):
+        """
+        Выгружает рабочее пространство на диск: дописывает изображения
+        и сохраняет историю, освобождая память. Стек коррекций при этом запекается.
+        """
+        self.adjustments.clear()
+        image_cache.release(self.project.original_path)
+        image_cache.release(self.project.current_path)
+        if self.history.can_undo() or self.history.can_redo():
+            self.history.dump(self.project.history_path)
+
+    def discard(self):
+        """
+        Удаляет рабочее пространство: изображения из кэша и папку на диске.
+        """
+        self.adjustments.clear()
+        for path in (self.project.original_path, self.project.current_path):
+            try:
+                image_cache.flush(path)  # фоновая запись не должна пересоздать файл после удаления
+            except IOError:
+                pass  # файл всё равно удаляется
+            image_cache.invalidate(path)
+        shutil.rmtree(self.project.upload_dir, ignore_errors=True)
+
+
+class WorkspaceRegistry:
+    """
+    Реестр рабочих пространств по ID сеанса/документа.
+    Держит в памяти недавно использованные пространства; при превышении
+    общего лимита памяти выгружает на диск самые давно неиспользуемые (LRU).
+
+    Пространство (и его папка) создаётся только по запросу create=True —
+    при загрузке изображения. Пространства, к которым не обращались дольше
+    idle_seconds, удаляются вместе с папкой (проверка — не чаще sweep_interval).
+    """
+
+    def __init__(self, root: str, max_bytes: int = 1024 * 1024 * 1024,
+                 idle_seconds: float = 24 * 60 * 60, sweep_interval: float = 10 * 60):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.idle_seconds = idle_seconds
+        self.sweep_interval = sweep_interval
+        self._workspaces = OrderedDict()  # id -> Workspace (LRU)
+        self._lock = threading.Lock()
+        self._last_sweep = time.time()
+        ensure_directory(root)
+
+    def get(self, workspace_id: str, create: bool = False) -> Workspace:
+        """
+        Рабочее пространство по ID. KeyError — пространства нет
+        ни в памяти, ни на диске, а create не задан.
+        """
+        if not WORKSPACE_ID_RE.match(workspace_id or "") or workspace_id in RESERVED_IDS:
+            raise ValueError("Неверный идентификатор рабочего пространства")
+
+        if time.time() - self._last_sweep > self.sweep_interval:
+            self.expire()
+
+        with self._lock:
+            workspace = self._workspaces.get(workspace_id)
+            if workspace is None:
+                if not create and not os.path.isdir(os.path.join(self.root, workspace_id)):
+                    raise KeyError(workspace_id)
+                workspace = Workspace(workspace_id, self.root)
+                self._workspaces[workspace_id] = workspace
+            workspace.last_access = time.time()
+            self._workspaces.move_to_end(workspace_id)
+            candidates = [ws for ws in self._workspaces.values() if ws is not workspace]
+            total = sum(ws.nbytes for ws in self._workspaces.values())
+
+        # выгрузка на диск — вне общей блокировки реестра
+        self._evict(candidates, total)
+        return workspace
+
+    def expire(self) -> int:
+        """
+        Удаляет простаивающие пространства: запись реестра и папку.
+        Папки, не загруженные в память (после перезапуска или вытеснения),
+        удаляются по времени последнего изменения. Возвращает число удалённых.
+        """
+        self._last_sweep = time.time()
+        deadline = self._last_sweep - self.idle_seconds
+        removed = 0
+
+        with self._lock:
+            idle = [ws for ws in self._workspaces.values() if ws.last_access < deadline]
+        for workspace in idle:
+            # занятое запросом пространство не трогаем
+            if not workspace.lock.acquire(blocking=False):
+                continue
+            try:
+                # под блокировкой реестра — чтобы get не открыл пространство заново, пока удаляем папку
+                with self._lock:
+                    if self._workspaces.get(workspace.id) is not workspace or workspace.last_access >= deadline:
+                        continue
+                    del self._workspaces[workspace.id]
+                    workspace.discard()
+                removed += 1
+            finally:
+                workspace.lock.release()
+
+        for entry in os.scandir(self.root):
+            if (not entry.is_dir() or entry.name in RESERVED_IDS
+                    or not WORKSPACE_ID_RE.match(entry.name)):
+                continue
+            with self._lock:
+                if entry.name in self._workspaces or _last_modified(entry.path) >= deadline:
+                    continue
+                shutil.rmtree(entry.path, ignore_errors=True)
+            removed += 1
+        return removed
+
+    def nbytes(self) -> int:
+        with self._lock:
+            return sum(ws.nbytes for ws in self._workspaces.values())
+
+    def _evict(self, candidates, total):
+        for workspace in candidates:
+            if total <= self.max_bytes:
+                break
+
+            # занятое запросом пространство не трогаем
+            if not workspace.lock.acquire(blocking=False):
+                continue
+            try:
+                size = workspace.nbytes
+                workspace.unload()
+                total -= size
+            except IOError as e:
+                # изображение не записалось на диск — остаётся в памяти
+                logger.error("Не удалось выгрузить рабочее пространство %s: %s", workspace.id, e)
+            finally:
+                workspace.lock.release()
+
+
+def _last_modified(folder: str) -> float:
+    """
+    Время последнего изменения папки или любого файла в ней.
+    """
+    stamps = [os.path.getmtime(folder)]
+    for entry in os.scandir(folder):
+        try:
+            stamps.append(entry.stat().st_mtime)
+        except FileNotFoundError:
+            pass
+    return max(stamps)
+
+
+UPLOAD_DIR = "uploads"
+
+workspaces = WorkspaceRegistry(UPLOAD_DIR)
@@ -4,6 +4,8 @@ from typing import Tuple, Optional, Dict
 
 import trimesh
 
+from src.utils.metrics import timed
+
 DEFAULT_EXPORT_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), '..', '..', 'static', '3d', 'scenes')
 DEFAULT_EXPORT_DIR = os.path.abspath(DEFAULT_EXPORT_DIR)
 
@@ -148,6 +150,7 @@ class SceneManager:
         fname = f"{scene_id}.glb"
         return os.path.join(self.export_dir, fname)
 
+    @timed("SceneManager._export_scene")
     def _export_scene(self, scene_id: str):
         if scene_id not in self.scenes:
             raise KeyError("Scene not found")
@@ -0,0 +1,166 @@
+import io
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+
+# формат -> (расширение, MIME-тип)
+FORMATS = {
+    "png": ("png", "image/png"),
+    "jpg": ("jpg", "image/jpeg"),
+    "webp": ("webp", "image/webp"),
+    "tiff": ("tiff", "image/tiff"),
+}
+ALIASES = {"jpeg": "jpg", "tif": "tiff"}
+
+# уровни сжатия PNG (zlib); без пресета — настройка OpenCV по умолчанию
+PNG_PRESETS = {"fast": 1, "balanced": 6, "small": 9}
+
+DEFAULT_QUALITY = {"jpg": 95, "webp": 90}
+
+# кодирование OpenCV отпускает GIL — варианты кодируются параллельно в потоках
+_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="export")
+
+
+class ExportSpec:
+    """
+    Параметры одного варианта экспорта.
+
+      fmt          png, jpg (jpeg), webp, tiff
+      quality      1–100 для jpg и webp с потерями
+      lossless     webp без потерь
+      progressive  прогрессивный jpg
+      optimize     jpg с оптимизированными таблицами Хаффмана
+      preset       уровень сжатия png: fast, balanced, small
+      width/height размер варианта (одна сторона — с сохранением пропорций)
+    """
+
+    def __init__(self, fmt: str = "png", quality: int = None, lossless: bool = False,
+                 progressive: bool = False, optimize: bool = False, preset: str = None,
+                 width: int = None, height: int = None):
+        fmt = ALIASES.get(str(fmt).lower(), str(fmt).lower())
+        if fmt not in FORMATS:
+            raise ValueError(f"Неподдерживаемый формат: {fmt}")
+        if preset is not None and preset not in PNG_PRESETS:
+            raise ValueError(f"Неизвестный пресет PNG: {preset}")
+        if quality is not None and not 1 <= int(quality) <= 100:
+            raise ValueError("Качество должно быть от 1 до 100")
+        if (width is not None and int(width) <= 0) or (height is not None and int(height) <= 0):
+            raise ValueError("Неверный размер")
+
+        self.fmt = fmt
+        self.quality = int(quality) if quality is not None else DEFAULT_QUALITY.get(fmt)
+        self.lossless = bool(lossless)
+        self.progressive = bool(progressive)
+        self.optimize = bool(optimize)
+        self.preset = preset
+        self.width = int(width) if width else None
+        self.height = int(height) if height else None
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        def flag(name):
+            return str(data.get(name, "")).lower() in ("1", "true", "yes", "on")
+
+        return cls(
+            fmt=data.get("format", "png"),
+            quality=data.get("quality") or None,
+            lossless=flag("lossless"),
+            progressive=flag("progressive"),
+            optimize=flag("optimize"),
+            preset=data.get("preset") or None,
+            width=data.get("width") or None,
+            height=data.get("height") or None,
+        )
+
+    @property
+    def extension(self) -> str:
+        return FORMATS[self.fmt][0]
+
+    @property
+    def mimetype(self) -> str:
+        return FORMATS[self.fmt][1]
+
+    def key(self) -> tuple:
+        """
+        Значимые для результата параметры (для ключей кэша и ETag).
+        """
+        return (self.fmt, self.quality, self.lossless, self.progressive,
+                self.optimize, self.preset, self.width, self.height)
+
+    def tag(self) -> str:
+        return "-".join(str(v) for v in self.key() if v not in (None, False))
+
+    def params(self):
+        """
+        Флаги cv2.imencode.
+        """
+        if self.fmt == "jpg":
+            return [cv2.IMWRITE_JPEG_QUALITY, self.quality,
+                    cv2.IMWRITE_JPEG_PROGRESSIVE, int(self.progressive),
+                    cv2.IMWRITE_JPEG_OPTIMIZE, int(self.optimize)]
+        if self.fmt == "webp":
+            # качество выше 100 — режим без потерь
+            return [cv2.IMWRITE_WEBP_QUALITY, 101 if self.lossless else self.quality]
+        if self.fmt == "png" and self.preset:
+            return [cv2.IMWRITE_PNG_COMPRESSION, PNG_PRESETS[self.preset]]
+        return []
+
+
+def fit_size(shape, width: int = None, height: int = None):
+    """
+    Размер варианта: одна заданная сторона — с сохранением пропорций.
+    """
+    h, w = shape[:2]
+    if width and height:
+        return width, height
+    if width:
+        return width, max(1, round(h * width / w))
+    if height:
+        return max(1, round(w * height / h)), height
+    return w, h
+
+
+def encode(img, spec: ExportSpec) -> bytes:
+    """
+    Кодирует изображение в памяти по параметрам spec.
+    """
+    size = fit_size(img.shape, spec.width, spec.height)
+    if size != (img.shape[1], img.shape[0]):
+        interp = cv2.INTER_AREA if size[0] < img.shape[1] else cv2.INTER_CUBIC
+        img = cv2.resize(img, size, interpolation=interp)
+
+    ok, buf = cv2.imencode(f".{spec.extension}", img, spec.params())
+    if not ok:
+        raise IOError(f"Не удалось закодировать изображение в {spec.fmt}")
+    return buf.tobytes()
+
+
+def encode_many(img, specs):
+    """
+    Несколько вариантов (форматов, размеров) из одного декодированного кадра,
+    параллельно. Возвращает список байтов в порядке specs.
+    """
+    if len(specs) == 1:
+        return [encode(img, specs[0])]
+    return list(_pool.map(lambda spec: encode(img, spec), specs))
+
+
+def zip_variants(name: str, specs, blobs) -> bytes:
+    """
+    ZIP-архив вариантов: name[_WxH].ext. Изображения уже сжаты — без deflate.
+    """
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_STORED) as zf:
+        used = set()
+        for spec, data in zip(specs, blobs):
+            suffix = f"_{spec.width or ''}x{spec.height or ''}" if spec.width or spec.height else ""
+            filename = f"{name}{suffix}.{spec.extension}"
+            n = 1
+            while filename in used:
+                n += 1
+                filename = f"{name}{suffix}_{n}.{spec.extension}"
+            used.add(filename)
+            zf.writestr(filename, data)
+    return buf.getvalue()
@@ -0,0 +1,200 @@
+import math
+
+import cv2
+import numpy as np
+
+
+INTERPOLATION = {
+    "nearest": cv2.INTER_NEAREST,
+    "bilinear": cv2.INTER_LINEAR,
+    "bicubic": cv2.INTER_CUBIC,
+    "INTER_NEAREST": cv2.INTER_NEAREST,
+    "INTER_LINEAR": cv2.INTER_LINEAR,
+    "INTER_CUBIC": cv2.INTER_CUBIC,
+}
+
+# качество интерполяции: при слиянии берётся лучшая из запрошенных
+_QUALITY = {cv2.INTER_NEAREST: 0, cv2.INTER_LINEAR: 1, cv2.INTER_CUBIC: 2}
+
+EPS = 1e-6
+
+
+class AffineChain:
+    """
+    Цепочка геометрических операций (поворот, отражение, масштаб, обрезка),
+    слитая в одну аффинную матрицу. Изображение пересэмплируется один раз —
+    одним cv2.warpAffine по итоговой области.
+
+    Повороты на углы, кратные 90°, и отражения выполняются без интерполяции
+    (транспонирование/отражение), обрезка — срезом, чистое масштабирование —
+    cv2.resize. Поэтому такие цепочки работают без потерь.
+
+    Координаты — по краям пикселей: пиксель (i, j) занимает [i, i+1] × [j, j+1],
+    тогда поворот на 90° переводит кадр w×h ровно в h×w.
+
+        img = AffineChain(w, h).rotate(30).resize(800, 600).crop(0, 0, 640, 480).apply(img)
+    """
+
+    def __init__(self, width: int, height: int):
+        self.src_size = (int(width), int(height))
+        self.width, self.height = self.src_size
+        self.matrix = np.eye(3)
+        self.interp = None
+        self.ops = []
+
+    def __len__(self):
+        return len(self.ops)
+
+    # ===================== ОПЕРАЦИИ =====================
+
+    def rotate(self, angle: float, center=None):
+        """
+        Поворот против часовой стрелки (как cv2.getRotationMatrix2D) вокруг center
+        (по умолчанию — центр кадра). Холст расширяется до размеров повёрнутого кадра,
+        center оказывается в его середине.
+        """
+        w, h = self.width, self.height
+        cx, cy = center if center is not None else (w / 2, h / 2)
+
+        cos, sin = _cos_sin(angle)
+        new_w = int(round(h * abs(sin) + w * abs(cos), 9))
+        new_h = int(round(h * abs(cos) + w * abs(sin), 9))
+
+        # в координатах изображения ось y направлена вниз
+        rotation = np.array([[cos, sin, 0], [-sin, cos, 0], [0, 0, 1]])
+        step = _translate(new_w / 2, new_h / 2) @ rotation @ _translate(-cx, -cy)
+        self._add("rotate", step, (new_w, new_h), cv2.INTER_LINEAR)
+        return self
+
+    def flip(self, mode: str):
+        """
+        h — по горизонтали, v — по вертикали, иначе — по обеим осям.
+        """
+        w, h = self.width, self.height
+        sx = -1 if mode != "v" else 1
+        sy = -1 if mode != "h" else 1
+        step = _translate(w if sx < 0 else 0, h if sy < 0 else 0) @ _scale(sx, sy)
+        self._add("flip", step, (w, h), None)
+        return self
+
+    def resize(self, width: int, height: int, interp=cv2.INTER_LINEAR):
+        if isinstance(interp, str):
+            interp = INTERPOLATION.get(interp, cv2.INTER_LINEAR)
+        width, height = int(width), int(height)
+        if width <= 0 or height <= 0:
+            raise ValueError("Неверный размер")
+        step = _scale(width / self.width, height / self.height)
+        self._add("resize", step, (width, height), interp)
+        return self
+
+    def crop(self, x: int, y: int, w: int, h: int):
+        """
+        Обрезка с той же семантикой, что и срез img[y:y+h, x:x+w].
+        """
+        xs = range(*slice(x, x + w).indices(self.width))
+        ys = range(*slice(y, y + h).indices(self.height))
+        if not len(xs) or not len(ys):
+            raise ValueError("Неверные координаты обрезки")
+        self._add("crop", _translate(-xs.start, -ys.start), (len(xs), len(ys)), None)
+        return self
+
+    # ===================== ПРИМЕНЕНИЕ =====================
+
+    def cv_matrix(self):
+        """
+        Матрица 2×3 для cv2.warpAffine (координаты по центрам пикселей).
+        """
+        return (_translate(-0.5, -0.5) @ self.matrix @ _translate(0.5, 0.5))[:2]
+
+    def apply(self, img):
+        if (img.shape[1], img.shape[0]) != self.src_size:
+            raise ValueError("Размер изображения не совпадает с цепочкой")
+
+        size = (self.width, self.height)
+        interp = self.interp if self.interp is not None else cv2.INTER_LINEAR
+
+        # 1. оси сохраняются (повороты на 90°, отражения): переставляем без интерполяции
+        permuted = _axis_permutation(self.matrix)
+        if permuted is None:
+            return cv2.warpAffine(img, self.cv_matrix(), size, flags=interp,
+                                  borderMode=cv2.BORDER_CONSTANT)
+
+        img, P = _permute(img, *permuted)
+        M = self.matrix @ np.linalg.inv(P)  # осталось масштабирование + сдвиг
+
+        # 2. масштаб и сдвиг: если область исходника целочисленная — срез + resize
+        sx, sy, tx, ty = M[0, 0], M[1, 1], M[0, 2], M[1, 2]
+        x0, x1 = -tx / sx, (size[0] - tx) / sx
+        y0, y1 = -ty / sy, (size[1] - ty) / sy
+        box = [round(v) for v in (x0, x1, y0, y1)]
+        aligned = all(abs(v - r) < EPS for v, r in zip((x0, x1, y0, y1), box))
+        h, w = img.shape[:2]
+
+        if aligned and 0 <= box[0] < box[1] <= w and 0 <= box[2] < box[3] <= h:
+            region = img[box[2]:box[3], box[0]:box[1]]
+            if region.shape[1] == size[0] and region.shape[0] == size[1]:
+                return np.ascontiguousarray(region)
+            return cv2.resize(region, size, interpolation=interp)
+
+        local = (_translate(-0.5, -0.5) @ M @ _translate(0.5, 0.5))[:2]
+        return cv2.warpAffine(img, local, size, flags=interp, borderMode=cv2.BORDER_CONSTANT)
+
+    # ===================== ВНУТРЕННИЕ =====================
+
+    def _add(self, name, step, size, interp):
+        self.matrix = step @ self.matrix
+        self.width, self.height = size
+        self.ops.append(name)
+        if interp is not None and (self.interp is None or _QUALITY[interp] > _QUALITY[self.interp]):
+            self.interp = interp
+
+
+def _cos_sin(angle: float):
+    # для углов, кратных 90°, — точные 0 и ±1 без ошибки округления
+    quarter = angle / 90.0
+    if abs(quarter - round(quarter)) < 1e-9:
+        k = int(round(quarter)) % 4
+        return [(1, 0), (0, 1), (-1, 0), (0, -1)][k]
+    rad = math.radians(angle)
+    return math.cos(rad), math.sin(rad)
+
+
+def _translate(tx, ty):
+    return np.array([[1, 0, tx], [0, 1, ty], [0, 0, 1]], dtype=np.float64)
+
+
+def _scale(sx, sy):
+    return np.array([[sx, 0, 0], [0, sy, 0], [0, 0, 1]], dtype=np.float64)
+
+
+def _axis_permutation(M):
+    """
+    Если линейная часть M переводит оси в оси (в каждой строке и столбце
+    один ненулевой элемент), возвращает (transpose, flip_x, flip_y), иначе None.
+    """
+    L = M[:2, :2]
+    if abs(L[0, 1]) < EPS and abs(L[1, 0]) < EPS:
+        return False, L[0, 0] < 0, L[1, 1] < 0
+    if abs(L[0, 0]) < EPS and abs(L[1, 1]) < EPS:
+        return True, L[0, 1] < 0, L[1, 0] < 0
+    return None
+
+
+def _permute(img, transpose, flip_x, flip_y):
+    """
+    Переставляет пиксели без интерполяции. Возвращает (изображение, матрица
+    перестановки P в координатах по краям пикселей).
+    """
+    h, w = img.shape[:2]
+    P = np.eye(3)
+    if transpose:
+        img = cv2.transpose(img)
+        P = np.array([[0, 1, 0], [1, 0, 0], [0, 0, 1]], dtype=np.float64)
+        h, w = w, h
+    if flip_x:
+        img = cv2.flip(img, 1)
+        P = _translate(w, 0) @ _scale(-1, 1) @ P
+    if flip_y:
+        img = cv2.flip(img, 0)
+        P = _translate(0, h) @ _scale(1, -1) @ P
+    return img, P
@@ -0,0 +1,318 @@
+import atexit
+import logging
+import os
+import threading
+import uuid
+from collections import OrderedDict
+
+import cv2
+
+from src.utils.image_handles import content_hash
+from src.utils.metrics import hotpath
+from src.utils.raw_format import is_raw, read_raw, write_raw
+
+logger = logging.getLogger(__name__)
+
+class _Entry:
+    __slots__ = ("image", "version", "encoded", "hash")
+
+    def __init__(self, image, version, encoded=None, hash=None):
+        self.image = image
+        self.version = version
+        self.encoded = encoded  # PNG-байты текущей версии (если уже кодировали)
+        self.hash = hash        # хэш содержимого (считается при первом запросе)
+
+    @property
+    def nbytes(self) -> int:
+        return self.image.nbytes + (len(self.encoded) if self.encoded else 0)
+
+
+class ImageCache:
+    """
+    Общий кэш декодированных изображений (ndarray) рабочих пространств.
+
+    Ключ записи — путь рабочего файла (uploads/<...>/current.raw и т.п.),
+    у каждого пути есть монотонно растущая версия. Сервисы читают и пишут
+    массивы через кэш, а запись на диск выполняется отложенно в фоновом потоке.
+    Файлы .raw пишутся в рабочем формате (raw_format), остальные — в PNG.
+
+    Массивы в кэше помечаются только для чтения — изменять их на месте нельзя.
+
+    Если фоновая запись не удалась, ошибка запоминается: изображение остаётся
+    в памяти (не вытесняется), а flush() этого пути поднимает IOError,
+    пока следующая запись не пройдёт успешно.
+    """
+
+    def __init__(self, max_bytes: int = 1024 * 1024 * 1024, raw_codec: str = None):
+        self.max_bytes = max_bytes
+        self.raw_codec = raw_codec  # сжатие рабочих .raw файлов (None, "zlib", "lz4")
+
+        self._entries = OrderedDict()  # path -> _Entry (LRU)
+        self._versions = {}            # path -> int, переживает вытеснение
+        self._pending = OrderedDict()  # path -> версия, ожидающая записи
+        self._failed = {}              # path -> ошибка последней фоновой записи
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+        self._cond = threading.Condition()
+        self._writer = None
+
+        # версии живут в памяти процесса: в ETag добавляется метка запуска,
+        # чтобы после перезапуска версия 1 не совпала со старой версией 1
+        self.epoch = uuid.uuid4().hex[:8]
+
+    # ===================== ЧТЕНИЕ =====================
+
+    def read(self, path: str):
+        """
+        Возвращает изображение по пути. Если в кэше его нет — декодирует с диска.
+        Возвращает None, если файла нет.
+        """
+        with self._cond:
+            entry = self._entries.get(path)
+            if entry is not None:
+                self.hits += 1
+                self._entries.move_to_end(path)
+                return entry.image
+            self.misses += 1
+            version = self._versions.get(path, 0)
+
+        with hotpath.time("ImageCache.read_disk"):
+            image = read_raw(path) if is_raw(path) else cv2.imread(path)
+        if image is None:
+            return None
+        image.flags.writeable = False
+
+        with self._cond:
+            # за время чтения с диска могла появиться более новая версия
+            if path not in self._entries and self._versions.get(path, 0) == version:
+                self._put(path, _Entry(image, version))
+                return image
+            return self._entries[path].image if path in self._entries else image
+
+    def contains(self, path: str) -> bool:
+        with self._cond:
+            return path in self._entries
+
+    def nbytes(self, path: str) -> int:
+        with self._cond:
+            entry = self._entries.get(path)
+            return entry.nbytes if entry is not None else 0
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "pending_writes": len(self._pending),
+                "failed_writes": len(self._failed),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def version(self, path: str) -> int:
+        with self._cond:
+            return self._versions.get(path, 0)
+
+    def etag(self, path: str) -> str:
+        """
+        ETag текущей версии изображения: меняется при каждой записи.
+        """
+        return f"{self.epoch}-{self.version(path)}"
+
+    def content_hash(self, path: str):
+        """
+        Хэш содержимого текущей версии изображения (content_hash).
+        Считается один раз на версию. Возвращает None, если изображения нет.
+        """
+        with self._cond:
+            entry = self._entries.get(path)
+            if entry is not None and entry.hash is not None:
+                return entry.hash
+
+        if entry is None:
+            image, version = self.read(path), self.version(path)
+            if image is None:
+                return None
+        else:
+            image, version = entry.image, entry.version
+
+        digest = content_hash(image)
+        with self._cond:
+            entry = self._entries.get(path)
+            if entry is not None and entry.version == version:
+                entry.hash = digest
+        return digest
+
+    def known_hash(self, path: str):
+        """
+        Хэш содержимого, если он уже посчитан (без вычисления).
+        """
+        with self._cond:
+            entry = self._entries.get(path)
+            return entry.hash if entry is not None else None
+
+    def encoded(self, path: str):
+        """
+        PNG-байты текущей версии изображения.
+        Если запись ещё не кодировалась — кодирует один раз и запоминает,
+        если записи нет в кэше — читает PNG-файл без декодирования.
+        """
+        with self._cond:
+            entry = self._entries.get(path)
+            if entry is not None and entry.encoded is not None:
+                return entry.encoded
+
+        if entry is None and not is_raw(path):
+            if not os.path.exists(path):
+                return None
+            with open(path, "rb") as f:
+                return f.read()
+
+        if entry is None:
+            image, version = self.read(path), self.version(path)
+            if image is None:
+                return None
+        else:
+            image, version = entry.image, entry.version
+
+        ok, buf = cv2.imencode(".png", image)
+        if not ok:
+            raise IOError(f"Не удалось закодировать изображение: {path}")
+        data = buf.tobytes()
+        self._attach_encoded(path, version, data)
+        return data
+
+    # ===================== ЗАПИСЬ =====================
+
+    def write(self, path: str, image, content_hash: str = None) -> int:
+        """
+        Кладёт новую версию изображения в кэш и ставит запись на диск в очередь.
+        content_hash — хэш содержимого, если он уже известен (например, из кэша результатов).
+        Возвращает номер новой версии.
+        """
+        image.flags.writeable = False
+
+        with self._cond:
+            version = self._versions.get(path, 0) + 1
+            self._versions[path] = version
+            self._put(path, _Entry(image, version, hash=content_hash))
+            self._pending[path] = version
+            self._pending.move_to_end(path)
+            self._ensure_writer()
+            self._cond.notify_all()
+
+        return version
+
+    def invalidate(self, path: str):
+        """
+        Забывает запись (например, если файл изменили в обход кэша).
+        """
+        with self._cond:
+            self._drop(path)
+            self._pending.pop(path, None)
+            self._failed.pop(path, None)
+            self._versions[path] = self._versions.get(path, 0) + 1
+            self._cond.notify_all()
+
+    def flush(self, path: str = None):
+        """
+        Ждёт, пока отложенная запись (одного пути или всех) попадёт на диск.
+        IOError — фоновая запись не удалась (изображение осталось только в памяти).
+        """
+        with self._cond:
+            while (path in self._pending) if path else self._pending:
+                self._cond.wait()
+            error = self._failed.get(path) if path else next(iter(self._failed.values()), None)
+        if error is not None:
+            raise error
+
+    def release(self, path: str):
+        """
+        Дописывает изображение на диск и убирает его из памяти (версия сохраняется).
+        """
+        self.flush(path)
+        with self._cond:
+            if path not in self._pending and path not in self._failed:
+                self._drop(path)
+
+    # ===================== ВНУТРЕННИЕ =====================
+
+    def _put(self, path, entry):
+        self._drop(path)
+        self._entries[path] = entry
+        self._bytes += entry.nbytes
+        self._evict()
+
+    def _drop(self, path):
+        entry = self._entries.pop(path, None)
+        if entry is not None:
+            self._bytes -= entry.nbytes
+
+    def _evict(self):
+        # вытесняем только уже записанные на диск изображения
+        for path in list(self._entries):
+            if self._bytes <= self.max_bytes:
+                break
+            if path not in self._pending and path not in self._failed:
+                self._drop(path)
+
+    def _attach_encoded(self, path, version, data):
+        with self._cond:
+            entry = self._entries.get(path)
+            if entry is not None and entry.version == version and entry.encoded is None:
+                entry.encoded = data
+                self._bytes += len(data)
+                self._evict()
+
+    def _ensure_writer(self):
+        if self._writer is None or not self._writer.is_alive():
+            self._writer = threading.Thread(target=self._write_loop, daemon=True)
+            self._writer.start()
+
+    def _write_loop(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                path, version = next(iter(self._pending.items()))
+                entry = self._entries[path]
+                image, encoded = entry.image, entry.encoded
+
+            error = None
+            try:
+                if is_raw(path):
+                    with hotpath.time("ImageCache.write_disk"):
+                        write_raw(path, image, self.raw_codec)
+                else:
+                    if encoded is None:
+                        ok, buf = cv2.imencode(".png", image)
+                        if not ok:
+                            raise IOError(f"Не удалось закодировать изображение: {path}")
+                        encoded = buf.tobytes()
+                        self._attach_encoded(path, version, encoded)
+
+                    with hotpath.time("ImageCache.write_disk"):
+                        tmp_path = f"{path}.tmp"
+                        with open(tmp_path, "wb") as f:
+                            f.write(encoded)
+                        os.replace(tmp_path, path)
+            except Exception as e:
+                logger.error("Ошибка фоновой записи %s: %s", path, e, exc_info=True)
+                error = IOError(f"Не удалось записать изображение {path}: {e}")
+
+            with self._cond:
+                # если пока писали появилась новая версия — запишем и её
+                if self._pending.get(path) == version:
+                    del self._pending[path]
+                    if error is None:
+                        self._failed.pop(path, None)
+                    else:
+                        self._failed[path] = error
+                self._cond.notify_all()
+
+
+image_cache = ImageCache()
+atexit.register(image_cache.flush)
@@ -0,0 +1,112 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+
+MIME_TYPES = {
+    "png": "image/png",
+    "jpg": "image/jpeg",
+    "webp": "image/webp",
+}
+
+
+def content_hash(img) -> str:
+    """
+    Хэш содержимого изображения (размеры + пиксели).
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{img.shape}{img.dtype}".encode())
+    h.update(np.ascontiguousarray(img))
+    return h.hexdigest()
+
+
+def data_hash(data: bytes) -> str:
+    """
+    Хэш закодированных байтов (файл, base64) — без декодирования изображения.
+    """
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class _Handle:
+    __slots__ = ("image", "encoded")
+
+    def __init__(self, image):
+        self.image = image
+        self.encoded = {}  # формат -> байты
+
+    @property
+    def nbytes(self) -> int:
+        return self.image.nbytes + sum(len(b) for b in self.encoded.values())
+
+
+class HandleStore:
+    """
+    Декодированные изображения /process по хэшу содержимого (handle).
+    Клиент передаёт handle вместо повторной загрузки картинки, а результат
+    забирает бинарным ответом. Объём ограничен max_bytes (LRU).
+    """
+
+    def __init__(self, max_bytes: int = 512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def put(self, img, handle: str = None, encoded: dict = None) -> str:
+        """
+        Кладёт изображение и возвращает его handle. Если handle (хэш содержимого)
+        и закодированные байты уже известны — они не вычисляются заново.
+        """
+        if handle is None:
+            handle = content_hash(img)
+        img.flags.writeable = False
+        with self._lock:
+            if handle in self._items:
+                self._items.move_to_end(handle)
+                return handle
+            entry = _Handle(img)
+            entry.encoded.update(encoded or {})
+            self._items[handle] = entry
+            self._bytes += entry.nbytes
+            self._evict()
+        return handle
+
+    def get(self, handle: str):
+        with self._lock:
+            entry = self._items.get(handle)
+            if entry is None:
+                return None
+            self._items.move_to_end(handle)
+            return entry.image
+
+    def encoded(self, handle: str, fmt: str = "png"):
+        """
+        Закодированные байты изображения (кодируется один раз на формат).
+        """
+        with self._lock:
+            entry = self._items.get(handle)
+            if entry is None:
+                return None
+            if fmt in entry.encoded:
+                return entry.encoded[fmt]
+            image = entry.image
+
+        ok, buf = cv2.imencode(f".{fmt}", image)
+        if not ok:
+            raise IOError(f"Не удалось закодировать изображение в {fmt}")
+        data = buf.tobytes()
+
+        with self._lock:
+            if self._items.get(handle) is entry and fmt not in entry.encoded:
+                entry.encoded[fmt] = data
+                self._bytes += len(data)
+                self._evict()
+        return data
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and len(self._items) > 1:
+            _, entry = self._items.popitem(last=False)
+            self._bytes -= entry.nbytes
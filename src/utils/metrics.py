@@ -0,0 +1,261 @@
+import functools
+import threading
+import time
+from bisect import bisect_left
+
+# Метрики приложения в текстовом формате Prometheus (/metrics).
+# Запись — инкремент счётчика под коротким локом; всё форматирование
+# выполняется только при запросе /metrics, поэтому без сборщика метрики почти бесплатны.
+
+# границы корзин гистограмм длительности, секунды
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """
+    Монотонно растущий счётчик с метками: counter.inc("route", amount=10).
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for values, total in sorted(items):
+            yield f"{self.name}{_labels(self.labels, values)} {total}"
+
+
+class Histogram:
+    """
+    Гистограмма с фиксированными корзинами: histogram.observe(0.012, "route").
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values = {}  # метки -> [счётчики корзин (+Inf последней), сумма, количество]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(label_values)
+            if entry is None:
+                entry = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def time(self, *label_values):
+        return _Timer(self, label_values)
+
+    def samples(self):
+        with self._lock:
+            items = [(values, (list(e[0]), e[1], e[2])) for values, e in self._values.items()]
+        for values, (counts, total, count) in sorted(items):
+            cumulative = 0
+            for bound, n in zip(self.buckets + ("+Inf",), counts):
+                cumulative += n
+                le = f'le="{bound}"'
+                yield f"{self.name}_bucket{_labels(self.labels, values, [le])} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labels, values)} {total}"
+            yield f"{self.name}_count{_labels(self.labels, values)} {count}"
+
+
+class _Timer:
+    __slots__ = ("histogram", "label_values", "start")
+
+    def __init__(self, histogram, label_values):
+        self.histogram = histogram
+        self.label_values = label_values
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.label_values)
+
+
+class Registry:
+    """
+    Набор метрик и сборщиков. Сборщик — функция без аргументов, вызываемая
+    только при выгрузке; возвращает [(имя, тип, описание, [(метки, значение)])].
+    Так счётчики кэшей читаются из самих кэшей, без записи на каждом обращении.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help: str, labels=()) -> Counter:
+        return self.register(Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def collector(self, fn):
+        with self._lock:
+            self._collectors.append(fn)
+        return fn
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+
+        for fn in collectors:
+            for name, kind, help, samples in fn():
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_labels(labels.keys(), labels.values())} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# ===================== ОБЩИЕ МЕТРИКИ =====================
+
+http_latency = registry.histogram(
+    "http_request_duration_seconds", "Время обработки запроса", ("endpoint", "method", "status")
+)
+http_bytes_in = registry.counter("http_request_bytes_total", "Байт в телах запросов", ("endpoint",))
+http_bytes_out = registry.counter("http_response_bytes_total", "Байт в телах ответов", ("endpoint",))
+
+hotpath = registry.histogram("hotpath_duration_seconds", "Время горячих участков", ("op",))
+codec_bytes = registry.counter("codec_bytes_total", "Байт через кодеки изображений", ("op",))
+
+
+def timed(op: str):
+    """
+    Декоратор: длительность вызова попадает в hotpath_duration_seconds{op=...}.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                hotpath.observe(time.perf_counter() - start, op)
+        return wrapper
+    return decorator
+
+
+# ===================== OPENCV =====================
+
+def instrument_cv2():
+    """
+    Оборачивает cv2.imdecode и cv2.imencode таймерами и счётчиками байтов.
+    Все модули вызывают их как cv2.imdecode(...), поэтому замена действует везде.
+    """
+    import cv2
+
+    if getattr(cv2.imdecode, "_instrumented", False):
+        return
+
+    imdecode, imencode = cv2.imdecode, cv2.imencode
+
+    @functools.wraps(imdecode)
+    def timed_imdecode(buf, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return imdecode(buf, *args, **kwargs)
+        finally:
+            hotpath.observe(time.perf_counter() - start, "cv2.imdecode")
+            codec_bytes.inc("decode_in", amount=getattr(buf, "nbytes", 0))
+
+    @functools.wraps(imencode)
+    def timed_imencode(ext, img, *args, **kwargs):
+        start = time.perf_counter()
+        result = None
+        try:
+            result = imencode(ext, img, *args, **kwargs)
+            return result
+        finally:
+            hotpath.observe(time.perf_counter() - start, "cv2.imencode")
+            if result is not None and result[0]:
+                codec_bytes.inc("encode_out", amount=result[1].nbytes)
+
+    timed_imdecode._instrumented = True
+    cv2.imdecode, cv2.imencode = timed_imdecode, timed_imencode
+
+
+# ===================== FLASK =====================
+
+def init_app(app):
+    """
+    Гистограммы задержки и счётчики байтов по маршрутам (request.endpoint —
+    имя маршрута, поэтому число меток ограничено).
+
+    Запись — в teardown_request: он вызывается и для запросов, завершившихся
+    необработанным исключением (они учитываются со статусом 500).
+    """
+    from flask import g, request
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _remember_response(response):
+        g._metrics_response = (response.status_code, response.content_length)
+        return response
+
+    @app.teardown_request
+    def _record(exc):
+        start = g.pop("_metrics_start", None)
+        if start is None:
+            return
+        status, length = g.pop("_metrics_response", (500, None))
+        if exc is not None:
+            status, length = 500, None
+        endpoint = request.endpoint or "unknown"
+        http_latency.observe(time.perf_counter() - start, endpoint, request.method, status)
+        if request.content_length:
+            http_bytes_in.inc(endpoint, amount=request.content_length)
+        if length:
+            http_bytes_out.inc(endpoint, amount=length)
+
+    instrument_cv2()
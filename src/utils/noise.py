@@ -0,0 +1,106 @@
+import secrets
+
+import cv2
+import numpy as np
+
+
+# элементов изображения за один проход генератора: шум создаётся по частям
+# (полосами строк), поэтому пиковая память — одна копия изображения плюс буфер
+CHUNK_PIXELS = 1 << 20
+
+NOISE_TYPES = ("gaussian", "salt_pepper", "poisson", "speckle", "uniform")
+ALIASES = {"sp": "salt_pepper", "s&p": "salt_pepper"}
+
+
+def new_seed() -> int:
+    """
+    Случайный seed для нового применения шума. Сохраняется в параметрах
+    стадии, чтобы превью, повторный рендер и история давали тот же результат.
+    """
+    return secrets.randbits(32)
+
+
+def add_noise(img, noise_type: str = "gaussian", amount: float = 0.05, seed=None):
+    """
+    Шум на uint8-изображении. Возвращает новое изображение, исходное не меняется.
+
+    amount для разных типов:
+      gaussian    — СКО в долях диапазона (0.05 → σ = 12.75)
+      uniform     — половина ширины в долях диапазона (±amount·255)
+      salt_pepper — доля пикселей (половина белых, половина чёрных)
+      speckle     — СКО множителя: x + x·N(0, amount)
+      poisson     — уровень на один «фотон»: N = Poisson(x / amount) · amount
+
+    С одинаковым seed результат совпадает побитово. seed — число
+    или последовательность чисел (например, [seed, номер тайла]).
+    """
+    noise_type = ALIASES.get(noise_type, noise_type)
+    if noise_type not in NOISE_TYPES:
+        raise ValueError(f"Неизвестный тип шума: {noise_type}")
+    if img.dtype != np.uint8:
+        raise ValueError("Шум поддерживается только для 8-битных изображений")
+
+    amount = float(amount)
+    rng = np.random.default_rng(seed)
+    out = np.empty_like(img)
+    if amount <= 0:
+        out[...] = img
+        return out
+
+    row_pixels = int(np.prod(img.shape[1:]))
+    rows = max(1, CHUNK_PIXELS // max(row_pixels, 1))
+
+    for y in range(0, img.shape[0], rows):
+        src = img[y:y + rows]
+        dst = out[y:y + rows]
+        _CHUNK[noise_type](rng, src, dst, amount)
+
+    return out
+
+
+# ===================== ТИПЫ ШУМА =====================
+# каждый пишет результат для куска src в dst (uint8, с насыщением)
+
+def _gaussian(rng, src, dst, amount):
+    noise = rng.standard_normal(src.shape, dtype=np.float32)
+    noise *= amount * 255.0
+    cv2.add(src, noise, dst=dst, dtype=cv2.CV_8U)
+
+
+def _uniform(rng, src, dst, amount):
+    noise = rng.random(src.shape, dtype=np.float32)
+    noise -= 0.5
+    noise *= 2.0 * amount * 255.0
+    cv2.add(src, noise, dst=dst, dtype=cv2.CV_8U)
+
+
+def _speckle(rng, src, dst, amount):
+    noise = rng.standard_normal(src.shape, dtype=np.float32)
+    noise *= amount
+    noise *= src  # x·N(0, amount)
+    cv2.add(src, noise, dst=dst, dtype=cv2.CV_8U)
+
+
+def _poisson(rng, src, dst, amount):
+    noise = rng.poisson(src / amount).astype(np.float32)
+    noise *= amount
+    np.clip(noise, 0, 255, out=noise)
+    np.rint(noise, out=noise)
+    dst[...] = noise
+
+
+def _salt_pepper(rng, src, dst, amount):
+    # одно случайное число на пиксель: [0, a/2) — перец, [a/2, a) — соль
+    r = rng.random(src.shape[:2], dtype=np.float32)
+    dst[...] = src
+    dst[r < amount / 2] = 0
+    dst[(r >= amount / 2) & (r < amount)] = 255
+
+
+_CHUNK = {
+    "gaussian": _gaussian,
+    "uniform": _uniform,
+    "speckle": _speckle,
+    "poisson": _poisson,
+    "salt_pepper": _salt_pepper,
+}
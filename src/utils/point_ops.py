@@ -0,0 +1,119 @@
+import cv2
+import numpy as np
+
+
+CHANNELS = {"b": 0, "g": 1, "r": 2}
+
+
+class PointChain:
+    """
+    Цепочка поэлементных (point) операций над uint8-изображением.
+
+    Операции не применяются к изображению по отдельности: цепочка
+    компилируется в одну таблицу на 256 значений для каждого канала (BGR)
+    и применяется одним вызовом cv2.LUT — один проход по кадру вместо
+    отдельного прохода на каждую операцию.
+
+    Каждая операция применяется к самой таблице той же функцией OpenCV/NumPy,
+    что и к изображению, поэтому округление и насыщение совпадают
+    с последовательным применением операций.
+
+        lut = PointChain().scale_abs(1.2, 10).offset("r", 15).compile()
+    """
+
+    def __init__(self):
+        self._ops = []
+
+    def __len__(self):
+        return len(self._ops)
+
+    # ===================== ОПЕРАЦИИ =====================
+
+    def scale_abs(self, alpha: float, beta: float = 0.0):
+        """
+        Как cv2.convertScaleAbs: |x * alpha + beta| с насыщением.
+        """
+        return self._add(lambda t: cv2.convertScaleAbs(t, alpha=alpha, beta=beta))
+
+    def brightness(self, beta: float):
+        return self.scale_abs(1.0, beta)
+
+    def contrast(self, alpha: float):
+        return self.scale_abs(alpha, 0.0)
+
+    def gain(self, channel, k: float):
+        """
+        Умножение канала на коэффициент (float32, отсечение дробной части).
+        """
+        def op(t):
+            return np.clip(t.astype(np.float32) * np.float32(k), 0, 255).astype(np.uint8)
+        return self._add(op, channel)
+
+    def offset(self, channel, value: float):
+        """
+        Как cv2.add со скаляром: сдвиг канала с насыщением.
+        """
+        return self._add(lambda t: cv2.add(t, float(value)), channel)
+
+    def gamma(self, value: float):
+        """
+        Гамма-коррекция: 255 * (x / 255) ^ (1 / value).
+        """
+        def op(t):
+            x = (t / 255.0) ** (1.0 / float(value))
+            return np.clip(np.rint(255.0 * x), 0, 255).astype(np.uint8)
+        return self._add(op)
+
+    def invert(self):
+        return self._add(cv2.bitwise_not)
+
+    def levels(self, in_black: int = 0, in_white: int = 255, gamma: float = 1.0,
+               out_black: int = 0, out_white: int = 255):
+        """
+        Уровни: входной диапазон [in_black, in_white] с гаммой
+        переводится в выходной [out_black, out_white].
+        """
+        if in_white <= in_black:
+            raise ValueError("in_white должен быть больше in_black")
+
+        def op(t):
+            x = np.clip((t - float(in_black)) / float(in_white - in_black), 0.0, 1.0)
+            x = x ** (1.0 / float(gamma))
+            x = out_black + x * (out_white - out_black)
+            return np.clip(np.rint(x), 0, 255).astype(np.uint8)
+        return self._add(op)
+
+    # ===================== КОМПИЛЯЦИЯ =====================
+
+    def compile(self):
+        """
+        Таблица (256, 1, 3) uint8 для cv2.LUT.
+        """
+        table = np.tile(np.arange(256, dtype=np.uint8).reshape(256, 1), (1, 3))
+        for op, channel in self._ops:
+            if channel is None:
+                table = op(table).reshape(256, 3)
+            else:
+                column = np.ascontiguousarray(table[:, channel]).reshape(256, 1)
+                table[:, channel] = op(column).reshape(256)
+        return np.ascontiguousarray(table.reshape(256, 1, 3))
+
+    def apply(self, img):
+        if not self._ops:
+            return img
+
+        lut = self.compile()
+        if img.ndim == 2:
+            return cv2.LUT(img, np.ascontiguousarray(lut[:, :, 0]))
+        if img.shape[2] == 4:
+            identity = np.arange(256, dtype=np.uint8).reshape(256, 1, 1)
+            lut = np.concatenate([lut, identity], axis=2)
+        return cv2.LUT(img, lut)
+
+    # ===================== ВНУТРЕННИЕ =====================
+
+    def _add(self, op, channel=None):
+        if channel is not None and not isinstance(channel, int):
+            channel = CHANNELS[str(channel).lower()]
+        self._ops.append((op, channel))
+        return self
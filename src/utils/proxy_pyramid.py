@@ -0,0 +1,67 @@
+import threading
+import uuid
+from collections import OrderedDict
+
+import cv2
+
+
+class ProxyPyramid:
+    """
+    Пирамида уменьшенных копий изображения (1, 1/2, 1/4, 1/8) для превью.
+    Интерактивные коррекции считаются на копии, подходящей под область
+    просмотра, а полное разрешение — только при применении.
+    """
+
+    def __init__(self, image, depth: int = 3):
+        self.levels = [(1, image)]
+        for _ in range(depth):
+            scale, prev = self.levels[-1]
+            h, w = prev.shape[:2]
+            if min(h, w) < 2:
+                break
+            smaller = cv2.resize(prev, (w // 2, h // 2), interpolation=cv2.INTER_AREA)
+            self.levels.append((scale * 2, smaller))
+
+    @property
+    def nbytes(self) -> int:
+        # уровень 1 — само изображение, оно хранится в кэше отдельно
+        return sum(img.nbytes for _, img in self.levels[1:])
+
+    def best_for(self, width: int, height: int):
+        """
+        Самый маленький уровень, который всё ещё покрывает область просмотра.
+        Возвращает (масштаб, изображение).
+        """
+        for scale, img in reversed(self.levels):
+            h, w = img.shape[:2]
+            if w >= width and h >= height:
+                return scale, img
+        return self.levels[0]
+
+
+class ProxyStore:
+    """
+    Пирамиды изображений, загруженных через /process, по идентификатору.
+    Хранит ограниченное число последних пирамид.
+    """
+
+    def __init__(self, max_items: int = 32):
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, pyramid: ProxyPyramid, proxy_id: str = None) -> str:
+        proxy_id = proxy_id or uuid.uuid4().hex
+        with self._lock:
+            self._items[proxy_id] = pyramid
+            self._items.move_to_end(proxy_id)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+        return proxy_id
+
+    def get(self, proxy_id: str):
+        with self._lock:
+            pyramid = self._items.get(proxy_id)
+            if pyramid is not None:
+                self._items.move_to_end(proxy_id)
+            return pyramid
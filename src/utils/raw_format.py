@@ -0,0 +1,112 @@
+import os
+import struct
+import zlib
+
+import numpy as np
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+
+# Рабочий формат изображений проекта (.raw): короткий заголовок и пиксели как есть.
+# Без сжатия пиксели читаются одним вызовом без декодирования;
+# со сжатием — один быстрый проход компрессора вместо кодирования PNG.
+#
+#   magic  "IMRW"   4 байта
+#   версия          1 байт
+#   кодек           1 байт   (0 — без сжатия, 1 — zlib, 2 — lz4)
+#   dtype           8 байт   (строка numpy, например "|u1")
+#   ndim            1 байт
+#   shape           3 × uint32
+#   размер данных   uint64   (после сжатия)
+#   ... выравнивание до 64 байт, затем данные
+
+MAGIC = b"IMRW"
+VERSION = 1
+HEADER = struct.Struct("<4sBB8sB3IQ")
+DATA_OFFSET = 64
+
+CODECS = {None: 0, "zlib": 1, "lz4": 2}
+CODEC_NAMES = {v: k for k, v in CODECS.items()}
+
+EXTENSION = ".raw"
+
+
+def available_codecs():
+    return [name for name in CODECS if name != "lz4" or lz4_frame is not None]
+
+
+def is_raw(path: str) -> bool:
+    return path.endswith(EXTENSION)
+
+
+def write_raw(path: str, image, codec: str = None):
+    """
+    Записывает изображение атомарно (через временный файл).
+    """
+    if codec not in CODECS:
+        raise ValueError(f"Неизвестный кодек: {codec}")
+    if codec == "lz4" and lz4_frame is None:
+        raise ValueError("Кодек lz4 недоступен: установите пакет lz4")
+
+    image = np.ascontiguousarray(image)
+    shape = tuple(image.shape) + (0,) * (3 - image.ndim)
+    data = memoryview(image).cast("B")
+    if codec == "zlib":
+        data = zlib.compress(data, 1)
+    elif codec == "lz4":
+        data = lz4_frame.compress(data)
+
+    header = HEADER.pack(
+        MAGIC, VERSION, CODECS[codec], image.dtype.str.encode(),
+        image.ndim, *shape, len(data)
+    )
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header.ljust(DATA_OFFSET, b"\0"))
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def read_raw(path: str, mmap: bool = False):
+    """
+    Читает изображение в память; сжатый файл распаковывается.
+    mmap=True — несжатый файл отображается в память (только для чтения):
+    такой массив держит файл открытым, поэтому его нельзя хранить дольше,
+    чем файл не перезаписывается (write_raw заменяет файл через os.replace).
+    Возвращает None, если файла нет.
+    """
+    if not os.path.exists(path):
+        return None
+
+    with open(path, "rb") as f:
+        magic, version, codec, dtype, ndim, h, w, c, size = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Неверный формат рабочего файла: {path}")
+
+        dtype = np.dtype(dtype.rstrip(b"\0").decode())
+        shape = (h, w, c)[:ndim]
+
+        if codec == CODECS[None]:
+            if mmap:
+                # обычный ndarray поверх отображения, чтобы подкласс memmap не расходился по коду
+                return np.memmap(path, dtype=dtype, mode="r", offset=DATA_OFFSET, shape=shape).view(np.ndarray)
+            f.seek(DATA_OFFSET)
+            return np.fromfile(f, dtype=dtype, count=int(np.prod(shape))).reshape(shape)
+
+        f.seek(DATA_OFFSET)
+        data = f.read(size)
+
+    if codec == CODECS["zlib"]:
+        data = zlib.decompress(data)
+    elif codec == CODECS["lz4"]:
+        if lz4_frame is None:
+            raise ValueError("Кодек lz4 недоступен: установите пакет lz4")
+        data = lz4_frame.decompress(data)
+    else:
+        raise ValueError(f"Неизвестный кодек в файле {path}")
+
+    return np.frombuffer(data, dtype=dtype).reshape(shape).copy()
@@ -0,0 +1,124 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+
+class CachedResult:
+    """
+    Результат операции: изображение (только для чтения), его handle (хэш
+    содержимого, если уже известен) и закодированные байты по форматам.
+    """
+
+    __slots__ = ("image", "handle", "encoded", "stored")
+
+    def __init__(self, image, handle: str = None):
+        image.flags.writeable = False
+        self.image = image
+        self.handle = handle
+        self.encoded = {}  # формат -> байты
+        self.stored = False  # лежит ли в кэше (учитывается в его объёме)
+
+    @property
+    def nbytes(self) -> int:
+        return self.image.nbytes + sum(len(b) for b in self.encoded.values())
+
+
+class ResultCache:
+    """
+    Кэш результатов растровых операций по содержимому:
+    (хэш исходного изображения, действие, нормализованные параметры) -> результат.
+
+    Общий для /process, FilterService и TransformService: при повторе тех же
+    параметров (переключение туда-обратно, повторная отправка того же файла)
+    декодирование, вычисление и кодирование пропускаются.
+    Объём ограничен max_bytes (LRU), ведутся счётчики попаданий и промахов.
+    """
+
+    def __init__(self, max_bytes: int = 512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(source: str, action: str, params) -> str:
+        """
+        Ключ записи. params — словарь или список (для цепочек), значения
+        уже приведены к типам, поэтому "90" и 90.0 дают один ключ.
+        """
+        h = hashlib.blake2b(digest_size=16)
+        h.update(source.encode())
+        h.update(b"\0")
+        h.update(action.encode())
+        h.update(b"\0")
+        h.update(json.dumps(params, sort_keys=True, default=str).encode())
+        return h.hexdigest()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._items.move_to_end(key)
+            return entry
+
+    def put(self, key: str, image, handle: str = None) -> CachedResult:
+        entry = CachedResult(image, handle)
+        if key is None:
+            return entry  # невоспроизводимый результат (например, шум без seed) — не кэшируем
+
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                old.stored = False
+                self._bytes -= old.nbytes
+            entry.stored = True
+            self._items[key] = entry
+            self._bytes += entry.nbytes
+            self._evict()
+        return entry
+
+    def attach(self, entry: CachedResult, fmt: str, data: bytes):
+        """
+        Запоминает закодированные байты результата.
+        """
+        with self._lock:
+            if fmt in entry.encoded:
+                return
+            entry.encoded[fmt] = data
+            if entry.stored:
+                self._bytes += len(data)
+                self._evict()
+
+    def clear(self):
+        with self._lock:
+            for entry in self._items.values():
+                entry.stored = False
+            self._items.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "entries": len(self._items),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and len(self._items) > 1:
+            _, entry = self._items.popitem(last=False)
+            entry.stored = False
+            self._bytes -= entry.nbytes
+
+
+result_cache = ResultCache()
@@ -84,7 +84,7 @@ class SVGTransform:
             # Для текста нужна более сложная логика
             bbox['x'] = float(element.get('x', 0))
             bbox['y'] = float(element.get('y', 0))
-            bbox['width'] = len(element.text) * 10  # Примерная ширина
+            bbox['width'] = len(element.text or '') * 10  # Примерная ширина
             bbox['height'] = 20  # Примерная высота
 
         return bbox
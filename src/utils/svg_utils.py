@@ -74,4 +74,21 @@ class SVGUtils:
             # Убираем теги SVG
             content += re.sub(r'<\/?svg[^>]*>', '', svg)
 
-        return f"{root_tag}{content}</svg>"
\ No newline at end of file
+        return f"{root_tag}{content}</svg>"
+
+    @staticmethod
+    def project_svg(project):
+        """SVG-документ проекта: сохранённый svg или содержимое видимых слоёв"""
+        if project.get("svg"):
+            return project["svg"]
+
+        width, height = project.get("width", 800), project.get("height", 600)
+        parts = [
+            layer["content"] for layer in project.get("layers", [])
+            if isinstance(layer, dict) and isinstance(layer.get("content"), str) and layer.get("visible", True)
+        ]
+        return (
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+            f'viewBox="0 0 {width} {height}"><rect width="100%" height="100%" fill="white"/>'
+            + "".join(parts) + "</svg>"
+        )
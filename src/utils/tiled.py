@@ -0,0 +1,235 @@
+import math
+import os
+import shutil
+import tempfile
+import uuid
+
+import cv2
+import numpy as np
+
+
+class RawBuffer:
+    """
+    Изображение в отображаемом в память (memmap) файле на диске.
+    В RAM попадают только те участки, к которым обращаются.
+    """
+
+    def __init__(self, path: str, shape=None, dtype=np.uint8):
+        self.path = path
+        if shape is None:
+            self.array = np.load(path, mmap_mode="r+")
+        else:
+            self.array = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=tuple(shape))
+
+    @property
+    def shape(self):
+        return self.array.shape
+
+    @property
+    def nbytes(self) -> int:
+        return self.array.nbytes
+
+    def flush(self):
+        self.array.flush()
+
+    def delete(self):
+        self.array = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class TiledExecutor:
+    """
+    Обработка изображения перекрывающимися тайлами под фиксированный
+    потолок памяти max_bytes. Промежуточные результаты хранятся в RawBuffer
+    во временном каталоге и удаляются при выходе из контекста:
+
+        with TiledExecutor(max_bytes=256 * 1024 * 1024) as ex:
+            src = ex.from_array(img)
+            dst = ex.map(src, lambda t: cv2.GaussianBlur(t, (9, 9), 0), halo=4)
+    """
+
+    # байт рабочей памяти на байт тайла: сам тайл, результат и float32-копии
+    WORK_FACTOR = 12
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024, workdir: str = None):
+        self.max_bytes = max_bytes
+        self.workdir = workdir
+        self._own_dir = workdir is None
+
+    def __enter__(self):
+        if self.workdir is None:
+            self.workdir = tempfile.mkdtemp(prefix="tiles_")
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._own_dir:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+            self.workdir = None
+
+    # ===================== БУФЕРЫ =====================
+
+    def new(self, shape) -> RawBuffer:
+        return RawBuffer(os.path.join(self.workdir, f"{uuid.uuid4().hex}.npy"), shape)
+
+    def from_array(self, img) -> RawBuffer:
+        """
+        Копирует изображение в буфер полосами (без второй полной копии в RAM).
+        """
+        buf = self.new(img.shape)
+        rows = self._strip_rows(img.shape)
+        for y in range(0, img.shape[0], rows):
+            buf.array[y:y + rows] = img[y:y + rows]
+        buf.flush()
+        return buf
+
+    def tile_size(self, shape, halo: int = 0, stretch: float = 1.0) -> int:
+        """
+        Сторона тайла, при которой тайл с ореолом halo укладывается в потолок.
+        stretch — во сколько раз область исходника больше тайла результата.
+        """
+        channels = shape[2] if len(shape) > 2 else 1
+        side = math.sqrt(self.max_bytes / (channels * self.WORK_FACTOR))
+        side = int(side / max(stretch, 1.0)) - 2 * halo
+        return max(16, side)
+
+    # ===================== ОПЕРАЦИИ =====================
+
+    def map(self, src: RawBuffer, func, halo: int = 0) -> RawBuffer:
+        """
+        Поэлементная или локальная операция func(тайл) -> тайл того же размера.
+        halo — радиус ядра: тайл читается с запасом, поэтому результат
+        на стыках тайлов совпадает с обработкой целого изображения.
+        """
+        h, w = src.shape[:2]
+        dst = self.new(src.shape)
+        tile = self.tile_size(src.shape, halo)
+
+        for y0, y1, x0, x1 in _tiles(h, w, tile):
+            hy0, hy1 = max(0, y0 - halo), min(h, y1 + halo)
+            hx0, hx1 = max(0, x0 - halo), min(w, x1 + halo)
+            out = func(np.array(src.array[hy0:hy1, hx0:hx1]))
+            dst.array[y0:y1, x0:x1] = out[y0 - hy0:y1 - hy0, x0 - hx0:x1 - hx0]
+
+        dst.flush()
+        return dst
+
+    def warp(self, src: RawBuffer, M, size, interp=cv2.INTER_LINEAR) -> RawBuffer:
+        """
+        Аффинное преобразование (как cv2.warpAffine) по тайлам результата:
+        для каждого тайла читается только покрывающая его область исходника.
+        """
+        h, w = src.shape[:2]
+        out_w, out_h = size
+        dst = self.new((out_h, out_w) + src.shape[2:])
+
+        M = np.asarray(M, dtype=np.float64)
+        inv = cv2.invertAffineTransform(M)
+        stretch = float(np.abs(inv[:, :2]).sum(axis=1).max())
+        tile = self.tile_size(src.shape, 2, stretch)
+
+        for y0, y1, x0, x1 in _tiles(out_h, out_w, tile):
+            corners = np.array([[x0, y0, 1], [x1, y0, 1], [x0, y1, 1], [x1, y1, 1]], np.float64)
+            pts = corners @ inv.T
+            # запас на соседей интерполяции (до 2 пикселей у бикубической)
+            sx0 = max(0, int(math.floor(pts[:, 0].min())) - 2)
+            sx1 = min(w, int(math.ceil(pts[:, 0].max())) + 3)
+            sy0 = max(0, int(math.floor(pts[:, 1].min())) - 2)
+            sy1 = min(h, int(math.ceil(pts[:, 1].max())) + 3)
+
+            if sx0 >= sx1 or sy0 >= sy1:
+                dst.array[y0:y1, x0:x1] = 0
+                continue
+
+            local = M.copy()
+            local[:, 2] += M[:, :2] @ np.array([sx0, sy0], np.float64) - np.array([x0, y0], np.float64)
+            block = np.array(src.array[sy0:sy1, sx0:sx1])
+            dst.array[y0:y1, x0:x1] = cv2.warpAffine(
+                block, local, (x1 - x0, y1 - y0), flags=interp, borderMode=cv2.BORDER_CONSTANT
+            )
+
+        dst.flush()
+        return dst
+
+    def resize(self, src: RawBuffer, size, interp=cv2.INTER_LINEAR) -> RawBuffer:
+        """
+        Масштабирование (как cv2.resize) по тайлам результата через cv2.remap
+        с той же привязкой пикселей и повтором краёв.
+        """
+        h, w = src.shape[:2]
+        out_w, out_h = size
+        dst = self.new((out_h, out_w) + src.shape[2:])
+        fx, fy = w / out_w, h / out_h
+        tile = self.tile_size(src.shape, 2, max(fx, fy))
+
+        for y0, y1, x0, x1 in _tiles(out_h, out_w, tile):
+            xs = np.arange(x0, x1, dtype=np.float64)
+            ys = np.arange(y0, y1, dtype=np.float64)
+            if interp == cv2.INTER_NEAREST:
+                xs = np.minimum(np.floor(xs * fx), w - 1)
+                ys = np.minimum(np.floor(ys * fy), h - 1)
+            else:
+                xs = (xs + 0.5) * fx - 0.5
+                ys = (ys + 0.5) * fy - 0.5
+
+            sx0 = max(0, int(math.floor(xs.min())) - 2)
+            sx1 = min(w, int(math.ceil(xs.max())) + 3)
+            sy0 = max(0, int(math.floor(ys.min())) - 2)
+            sy1 = min(h, int(math.ceil(ys.max())) + 3)
+            block = np.array(src.array[sy0:sy1, sx0:sx1])
+
+            map_x, map_y = np.meshgrid((xs - sx0).astype(np.float32), (ys - sy0).astype(np.float32))
+            dst.array[y0:y1, x0:x1] = cv2.remap(
+                block, map_x, map_y, interp, borderMode=cv2.BORDER_REPLICATE
+            )
+
+        dst.flush()
+        return dst
+
+    def flip(self, src: RawBuffer, mode: str) -> RawBuffer:
+        """
+        Отражение без интерполяции: h — по горизонтали, v — по вертикали, иначе оба.
+        """
+        h, w = src.shape[:2]
+        dst = self.new(src.shape)
+        tile = self.tile_size(src.shape)
+        flip_x = mode != "v"
+        flip_y = mode != "h"
+
+        for y0, y1, x0, x1 in _tiles(h, w, tile):
+            sy0, sy1 = (h - y1, h - y0) if flip_y else (y0, y1)
+            sx0, sx1 = (w - x1, w - x0) if flip_x else (x0, x1)
+            block = src.array[sy0:sy1, sx0:sx1]
+            if flip_y:
+                block = block[::-1]
+            if flip_x:
+                block = block[:, ::-1]
+            dst.array[y0:y1, x0:x1] = block
+
+        dst.flush()
+        return dst
+
+    def crop(self, src: RawBuffer, x: int, y: int, w: int, h: int) -> RawBuffer:
+        """
+        Обрезка с той же семантикой, что и срез img[y:y+h, x:x+w].
+        """
+        ys = range(*slice(y, y + h).indices(src.shape[0]))
+        xs = range(*slice(x, x + w).indices(src.shape[1]))
+        dst = self.new((len(ys), len(xs)) + src.shape[2:])
+        if len(ys) and len(xs):
+            rows = self._strip_rows(dst.shape)
+            for r in range(0, len(ys), rows):
+                sy = ys.start + r
+                dst.array[r:r + rows] = src.array[sy:sy + min(rows, len(ys) - r), xs.start:xs.stop]
+        dst.flush()
+        return dst
+
+    def _strip_rows(self, shape) -> int:
+        row_bytes = int(np.prod(shape[1:])) or 1
+        return max(1, self.max_bytes // (row_bytes * self.WORK_FACTOR))
+
+
+def _tiles(h: int, w: int, tile: int):
+    for y in range(0, h, tile):
+        for x in range(0, w, tile):
+            yield y, min(y + tile, h), x, min(x + tile, w)
@@ -1,4 +1,5 @@
 let currentDataURL = null;
+let currentHandle = null;
 const canvas = document.getElementById("preview");
 const ctx = canvas.getContext("2d");
 const info = document.getElementById("info");
@@ -18,13 +19,24 @@ function draw(dataURL) {
 
 
 async function sendProcess(formData) {
+    // вместо повторной отправки картинки передаём handle с сервера
+    if (currentHandle && formData.has("image_b64")) {
+        formData.delete("image_b64");
+        formData.append("handle", currentHandle);
+    }
+    formData.append("response", "handle");
+
     let r = await fetch("/process", { method: "POST", body: formData });
     let j = await r.json();
     if (j.error) {
+        if (j.handle_missing) currentHandle = null;
         alert(j.error);
         return;
     }
-    if (j.result) draw(j.result);
+    if (j.handle) {
+        currentHandle = j.handle;
+        draw(j.url);
+    }
     if (j.saved_path) {
         document.getElementById("saveLink").innerHTML =
             `<a href="${j.saved_path}" target="_blank">${j.saved_name}</a>`;
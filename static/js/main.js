@@ -11,7 +11,7 @@ let resizeDir = "";           // направление растяжения
 let workspaceSize = 100;      // минимальный размер рабочей области
 
 // ===================== ЗАГРУЗКА И ОТОБРАЖЕНИЕ =====================
-function loadToCanvas(base64) {
+function loadToCanvas(src) {
     image.onload = () => {
         const workspace = document.getElementById("workspace-container");
 
@@ -30,14 +30,21 @@ function loadToCanvas(base64) {
         drawCanvas();
         updateCanvasInfo();
     };
-    image.src = "data:image/png;base64," + base64;
+    image.src = src;
 }
 
+// бинарный PNG с ETag: если изображение не менялось, сервер отвечает 304
+// и браузер берёт его из своего кэша
+let currentUrl = null;
+
 function reloadImage() {
-    fetch("/current")
-        .then(r => r.json())
-        .then(data => {
-            if (data.image) loadToCanvas(data.image);
+    fetch("/current?format=png")
+        .then(r => (r.ok ? r.blob() : null))
+        .then(blob => {
+            if (!blob) return;
+            if (currentUrl) URL.revokeObjectURL(currentUrl);
+            currentUrl = URL.createObjectURL(blob);
+            loadToCanvas(currentUrl);
         });
 }
 
@@ -4,6 +4,11 @@ class ProjectsManager {
         this.projects = [];
         this.filteredProjects = [];
         this.currentFilter = 'all';
+        this.searchQuery = '';
+        this.page = 0;
+        this.pages = 0;
+        this.perPage = 48;
+        this.stats = null;
         this.init();
     }
 
@@ -16,13 +21,27 @@ class ProjectsManager {
         console.log('Projects Manager initialized');
     }
 
-    async loadProjects() {
+    async loadProjects(append = false) {
+        // Фильтр, поиск и постраничная выдача выполняются на сервере по индексу проектов
+        const page = append ? this.page + 1 : 1;
+        const params = new URLSearchParams({
+            page: page,
+            per_page: this.perPage,
+            filter: this.currentFilter
+        });
+        if (this.searchQuery) {
+            params.set('q', this.searchQuery);
+        }
+
         try {
-            const response = await fetch('/api/projects/list');
+            const response = await fetch(`/api/projects/list?${params}`);
             if (response.ok) {
                 const data = await response.json();
-                this.projects = data.projects || [];
+                const loaded = data.projects || [];
+                this.projects = append ? this.projects.concat(loaded) : loaded;
                 this.filteredProjects = [...this.projects];
+                this.page = data.page || page;
+                this.pages = data.pages || 0;
             } else {
                 console.error('Ошибка загрузки проектов');
                 this.projects = [];
@@ -52,7 +71,8 @@ class ProjectsManager {
         const searchInput = document.getElementById('search-projects');
         if (searchInput) {
             searchInput.addEventListener('input', (e) => {
-                this.searchProjects(e.target.value);
+                clearTimeout(this.searchTimer);
+                this.searchTimer = setTimeout(() => this.searchProjects(e.target.value), 250);
             });
         }
 
@@ -177,46 +197,19 @@ class ProjectsManager {
         this.applyFilter();
     }
 
-    applyFilter() {
-        const now = new Date();
-        const weekAgo = new Date(now.getTime() - 7 * 24 * 60 * 60 * 1000);
-
-        switch (this.currentFilter) {
-            case 'recent':
-                this.filteredProjects = this.projects.filter(project => {
-                    const modified = new Date(project.modified);
-                    return modified > weekAgo;
-                });
-                break;
-
-            case 'favorites':
-                this.filteredProjects = this.projects.filter(project => project.favorite);
-                break;
-
-            case 'archived':
-                this.filteredProjects = this.projects.filter(project => project.archived);
-                break;
-
-            default:
-                this.filteredProjects = [...this.projects];
-        }
-
+    async applyFilter() {
+        await this.loadProjects();
         this.renderProjects();
     }
 
-    searchProjects(query) {
-        if (!query.trim()) {
-            this.filteredProjects = [...this.projects];
-            this.applyFilter();
-            return;
-        }
-
-        const searchLower = query.toLowerCase();
-        this.filteredProjects = this.projects.filter(project =>
-            project.name.toLowerCase().includes(searchLower) ||
-            (project.tags && project.tags.some(tag => tag.toLowerCase().includes(searchLower)))
-        );
+    async searchProjects(query) {
+        this.searchQuery = query.trim();
+        await this.loadProjects();
+        this.renderProjects();
+    }
 
+    async loadMore() {
+        await this.loadProjects(true);
         this.renderProjects();
     }
 
@@ -243,7 +236,7 @@ class ProjectsManager {
                     icon = 'fa-archive';
                     break;
                 default:
-                    if (this.projects.length === 0) {
+                    if (!this.searchQuery) {
                         message = 'У вас еще нет проектов';
                         icon = 'fa-file-alt';
                     } else {
@@ -271,6 +264,15 @@ class ProjectsManager {
             const card = this.createProjectCard(project);
             container.appendChild(card);
         });
+
+        if (this.page < this.pages) {
+            const more = document.createElement('button');
+            more.className = 'btn-secondary load-more';
+            more.style.cssText = 'grid-column: 1 / -1; justify-self: center;';
+            more.innerHTML = '<i class="fas fa-chevron-down"></i> Загрузить ещё';
+            more.addEventListener('click', () => this.loadMore());
+            container.appendChild(more);
+        }
     }
 
     createProjectCard(project) {
@@ -286,15 +288,19 @@ class ProjectsManager {
             year: 'numeric'
         });
 
-        // Создаем превью (в реальном приложении здесь будет миниатюра)
+        // Миниатюра по хэшу содержимого (кэшируется браузером), иначе — цветная заглушка
         const previewColor = this.getColorFromId(project.id);
+        const preview = project.thumbnail
+            ? `<img class="preview-thumbnail" src="${project.thumbnail}" loading="lazy"
+                    alt="${this.escapeHtml(project.name)}" style="width: 100%; height: 100%; object-fit: contain">`
+            : `<div class="preview-placeholder">
+                    <i class="fas fa-vector-square"></i>
+                    <p>${project.width}×${project.height} ${project.unit}</p>
+                </div>`;
 
         card.innerHTML = `
             <div class="project-preview" style="background: ${previewColor}">
-                <div class="preview-placeholder">
-                    <i class="fas fa-vector-square"></i>
-                    <p>${project.width}×${project.height} ${project.unit}</p>
-                </div>
+                ${preview}
             </div>
             <div class="project-info">
                 <div class="project-title">
@@ -475,7 +481,7 @@ class ProjectsManager {
 
         infoCreated.textContent = createdDate.toLocaleString('ru-RU');
         infoModified.textContent = modifiedDate.toLocaleString('ru-RU');
-        infoLayers.textContent = project.layers?.length || 0;
+        infoLayers.textContent = project.layerCount ?? project.layers?.length ?? 0;
         infoFilename.textContent = `${project.id}.json`;
         infoFilesize.textContent = this.formatFileSize(project.fileSize || 0);
 
@@ -786,29 +792,32 @@ class ProjectsManager {
         }
     }
 
-    updateStats() {
+    async updateStats() {
+        // Итоги по всем проектам считает сервер (на странице загружена только часть списка)
+        try {
+            const response = await fetch('/api/project/stats');
+            if (response.ok) {
+                this.stats = await response.json();
+            }
+        } catch (error) {
+            console.error('Ошибка загрузки статистики:', error);
+        }
+        if (!this.stats) return;
+
         const totalProjects = document.getElementById('total-projects');
         const recentProjects = document.getElementById('recent-projects');
         const totalSize = document.getElementById('total-size');
 
         if (totalProjects) {
-            totalProjects.textContent = this.projects.length;
+            totalProjects.textContent = this.stats.total_projects;
         }
 
         if (recentProjects) {
-            const weekAgo = new Date(Date.now() - 7 * 24 * 60 * 60 * 1000);
-            const recentCount = this.projects.filter(project => {
-                const modified = new Date(project.modified);
-                return modified > weekAgo;
-            }).length;
-            recentProjects.textContent = recentCount;
+            recentProjects.textContent = this.stats.recent_projects;
         }
 
         if (totalSize) {
-            const totalFileSize = this.projects.reduce((sum, project) => {
-                return sum + (project.fileSize || 0);
-            }, 0);
-            totalSize.textContent = this.formatFileSize(totalFileSize);
+            totalSize.textContent = this.formatFileSize(this.stats.total_size_bytes);
         }
     }
 
@@ -0,0 +1,38 @@
+import os
+
+import numpy as np
+import pytest
+
+from src.utils.image_cache import ImageCache
+from src.utils.raw_format import read_raw, write_raw
+
+
+def test_failed_write_is_kept_and_raised_from_flush(tmp_path):
+    cache = ImageCache(max_bytes=0)  # без ошибки записанное изображение сразу вытеснилось бы
+    path = str(tmp_path / "missing" / "current.raw")
+    image = np.full((4, 4, 3), 7, dtype=np.uint8)
+
+    cache.write(path, image)
+    with pytest.raises(IOError):
+        cache.flush(path)
+    with pytest.raises(IOError):
+        cache.flush()
+    assert cache.read(path) is image
+    assert cache.stats()["failed_writes"] == 1
+
+    os.makedirs(tmp_path / "missing")
+    cache.write(path, image.copy())
+    cache.flush(path)
+    assert cache.stats()["failed_writes"] == 0
+    assert np.array_equal(read_raw(path), image)
+
+
+def test_read_raw_does_not_keep_the_file_mapped(tmp_path):
+    path = str(tmp_path / "current.raw")
+    write_raw(path, np.zeros((2, 3, 3), dtype=np.uint8))
+    image = read_raw(path)
+    assert not isinstance(image.base, np.memmap)
+
+    write_raw(path, np.ones((2, 3, 3), dtype=np.uint8))
+    assert image.sum() == 0
+    assert read_raw(path).sum() == 18
@@ -0,0 +1,24 @@
+from flask import Flask
+
+from src.utils import metrics
+
+
+def test_unhandled_exceptions_are_counted_as_500():
+    app = Flask(__name__)
+    metrics.init_app(app)
+
+    @app.route("/metrics-test/boom")
+    def metrics_test_boom():
+        raise RuntimeError("boom")
+
+    @app.route("/metrics-test/ok")
+    def metrics_test_ok():
+        return "ok"
+
+    client = app.test_client()
+    assert client.get("/metrics-test/boom").status_code == 500
+    assert client.get("/metrics-test/ok").status_code == 200
+
+    text = metrics.registry.render()
+    assert 'http_request_duration_seconds_count{endpoint="metrics_test_boom",method="GET",status="500"} 1' in text
+    assert 'http_request_duration_seconds_count{endpoint="metrics_test_ok",method="GET",status="200"} 1' in text
@@ -0,0 +1,59 @@
+import os
+
+import pytest
+
+from src.models.project_store import ProjectStore
+
+
+def blob_files(store):
+    root = os.path.join(store.folder, "blobs")
+    return sorted(name for _, _, files in os.walk(root) for name in files)
+
+
+def test_gc_keeps_blobs_when_a_project_is_unreadable(tmp_path):
+    store = ProjectStore(folder=str(tmp_path))
+    store.save("healthy", {"name": "ok", "layers": [{"id": "a", "content": "<rect/>"}]})
+    store.save("broken", {"name": "bad", "layers": [{"id": "b", "content": "<circle/>"}]})
+    store.save("orphan", {"name": "tmp", "layers": [{"id": "c", "content": "<path/>"}]})
+    os.remove(store.snapshot_path("orphan"))  # его слой — действительно мусор
+
+    with open(store.snapshot_path("broken"), "wb") as f:
+        f.write(b'{"name": "bad", "layers": [{"id"')  # обрезанный снимок
+    before = blob_files(store)
+
+    with pytest.raises(ValueError):
+        ProjectStore(folder=str(tmp_path)).gc()
+    assert blob_files(store) == before
+
+
+def test_gc_removes_unreferenced_blobs(tmp_path):
+    store = ProjectStore(folder=str(tmp_path))
+    store.save("p", {"name": "p", "layers": [{"id": "a", "content": "1"}]})
+    store.save("p", {"name": "p", "layers": [{"id": "a", "content": "2"}]})
+
+    assert store.gc() == 1
+    assert store.load("p")["layers"] == [{"id": "a", "content": "2"}]
+
+
+def test_save_without_layers_and_cached_blob_is_a_copy(tmp_path):
+    store = ProjectStore(folder=str(tmp_path))
+    store.save("empty", {"name": "no layers"})
+    assert store.load("empty")["layers"] == []
+    with pytest.raises(ValueError):
+        store.save("bad", {"name": "x", "layers": "abc"})
+
+    layer = {"id": "a", "content": "<rect/>"}
+    store.save("p", {"name": "p", "layers": [layer]})
+    layer["content"] = "changed"
+    assert store.load("p")["layers"][0]["content"] == "<rect/>"
+
+
+def test_ids_outside_the_folder_are_rejected(tmp_path):
+    store = ProjectStore(folder=str(tmp_path / "projects"))
+    (tmp_path / "secret.json").write_text('{"name": "secret"}')
+
+    assert not store.exists("../secret")
+    with pytest.raises(ValueError):
+        store.load("../secret")
+    with pytest.raises(ValueError):
+        store.patch("../secret", {"set": {"name": "x"}})
@@ -0,0 +1,38 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+from src.services.workspace_registry import WorkspaceRegistry
+from src.utils.image_cache import image_cache
+
+
+def test_workspace_is_created_only_on_request(tmp_path):
+    registry = WorkspaceRegistry(str(tmp_path))
+
+    with pytest.raises(KeyError):
+        registry.get("visitor")
+    assert os.listdir(tmp_path) == []
+
+    registry.get("visitor", create=True)
+    assert os.listdir(tmp_path) == ["visitor"]
+    assert registry.get("visitor").id == "visitor"
+
+
+def test_idle_workspaces_are_removed_with_their_folders(tmp_path):
+    registry = WorkspaceRegistry(str(tmp_path), idle_seconds=60)
+    with registry.get("idle", create=True) as ws:
+        image_cache.write(ws.project.current_path, np.zeros((4, 4, 3), dtype=np.uint8))
+    registry.get("active", create=True)
+    os.makedirs(tmp_path / "batch")
+    os.makedirs(tmp_path / "stale")  # папка прошлого запуска, в памяти её нет
+    old = time.time() - 120
+    os.utime(tmp_path / "stale", (old, old))
+    registry._workspaces["idle"].last_access = old
+
+    assert registry.expire() == 2
+    assert sorted(os.listdir(tmp_path)) == ["active", "batch"]
+    assert list(registry._workspaces) == ["active"]
+    with pytest.raises(KeyError):
+        registry.get("idle")